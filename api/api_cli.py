@@ -3,6 +3,8 @@ import argparse
 import os, sys
 import json
 
+from api_client import encode_body
+
 BASE_URL = os.getenv("API_URL", "http://127.0.0.1:8000")  # FastAPI must be running  
 
 def main():
@@ -35,6 +37,8 @@ def main():
     parser.add_argument("pickup_time", type=str, nargs="?", help="Pickup time in HH:MM:SS format")
     parser.add_argument("store_and_fwd_flag", type=str, nargs="?", help="Store and forward flag ('Y' or 'N').")
     parser.add_argument("--input-json",type=str, help="Batch input as a JSON file path or raw JSON string (used only with 'predict/batch')")
+    parser.add_argument("--compression", choices=["gzip", "zstd", "none"], default="gzip",
+                        help="Compression of large batch bodies (default: 'gzip'; 'zstd' needs the zstandard package)")
   
     args = parser.parse_args() # activates the parser
 
@@ -91,7 +95,9 @@ def main():
                 except Exception as e:
                     raise ValueError(f"Failed to parse batch input: {e}")
 
-                response = requests.post(request_url, json=batch_data)
+                # Compressed above API_COMPRESS_MIN_BYTES (64 KB by default)
+                body, headers = encode_body(batch_data, None if args.compression == "none" else args.compression)
+                response = requests.post(request_url, data=body, headers=headers)
                 print(json.dumps(response.json(), indent=4))
 
             case "about":  # get method
@@ -1,6 +1,103 @@
 import requests
+import gzip
 import json
 import os
+import time
+
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# Request bodies at least this large are compressed before sending
+COMPRESS_MIN_BYTES = int(os.getenv("API_COMPRESS_MIN_BYTES", "65536"))
+
+
+def encode_body(payload, compression="gzip", min_bytes=COMPRESS_MIN_BYTES):
+    """
+    Serializes a JSON payload, compressing it when it is at least `min_bytes` long.
+
+    Parameters:
+    - payload: JSON-serializable object.
+    - compression: 'gzip', 'zstd' (needs the zstandard package) or None to never compress.
+    - min_bytes: Size threshold of the serialized payload.
+
+    Returns:
+    - (body, headers) to pass to `requests.post(data=body, headers=headers)`.
+    """
+    body = json.dumps(payload).encode()
+    headers = {"Content-Type": "application/json"}
+    if compression is None or len(body) < min_bytes:
+        return body, headers
+
+    if compression == "gzip":
+        # Level 1: repetitive trip JSON still shrinks about 5x and compression stays far cheaper than the upload
+        body = gzip.compress(body, compresslevel=1)
+    elif compression == "zstd" and zstandard is not None:
+        body = zstandard.ZstdCompressor(level=3).compress(body)
+    else:
+        raise ValueError(f"Unsupported compression: {compression}")
+    headers["Content-Encoding"] = compression
+    return body, headers
+
+
+# Response formats of the batch prediction endpoints, by the name passed to `predict_batch`
+RESPONSE_FORMATS = {
+    "json": "application/json",
+    "msgpack": "application/msgpack",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "float32": "application/octet-stream",
+}
+
+
+def _arrays(value):
+    # Lists of floats (per-trip values, NaN for unscored trips) become NumPy arrays
+    if isinstance(value, dict):
+        return {key: _arrays(v) for key, v in value.items()}
+    if isinstance(value, list) and value and all(type(v) is float for v in value):
+        return np.array(value)
+    return value
+
+
+def decode_response(response):
+    """
+    Decodes a prediction response by its Content-Type. With the binary formats, per-trip
+    values are NumPy arrays (NaN for trips that were not scored).
+    """
+    content_type = response.headers.get("Content-Type", "").split(";")[0]
+    if content_type == RESPONSE_FORMATS["msgpack"]:
+        if msgpack is None:
+            raise ValueError("Decoding MessagePack responses needs the msgpack package")
+        return _arrays(msgpack.unpackb(response.content))
+    if content_type == RESPONSE_FORMATS["float32"]:
+        return {"predictions": np.frombuffer(response.content, dtype="<f4")}
+    if content_type == RESPONSE_FORMATS["arrow"]:
+        if pyarrow is None:
+            raise ValueError("Decoding Arrow responses needs the pyarrow package")
+        table = pyarrow.ipc.open_stream(response.content).read_all()
+        result = {key.decode(): json.loads(value) for key, value in (table.schema.metadata or {}).items()}
+        for name in table.column_names:
+            parent, _, child = name.rpartition(".")
+            values = table.column(name).to_numpy(zero_copy_only=False)
+            if parent:
+                result.setdefault(parent, {})[child] = values
+            else:
+                result[name] = values
+        return result
+    return response.json()
+
 
 class TripDurationPredictor:
     '''
@@ -8,7 +105,12 @@ class TripDurationPredictor:
 
     This class provides methods to interact with all supported API endpoints:
     - `predict()`: Make a single prediction using required trip features.
-    - `predict_batch()`: Make predictions for a batch of trips using JSON input (from file or string).
+    - `predict_batch()`: Make predictions for a batch of trips using JSON input (from file or string),
+      optionally receiving them as MessagePack, Arrow or raw float32.
+    - `predict_matrix()`: Get an origins x destinations matrix of trip durations.
+    - `predict_csv()`: Stream a CSV of trips through /predict/csv and save the predictions.
+    - `submit_job()`, `get_job()`, `wait_for_job()`, `download_job_results()`: Score a whole CSV/Parquet
+      trip file as a background job and save its predictions.
     - `validate()`: Validate a user input dictionary against the expected schema.
     - `get_features()`: Retrieve a list of required input features.
     - `get_sample_features()`: Get a sample input dictionary for guidance.
@@ -16,8 +118,13 @@ class TripDurationPredictor:
     - `get_version()`: Get version details of the model, API, and key libraries.
     - `get_help()`: Get an overview of all available API endpoints.
 
+    Request bodies of at least `compress_min_bytes` are sent compressed; responses are
+    requested with Accept-Encoding: gzip and decompressed by `requests`.
+
     Attributes:
         BASE_URL (str): The base URL of the prediction API. Defaults to 'http://127.0.0.1:8000' or the API_URL environment variable.
+        compression (str): 'gzip' (default), 'zstd' or None to send bodies uncompressed.
+        compress_min_bytes (int): Size from which request bodies are compressed (API_COMPRESS_MIN_BYTES, default 64 KB).
 
     Example:
         client = TripDurationPredictor()
@@ -25,8 +132,10 @@ class TripDurationPredictor:
         print(prediction)
     '''
 
-    def __init__(self, base_url=None):
+    def __init__(self, base_url=None, compression="gzip", compress_min_bytes=COMPRESS_MIN_BYTES):
         self.BASE_URL = base_url or os.getenv("API_URL", "http://127.0.0.1:8000")
+        self.compression = compression
+        self.compress_min_bytes = compress_min_bytes
 
     def _get(self, endpoint):
         url = f"{self.BASE_URL}/{endpoint}"
@@ -34,11 +143,17 @@ class TripDurationPredictor:
         response.raise_for_status()
         return response.json()
 
-    def _post(self, endpoint, payload):
+    def _send(self, endpoint, payload, params=None, accept=None):
         url = f"{self.BASE_URL}/{endpoint}"
-        response = requests.post(url, json=payload)
+        body, headers = encode_body(payload, self.compression, self.compress_min_bytes)
+        if accept:
+            headers["Accept"] = accept
+        response = requests.post(url, data=body, headers=headers, params=params)
         response.raise_for_status()
-        return response.json()
+        return response
+
+    def _post(self, endpoint, payload):
+        return self._send(endpoint, payload).json()
 
     def predict(self, vendor_id, passenger_count, 
                 pickup_longitude, pickup_latitude, 
@@ -73,9 +188,12 @@ class TripDurationPredictor:
 
         return self._post("validate", kwargs)
 
-    def predict_batch(self, input_json):
+    def predict_batch(self, input_json, response_format="json"):
         """
         Accepts a path to a JSON file or a raw JSON string (list of objects).
+
+        `response_format` is 'json', 'msgpack' (needs msgpack), 'arrow' (needs pyarrow) or 'float32'; the binary
+        formats skip JSON float parsing and return the predictions as a NumPy array.
         """
         try:
             if os.path.exists(input_json):
@@ -86,7 +204,100 @@ class TripDurationPredictor:
         except Exception as e:
             raise ValueError(f"Failed to load batch input: {e}")
 
-        return self._post("predict/batch", batch_data)
+        if response_format not in RESPONSE_FORMATS:
+            raise ValueError(f"Unknown response format '{response_format}'; use one of {', '.join(RESPONSE_FORMATS)}")
+        return decode_response(self._send("predict/batch", batch_data, accept=RESPONSE_FORMATS[response_format]))
+
+    def predict_matrix(self, origins, destinations, vendor_id, passenger_count,
+                       pickup_date, pickup_time, store_and_fwd_flag="N", binary=True):
+        """
+        Accepts origins and destinations as lists of (longitude, latitude) pairs and returns
+        a NumPy array of durations in minutes, shape (len(origins), len(destinations)).
+        """
+        payload = {
+            "origins": [{"longitude": lon, "latitude": lat} for lon, lat in origins],
+            "destinations": [{"longitude": lon, "latitude": lat} for lon, lat in destinations],
+            "vendor_id": vendor_id,
+            "passenger_count": passenger_count,
+            "pickup_date": pickup_date,
+            "pickup_time": pickup_time,
+            "store_and_fwd_flag": store_and_fwd_flag,
+        }
+
+        if not binary:
+            return np.array(self._post("predict/matrix", payload)["durations"])
+
+        response = self._send("predict/matrix", payload, params={"format": "binary"})
+        shape = tuple(int(n) for n in response.headers["X-Matrix-Shape"].split(","))
+        return np.frombuffer(response.content, dtype="<f4").reshape(shape)
+
+    def predict_csv(self, path, destination, model=None):
+        """
+        Uploads a CSV of trips (columns as in `data/split/test.csv`) and streams the predictions CSV
+        to `destination`; neither file is held in memory.
+        """
+        params = {"model": model} if model else None
+        with open(path, "rb") as f:
+            response = requests.post(f"{self.BASE_URL}/predict/csv", data=f, params=params,
+                                     headers={"Content-Type": "text/csv"}, stream=True)
+        with response:
+            response.raise_for_status()
+            with open(destination, "wb") as out:
+                for block in response.iter_content(chunk_size=1 << 20):
+                    out.write(block)
+        return destination
+
+    def submit_job(self, path, upload=True, model=None, idempotency_key=None):
+        """
+        Starts a scoring job for a CSV or Parquet trip file, streamed to the server with `upload`,
+        otherwise referenced by its path under the server's JOB_INPUT_DIR.
+
+        Passing the same `idempotency_key` again (e.g. when retrying) returns the job already created.
+        """
+        headers = {"Idempotency-Key": idempotency_key} if idempotency_key else {}
+        params = {"model": model} if model else None
+        url = f"{self.BASE_URL}/jobs"
+        if upload:
+            parquet = path.endswith((".parquet", ".pq"))
+            headers["Content-Type"] = "application/vnd.apache.parquet" if parquet else "text/csv"
+            with open(path, "rb") as f:
+                response = requests.post(url, data=f, headers=headers, params=params)
+        else:
+            response = requests.post(url, json={"path": path}, headers=headers, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    def get_job(self, job_id):
+        return self._get(f"jobs/{job_id}")
+
+    def wait_for_job(self, job_id, interval=1.0):
+        """
+        Polls a job until it is done (returns its status) or failed (raises RuntimeError).
+        """
+        while (status := self.get_job(job_id))["status"] in ("queued", "running"):
+            time.sleep(interval)
+        if status["status"] == "failed":
+            raise RuntimeError(f"Job {job_id} failed: {status['error']}")
+        return status
+
+    def delete_job(self, job_id):
+        """
+        Deletes a job with its uploaded input and results (stopping it if it is still running).
+        """
+        response = requests.delete(f"{self.BASE_URL}/jobs/{job_id}")
+        response.raise_for_status()
+        return response.json()
+
+    def download_job_results(self, job_id, destination):
+        """
+        Streams the results CSV of a finished job to `destination` without holding it in memory.
+        """
+        with requests.get(f"{self.BASE_URL}/jobs/{job_id}/results", stream=True) as response:
+            response.raise_for_status()
+            with open(destination, "wb") as f:
+                for block in response.iter_content(chunk_size=1 << 20):
+                    f.write(block)
+        return destination
 
     def get_features(self):
         return self._get("features")
@@ -1,22 +1,207 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field, field_validator
-from typing import Literal
+from fastapi import FastAPI, HTTPException, Body, Header, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError, field_validator
+from typing import Annotated, Literal
+from contextlib import asynccontextmanager
+from starlette.background import BackgroundTask
 
 import traceback
-import pandas as pd
+import tempfile
+import threading
+import time
+import json
 import numpy as np
 import re
-import joblib
 
 import os, sys
 sys.path.append(os.path.abspath('../scripts'))
 
-from saved_models_evaluator import load_model
+from aggregate_tables import default_aggregate_table
+from features import (build_features, combine_features, distance_features, parse_pickup_datetime, time_features,
+                      uses_aggregates)
+from model_manager import ModelManager
+from columnar import (FIELDS, MESSAGES, PREDICTION_MESSAGES, clean_columns, row_errors, rule_counts, to_columns,
+                      trip_columns, validate_columns)
+from compression import DecompressionMiddleware
+from formats import negotiate, render
+from isochrone import GRID_BOUNDS, TileCache, durations_json, isochrone_grid, reachable_runs, snap_to_cell, time_bucket
+from jobs import JobManager
+from knn_index import default_knn_index, trip_vectors
+from lanes import PriorityLanes
+from metrics import Metrics
+from model_registry import ModelRegistry
+from shadow import ShadowScorer
+from stacked_scorer import StackedScorer
+from trip_files import OUTPUT_HEADER, CsvStream, file_layout, format_csv, parquet_supported, score_rows
+from warmup import WARMUP_BATCH_SIZES, synthetic_trips
+
+MODEL_PATH = '../models/final_ridge_pipeline'  # flat artifact directory (see scripts/model_artifact.py)
+
+# Seconds between checks of the model artifact for changes (0 disables hot-reload by file watching)
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "5"))
+
+# Every artifact directory in here can be selected per request with `?model=<name>`
+MODELS_DIR = '../models'
+
+# Non-default models kept loaded at once (least recently used ones are unloaded)
+MAX_RESIDENT_MODELS = int(os.getenv("MAX_RESIDENT_MODELS", "3"))
+
+# Holds the active model (memory-mapped, no sklearn import or unpickling) and swaps it on reload
+manager = ModelManager(MODEL_PATH, MODEL_WATCH_INTERVAL)
+
+# Loads the other models lazily by name
+registry = ModelRegistry(MODELS_DIR, manager, MAX_RESIDENT_MODELS)
+
+# Candidate model scored off the request path on default-model traffic (can also be set at /admin/shadow)
+SHADOW_MODEL = os.getenv("SHADOW_MODEL") or None
+# Trips waiting for the shadow worker (memory bound), and trips sampled from a single request
+SHADOW_QUEUE_ROWS = int(os.getenv("SHADOW_QUEUE_ROWS", "100000"))
+SHADOW_SAMPLE_ROWS = int(os.getenv("SHADOW_SAMPLE_ROWS", "2000"))
+shadow = ShadowScorer(registry, SHADOW_QUEUE_ROWS, SHADOW_SAMPLE_ROWS)
+
+# Stacked scorers for recently used ensembles, keyed by the identity of their models
+STACKED_CACHE_SIZE = 8
+stacked_scorers = {}
+manager.on_swap(stacked_scorers.clear)
+
+# How /predict/batch?ensemble=... combines the per-model predictions
+AGGREGATIONS = {"mean": np.mean, "median": np.median, "min": np.min, "max": np.max}
+
+# Request counters served at /metrics
+metrics = Metrics()
+metrics.ratio("batch_dedup_ratio", "batch_unique_trips", "batch_trips", complement=True)
+
+# Largest origins x destinations matrix scored by one /predict/matrix request
+MAX_MATRIX_CELLS = int(os.getenv("MAX_MATRIX_CELLS", "1000000"))
+
+# Most pickup times scored by one /predict/sweep request (a week every minute is 10080)
+MAX_SWEEP_POINTS = int(os.getenv("MAX_SWEEP_POINTS", "20000"))
+
+# Most stops accepted by one /predict/itinerary request
+MAX_ITINERARY_STOPS = int(os.getenv("MAX_ITINERARY_STOPS", "500"))
+
+# Memory for cached isochrone grids, in MB (over the bounding box, a 0.01 degree grid is 60000 float32
+# cells, 240 KB; the finest 0.002 degree grid is 1.5M cells, 6 MB)
+ISOCHRONE_CACHE_MB = float(os.getenv("ISOCHRONE_CACHE_MB", "64"))
+isochrone_tiles = TileCache(int(ISOCHRONE_CACHE_MB * (1 << 20)))
+manager.on_swap(isochrone_tiles.clear)
+metrics.ratio("isochrone_cache_hit_ratio", "isochrone_cache_hits", "isochrone_requests")
+
+# Largest neighbour count of /predict/knn
+MAX_KNN_NEIGHBORS = int(os.getenv("MAX_KNN_NEIGHBORS", "100"))
+
+# Threads of each priority lane: single-trip requests never wait for threads taken by batches,
+# and at most BULK_WORKERS batches use the CPU at once
+INTERACTIVE_WORKERS = int(os.getenv("INTERACTIVE_WORKERS", "4"))
+BULK_WORKERS = int(os.getenv("BULK_WORKERS", "2"))
+LANE_MAX_QUEUE = int(os.getenv("LANE_MAX_QUEUE", "256"))
+
+# Bulk work is scored this many trips at a time, pausing up to BULK_MAX_YIELD_SECONDS
+# between chunks while single-trip requests are pending
+BULK_CHUNK_ROWS = int(os.getenv("BULK_CHUNK_ROWS", "20000"))
+BULK_MAX_YIELD_SECONDS = float(os.getenv("BULK_MAX_YIELD_SECONDS", "0.05"))
+lanes = PriorityLanes(INTERACTIVE_WORKERS, BULK_WORKERS, LANE_MAX_QUEUE, BULK_MAX_YIELD_SECONDS)
+
+# Scoring jobs for whole trip files: their inputs, state and chunked results are kept in JOBS_DIR
+JOBS_DIR = os.getenv("JOBS_DIR", "../jobs")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_CHUNK_ROWS = int(os.getenv("JOB_CHUNK_ROWS", "100000"))
+# Finished jobs (their input upload and results) are deleted this long after they finished
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "168"))
+# Job chunks are scored on the bulk lane, so jobs share its BULK_WORKERS threads with batches and
+# the JOB_WORKERS threads only read and write files
+jobs = JobManager(JOBS_DIR, lambda columns, model: lanes.bulk.call(score_job_chunk, columns, model),
+                  lambda model: resolve_job_model(model), JOB_WORKERS, JOB_CHUNK_ROWS, JOB_RETENTION_HOURS * 3600)
+
+# Largest job input accepted as an upload, in MB
+JOB_MAX_UPLOAD_MB = float(os.getenv("JOB_MAX_UPLOAD_MB", "4096"))
+
+# Jobs may reference files under this directory instead of uploading them
+JOB_INPUT_DIR = os.getenv("JOB_INPUT_DIR", "../data")
+
+# Upload Content-Type of each job input format
+JOB_UPLOAD_FORMATS = {"text/csv": "csv", "application/vnd.apache.parquet": "parquet", "application/x-parquet": "parquet"}
+
+# Trips parsed and scored together by /predict/csv (memory use grows with it, not with the upload)
+CSV_CHUNK_ROWS = int(os.getenv("CSV_CHUNK_ROWS", "50000"))
+
+# /predict/csv results kept in memory up to this size, then in a temporary file
+CSV_SPOOL_BYTES = int(os.getenv("CSV_SPOOL_BYTES", str(16 << 20)))
+
+# Largest /predict/csv upload and spooled results, in MB: the response only starts once the whole
+# upload is scored, so larger files go to /jobs instead
+CSV_MAX_UPLOAD_MB = float(os.getenv("CSV_MAX_UPLOAD_MB", "2048"))
+CSV_MAX_RESULT_MB = float(os.getenv("CSV_MAX_RESULT_MB", "1024"))
+
+# Fixed-width type of each trip field, so identical trips have identical bytes (see `deduplicate`)
+CANONICAL_DTYPES = {
+    "store_and_fwd_flag": "U1",
+    "vendor_id": "i8",
+    "passenger_count": "i8",
+    "pickup_longitude": "f8",
+    "pickup_latitude": "f8",
+    "dropoff_longitude": "f8",
+    "dropoff_latitude": "f8",
+    "pickup_date": "U10",
+    "pickup_time": "U5",
+}
+
+# /health/ready only reports ready once both are set
+readiness = {"model_loaded": False, "warmed_up": False, "warmup_seconds": None, "error": None}
+
+
+def warm_up():
+    """
+    Runs synthetic trips through the request parsing, /predict and /predict/batch
+    code paths at several batch sizes, so the first real requests do not pay for it.
+    """
+    start = time.perf_counter()
+    try:
+        for size in WARMUP_BATCH_SIZES:
+            trip_batch = json.loads(json.dumps(synthetic_trips(size)))
+            # The endpoint functions themselves, not their priority lane wrappers
+            jsonable_encoder(predict.__wrapped__(TripInput(**trip_batch[0])))
+            predict_batch.__wrapped__(trip_batch)
+            predict_batch.__wrapped__(trip_batch, lenient=True)
+
+        readiness["warmup_seconds"] = round(time.perf_counter() - start, 3)
+        readiness["warmed_up"] = True
+        print(f"Warm-up finished in {readiness['warmup_seconds']}s")
+
+        # Started after warm-up so synthetic trips do not end up in the comparison
+        if SHADOW_MODEL:
+            shadow.start(SHADOW_MODEL)
+    except Exception as e:
+        traceback.print_exc()
+        readiness["error"] = str(e)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    default_aggregate_table()  # opened and checked once; an unusable table is logged and ignored
+    manager.reload()
+    readiness["model_loaded"] = True
+    manager.start_watching()
+    jobs.start()  # resumes the jobs a restart left unfinished
 
-MODEL_PATH = '../models/final_ridge_pipeline.pkl'
+    # Warm up in the background so /health/live answers while it runs
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    yield
 
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+app.router.route_class = lanes.route_class()
+
+# Responses at least this large are gzip-compressed for clients sending Accept-Encoding: gzip
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "4096"))
+app.add_middleware(GZipMiddleware, minimum_size=COMPRESS_MIN_BYTES)
+
+# Largest request body accepted once decompressed (Content-Encoding: gzip or zstd)
+MAX_DECOMPRESSED_BYTES = int(os.getenv("MAX_DECOMPRESSED_BYTES", str(1 << 30)))
+app.add_middleware(DecompressionMiddleware, max_size=MAX_DECOMPRESSED_BYTES)
 
 
 class TripInput(BaseModel):
@@ -73,152 +258,153 @@ class TripInput(BaseModel):
         pattern=r"^([01]\d|2[0-3]):([0-5]\d)$"
     )
 
-@app.post("/predict")
-def predict(trip_data: TripInput):
+
+TRIP_BATCH = TypeAdapter(list[TripInput])
+
+
+def validate_trip_batch(trip_batch):
     """
-    Predict the taxi trip duration in minutes based on user-provided trip details.
+    Validates a raw JSON batch as a `list[TripInput]` body.
+
+    Raises:
+    - RequestValidationError, answered with the same 422 FastAPI returns for an invalid body.
+    """
+    try:
+        return TRIP_BATCH.validate_python(trip_batch, from_attributes=True)
+    except ValidationError as e:
+        errors = [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+        raise RequestValidationError(errors, body=trip_batch)
 
-    Parameters:
-        trip_data (TripInput): Input data including vendor ID, passenger count,
-                               pickup/dropoff coordinates, datetime info, etc.
+
+def batch_columns(trip_batch):
+    """
+    Columns of a raw JSON batch, accepting and rejecting exactly what a `list[TripInput]` body does.
+
+    Batches whose trips all pass the vectorized checks of `trip_columns` skip building one
+    TripInput per trip; any other batch goes through `validate_trip_batch`, so invalid
+    batches get the usual 422.
+    """
+    columns = trip_columns(trip_batch)
+    if columns is None:
+        metrics.increment("batch_parse_fallbacks")
+        columns = trips_to_columns(validate_trip_batch(trip_batch))
+    return columns
+
+
+def trips_to_columns(trips):
+    """
+    Transposes a list of validated trips into a dictionary of field name to list of values.
+    """
+    return {field: [getattr(trip, field) for trip in trips] for field in TripInput.model_fields}
+
+
+def deduplicate(columns):
+    """
+    Finds the distinct trips of a batch given as columns.
+
+    Each trip is packed into one fixed-width record of its canonical field values
+    and the records are compared as raw bytes with `np.unique`.
 
     Returns:
-        JSON response containing the predicted trip duration.
+    - (unique_columns, inverse): columns holding each distinct trip once, and the index
+      of every original trip in them (so `results[inverse]` restores request order).
     """
-    try:
-        # parse data into df
-        trip = pd.DataFrame([trip_data.model_dump()])
-
-        # create datetime feature
-        trip["pickup_datetime"] = trip["pickup_date"] + " " + trip["pickup_time"] + ":00"
-        trip["pickup_datetime"] = pd.to_datetime(trip["pickup_datetime"])
-
-        # Using distance formula:
-        # https://www.chegg.com/homework-help/questions-and-answers/point-latitude-373198-point-longitude-121936-point-b-latitude-373185-point-b-longitude-121-q56508606
-
-        R = 6356  # radius of Earth in km
-
-        # Convert degrees to radians
-        lat1 = np.radians(trip["pickup_latitude"])
-        lat2 = np.radians(trip["dropoff_latitude"])
-        lon1 = np.radians(trip["pickup_longitude"])
-        lon2 = np.radians(trip["dropoff_longitude"])
-
-        # x and y components of distance
-        x = R * (lat1 - lat2)
-        y = R * (lon1 - lon2) * np.cos(lat2)
-
-        # Euclidean distance approximation
-        trip["trip_distance"] = np.sqrt(x**2 + y**2)
-        trip["trip_distance_sqrt"] = np.sqrt(np.sqrt(x**2 + y**2))
-        trip["trip_distance_square"] = x**2 + y**2
-        trip["trip_distance_cube"] = (np.sqrt(x**2 + y**2))**3
-
-        trip["log_trip_distance"] = np.log1p(np.sqrt(x**2 + y**2))
-        trip["log_trip_distance_sqrt"] = np.log1p(np.sqrt(np.sqrt(x**2 + y**2)))
-        trip["log_trip_distance_square"] = np.log1p(x**2 + y**2)
-        trip["log_trip_distance_cube"] = np.log1p((np.sqrt(x**2 + y**2))**3)
-
-
-        # Coordinates are taken from Google Maps
-        JFK_LATITUDE_RANGE = [40.620998, 40.683139]
-        JFK_LONGITUDE_RANGE = [-73.841476, -73.729188]
-
-        LG_LATITUDE_RANGE = [40.763557, 40.787499]
-        LG_LONGITUDE_RANGE = [-73.899899, -73.848085]
-
-        # JFK bounding box
-        trip["is_jfk_airport"] = (
-            ((trip["pickup_latitude"].between(JFK_LATITUDE_RANGE[0], JFK_LATITUDE_RANGE[1])) &
-            (trip["pickup_longitude"].between(JFK_LONGITUDE_RANGE[0], JFK_LONGITUDE_RANGE[1])))
-            |
-            ((trip["dropoff_latitude"].between(JFK_LATITUDE_RANGE[0], JFK_LATITUDE_RANGE[1])) &
-            (trip["dropoff_longitude"].between(JFK_LONGITUDE_RANGE[0], JFK_LONGITUDE_RANGE[1])))
-        ).astype("int")
-
-        # LaGuardia bounding box
-        trip["is_lg_airport"] = (
-            ((trip["pickup_latitude"].between(LG_LATITUDE_RANGE[0], LG_LATITUDE_RANGE[1])) &
-            (trip["pickup_longitude"].between(LG_LONGITUDE_RANGE[0], LG_LONGITUDE_RANGE[1])))
-            |
-            ((trip["dropoff_latitude"].between(LG_LATITUDE_RANGE[0], LG_LATITUDE_RANGE[1])) &
-            (trip["dropoff_longitude"].between(LG_LONGITUDE_RANGE[0], LG_LONGITUDE_RANGE[1])))
-        ).astype("int")
-
-
-        from scipy.stats import hmean
-
-        geo_columns = geo_columns = ['pickup_longitude', 'pickup_latitude', 'dropoff_longitude', 'dropoff_latitude']
-
-        # Ensure geo_features is a 2D NumPy array (shape: [n_samples, n_features])
-        geo_array = trip[geo_columns].to_numpy()
-
-        # axis = 1 ensures row wise operations
-        trip['coord_arithmetic_mean'] = np.mean(geo_array, axis=1)
-        trip['coord_harmonic_mean'] = hmean(np.abs(geo_array), axis=1)
-        trip['coord_square_sum'] = np.sum(geo_array ** 2, axis=1)
-
-        trip['month'] = trip.pickup_datetime.dt.month
-        trip['weekday'] = trip.pickup_datetime.dt.weekday
-        trip['hour'] = trip.pickup_datetime.dt.hour
-        trip['minute'] = trip.pickup_datetime.dt.minute
-
-
-        def get_season(month):
-            if month in [12, 1, 2]:
-                return 0  # Winter
-            elif month in [3, 4, 5]:
-                return 1  # Spring
-            elif month in [6, 7, 8]:
-                return 2  # Summer
-            else:
-                return 3  # Fall (September, October, November)
+    n = len(columns["pickup_date"])
+    records = np.empty(n, dtype=list(CANONICAL_DTYPES.items()))
+    for field in CANONICAL_DTYPES:
+        records[field] = columns[field]
 
-        trip['season'] = trip['month'].apply(get_season)
+    keys = records.view(np.dtype((np.void, records.dtype.itemsize)))
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    unique = records[first]
+    return {field: unique[field] for field in CANONICAL_DTYPES}, inverse.reshape(-1)
 
 
-        trip["is_summer"] = (trip["season"] == 2).astype("int")
-        trip["is_rush_hour"] = ((trip["hour"].between(7, 9)) | (trip["hour"].between(13, 19))).astype("int")
-        trip["is_night"] = ((trip["hour"] > 1) & (trip["hour"] < 6)).astype("int")
-        trip["is_weekend"] =  ((trip["weekday"] // 5) == 1).astype("int")
+def check_model(model_name):
+    """
+    Raises a 404 if a model selector does not name an artifact in MODELS_DIR.
+    """
+    if model_name is not None and model_name != registry.default_name and model_name not in registry.available():
+        raise HTTPException(status_code=404, detail=f"Unknown model '{model_name}'. See /models for available models.")
 
 
-        BASE_SPEED = 32
+def predict_columns(columns, model_name=None):
+    """
+    Builds features for trips given as columns and predicts their durations in minutes.
+    """
+    with registry.acquire(model_name) as model:
+        trips = build_features(columns, model.header["preprocessing"]["virtual_time_distance"], uses_aggregates(model))
+        start = time.perf_counter()
+        trip_duration = model.predict_duration(trips)
 
-        trip['virtual_speed'] = BASE_SPEED / (2 ** (
-                                (trip['is_jfk_airport'] | trip["is_lg_airport"]).astype("int") + # cast bool to int
-                                (trip['is_rush_hour']).astype("int") +
-                                (trip['is_summer']).astype("int") + 
-                                (trip['store_and_fwd_flag'] == 'Y').astype("int")
-                                ))
+        if model_name is None or model_name == registry.default_name:
+            shadow.submit(trips, trip_duration, time.perf_counter() - start)
+        return minutes(trip_duration)
 
-        trip['virtual_time'] = trip['log_trip_distance'] / trip['virtual_speed']
 
-        # Adding the cubes
-        trip["virtual_time_dist_sqrt"] = trip['trip_distance_sqrt'] / trip['virtual_speed']
+def stacked_scorer(models):
+    """
+    Returns the StackedScorer of a list of models, reusing it while the same models stay loaded.
+    """
+    key = tuple(id(model) for model in models)
+    if key not in stacked_scorers:
+        if len(stacked_scorers) >= STACKED_CACHE_SIZE:
+            stacked_scorers.pop(next(iter(stacked_scorers)))
+        stacked_scorers[key] = StackedScorer(models)  # holds the models, so their ids stay unique
+    return stacked_scorers[key]
 
 
-        def drop_col(df, col):
-            if col in df.columns:
-                df.drop(col, axis=1, inplace=True)
-            else:
-                print(f"[Warning] Column not found: {col}")
-            return df
+def predict_ensemble(columns, model_names, aggregate="mean"):
+    """
+    Scores trips with several compatible models at once (one feature build, one matrix multiply).
+
+    Returns:
+    - (predictions, by_model): aggregated durations in minutes, or those of the first model
+      if `aggregate` is 'none', and a dictionary of model name to its own predictions.
+    """
+    with registry.acquire_many(model_names) as models:
+        scorer = stacked_scorer(models)
+        trips = build_features(columns, models[0].header["preprocessing"]["virtual_time_distance"],
+                               any(uses_aggregates(model) for model in models))
+        durations = scorer.predict_duration(trips)
+
+    by_model = {name: minutes(durations[:, j]) for j, name in enumerate(model_names)}
+    if aggregate == "none":
+        return by_model[model_names[0]], by_model
+    return minutes(AGGREGATIONS[aggregate](durations, axis=1)), by_model
+
+
+def minutes(trip_duration):
+    """
+    Converts predicted durations in seconds to minutes (rounded as returned by the API), as an array.
+    """
+    return np.round(np.round(trip_duration) / 60, 2)
 
-        cols_to_drop = [ 
-                            'pickup_time', 'pickup_date', 'pickup_datetime', 'store_and_fwd_flag',
-                            'dropoff_latitude', 'dropoff_longitude', 'pickup_latitude', 'pickup_longitude', 
-                            'is_weekend', 'is_rush_hour', 'is_summer', 'is_night', 'virtual_speed', 
-                        ] 
 
-        for col in cols_to_drop:
-            trip = drop_col(trip, col)
+def to_minutes(trip_duration):
+    """
+    Converts predicted durations in seconds to minutes (rounded as returned by the API).
+    """
+    return minutes(trip_duration).tolist()
 
 
-        model_pipeline, _ = load_model(MODEL_PATH)
-        log_trip_duration = model_pipeline.predict(trip)[0]
-        trip_duration = np.expm1(log_trip_duration).round()
-        trip_duration_minutes = round(trip_duration / 60, 2)
+@app.post("/predict")
+@lanes.route("interactive")
+def predict(trip_data: TripInput, model: str | None = None):
+    """
+    Predict the taxi trip duration in minutes based on user-provided trip details.
+
+    Parameters:
+        trip_data (TripInput): Input data including vendor ID, passenger count,
+                               pickup/dropoff coordinates, datetime info, etc.
+        model (str, optional): Name of the model to use (see /models); defaults to the active model.
+
+    Returns:
+        JSON response containing the predicted trip duration.
+    """
+    check_model(model)
+    try:
+        trip_duration_minutes = float(predict_columns(trips_to_columns([trip_data]), model)[0])
 
         return {"trip_duration": trip_duration_minutes}
     
@@ -227,8 +413,17 @@ def predict(trip_data: TripInput):
         raise HTTPException(status_code=400, detail=str(e))
     
 
-@app.post("/predict/batch")
-def predict_batch(trip_batch: list[TripInput]):
+# The body is parsed into columns (see batch_columns), not into TripInput models, so its item
+# schema is declared here for /docs and client generators
+BATCH_BODY_SCHEMA = {"type": "array", "title": "Trip Batch", "items": {"$ref": "#/components/schemas/TripInput"}}
+
+
+@app.post("/predict/batch",
+          openapi_extra={"requestBody": {"content": {"application/json": {"schema": BATCH_BODY_SCHEMA}}}})
+@lanes.route("bulk")
+def predict_batch(trip_batch: list = Body(...), model: str | None = None, ensemble: str | None = None,
+                  aggregate: Literal['mean', 'median', 'min', 'max', 'none'] = 'mean', lenient: bool = False,
+                  accept: Annotated[str | None, Header()] = None):
     """
     Predict taxi trip durations (in minutes) for a batch of trips.
 
@@ -236,22 +431,770 @@ def predict_batch(trip_batch: list[TripInput]):
         trip_batch (List[TripInput]): A list of input records, each including vendor ID,
                                       passenger count, pickup/dropoff coordinates, 
                                       datetime info, and other trip features.
+        model (str, optional): Name of the model to use (see /models); defaults to the active model.
+        ensemble (str, optional): Comma-separated model names scored together instead of `model`.
+                                  The models must share the same target and feature variant.
+        aggregate (str): How ensemble predictions are combined ('mean', 'median', 'min', 'max'),
+                         or 'none' to return the first model's predictions with the others
+                         alongside (shadow evaluation).
+        lenient (bool): Score the valid trips and report the invalid ones per row instead of
+                        rejecting the whole batch with a 422.
+        accept (str): Response format: JSON (default), MessagePack, Arrow IPC or raw float32
+                      (see formats.py).
 
     Returns:
         JSON response containing a list of predicted trip durations corresponding 
-        to each input trip in the batch.
+        to each input trip in the batch. With `ensemble`, also the predictions of each model.
+        With `lenient`, invalid trips get a null prediction and an entry in `errors`.
+    """
+    media_type = negotiate(accept)
+    if ensemble is not None:
+        if model is not None:
+            raise HTTPException(status_code=400, detail="Use either `model` or `ensemble`, not both.")
+        model_names = list(dict.fromkeys(name.strip() for name in ensemble.split(",") if name.strip()))
+        if not model_names:
+            raise HTTPException(status_code=400, detail="`ensemble` must name at least one model.")
+        for name in model_names:
+            check_model(name)
+
+    if lenient:
+        # Every rule is a mask over a column; only the rows passing all of them are scored
+        columns, n = to_columns([trip if isinstance(trip, dict) else {} for trip in trip_batch])
+        masks = validate_columns(columns, prediction=True)
+        rows = np.flatnonzero(masks == 0)
+        columns = clean_columns(columns, rows)
+        metrics.increment("batch_invalid_trips", n - len(rows))
+    else:
+        columns = batch_columns(trip_batch)
+
+    try:
+        # Fleet simulations send many identical trips: score each distinct one once
+        columns, inverse = deduplicate(columns)
+        metrics.increment("batch_requests")
+        metrics.increment("batch_trips", len(inverse))
+        metrics.increment("batch_unique_trips", len(columns["pickup_date"]))
+
+        if ensemble is None:
+            results = np.concatenate(in_chunks(lambda chunk: predict_columns(chunk, model), columns))
+            response = {"predictions": scatter(results, inverse)}
+        else:
+            chunks = in_chunks(lambda chunk: predict_ensemble(chunk, model_names, aggregate), columns)
+            results = np.concatenate([predictions for predictions, _ in chunks])
+            by_model = {name: np.concatenate([chunk_by_model[name] for _, chunk_by_model in chunks])
+                        for name in model_names}
+            response = {"predictions": scatter(results, inverse), "aggregate": aggregate,
+                        "models": {name: scatter(values, inverse) for name, values in by_model.items()}}
+
+        if lenient:
+            response["predictions"] = align(response["predictions"], rows, n)
+            if ensemble is not None:
+                response["models"] = {name: align(values, rows, n) for name, values in response["models"].items()}
+            response["errors"] = row_errors(masks, PREDICTION_MESSAGES)
+            response["invalid"] = n - len(rows)
+        return render(response, media_type)
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def in_chunks(score, columns):
+    """
+    Calls `score` on BULK_CHUNK_ROWS trips of the columns at a time, giving way to pending
+    single-trip requests between chunks (see PriorityLanes).
+
+    Returns:
+    - The result of every chunk, in order (one chunk for an empty batch).
+    """
+    n = len(columns["pickup_date"])
+    results = []
+    for start in range(0, max(n, 1), BULK_CHUNK_ROWS):
+        if start:
+            lanes.yield_to_interactive()
+        results.append(score({field: values[start:start + BULK_CHUNK_ROWS] for field, values in columns.items()}))
+    return results
+
+
+def align(values, rows, n):
+    """
+    Places the predictions of the scored rows at their positions in a batch of n trips (NaN elsewhere,
+    rendered as null in JSON).
+    """
+    aligned = np.full(n, np.nan)
+    aligned[rows] = values
+    return aligned
+
+
+def scatter(results, inverse):
+    """
+    Expands predictions of the distinct trips back to one per requested trip, in request order.
+    """
+    return np.asarray(results)[inverse]
+
+
+class Location(BaseModel):
+    longitude: float = Field(
+        title="Longitude (-75 to -73)",
+        gt=-75,
+        lt=-73
+    )
+
+    latitude: float = Field(
+        title="Latitude (40 to 43)",
+        gt=40,
+        lt=43
+    )
+
+
+class TripContext(BaseModel):
+    """
+    Trip details shared by every trip scored by /predict/matrix and /predict/sweep.
+    """
+    store_and_fwd_flag: Literal['Y', 'N'] = Field(default='N', title="Store and Forward Flag ('Y' or 'N')")
+
+    @field_validator('store_and_fwd_flag', mode='before')
+    @classmethod
+    def capitalize_flag(cls, v: str) -> str:
+        return v.upper()
+
+    vendor_id: int = Field(
+        title="Vendor ID (1 or 2)",
+        gt=0,
+        lt=3
+    )
+
+    passenger_count: int = Field(
+        title="Number of Passengers (1 to 6)",
+        gt=0,
+        lt=7
+    )
+
+
+class MatrixInput(TripContext):
+    origins: list[Location] = Field(title="Pickup locations (e.g. taxis)", min_length=1)
+    destinations: list[Location] = Field(title="Dropoff locations (e.g. waiting passengers)", min_length=1)
+
+    pickup_date: str = Field(
+        title="Pickup Date (YYYY-MM-DD)",
+        pattern=r"^\d{4}-\d{2}-\d{2}$"
+    )
+
+    pickup_time: str = Field(
+        title="Pickup Time (HH:MM in 24-hour format)",
+        pattern=r"^([01]\d|2[0-3]):([0-5]\d)$"
+    )
+
+
+@app.post("/predict/matrix")
+@lanes.route("bulk")
+def predict_matrix(matrix_input: MatrixInput, model: str | None = None,
+                   format: Literal['json', 'binary'] = 'json'):
+    """
+    Predict trip durations (in minutes) from every origin to every destination.
+
+    Distance features are computed for all pairs at once by broadcasting origins (N, 1)
+    against destinations (1, M); time features are computed once for the shared pickup time.
+
+    Parameters:
+        matrix_input (MatrixInput): Origins, destinations and the trip details they share.
+        model (str, optional): Name of the model to use (see /models); defaults to the active model.
+        format (str): 'json' for nested lists, or 'binary' for a row-major little-endian
+                      float32 array (shape in the X-Matrix-Shape header).
+
+    Returns:
+        N x M matrix of predicted trip durations, row i for origin i.
+    """
+    check_model(model)
+    shape = (len(matrix_input.origins), len(matrix_input.destinations))
+    if shape[0] * shape[1] > MAX_MATRIX_CELLS:
+        raise HTTPException(status_code=400, detail=f"Matrix has more than {MAX_MATRIX_CELLS} cells.")
+
+    try:
+        origins = np.array([(o.longitude, o.latitude) for o in matrix_input.origins])
+        destinations = np.array([(d.longitude, d.latitude) for d in matrix_input.destinations])
+
+        distance = distance_features(origins[:, 0:1], origins[:, 1:2],
+                                     destinations[None, :, 0], destinations[None, :, 1])
+        time = time_features(parse_pickup_datetime(matrix_input.pickup_date, matrix_input.pickup_time))
+
+        with registry.acquire(model) as selected:
+            trips = combine_features(distance, time, matrix_input.store_and_fwd_flag, matrix_input.vendor_id,
+                                     matrix_input.passenger_count,
+                                     selected.header["preprocessing"]["virtual_time_distance"],
+                                     uses_aggregates(selected))
+            trip_duration = np.broadcast_to(selected.predict_duration(trips), shape)
+
+        minutes = np.round(np.round(trip_duration) / 60, 2)
+        metrics.increment("matrix_requests")
+        metrics.increment("matrix_cells", minutes.size)
+
+        if format == "binary":
+            return Response(content=minutes.astype("<f4").tobytes(), media_type="application/octet-stream",
+                            headers={"X-Matrix-Shape": f"{shape[0]},{shape[1]}"})
+        # Rendered directly: jsonable_encoder would walk every cell of the plain lists
+        return JSONResponse({"shape": list(shape), "durations": minutes.tolist()})
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+class SweepInput(TripContext):
+    origin: Location = Field(title="Pickup location")
+    destination: Location = Field(title="Dropoff location")
+
+    start_date: str = Field(
+        title="First Pickup Date (YYYY-MM-DD)",
+        pattern=r"^\d{4}-\d{2}-\d{2}$"
+    )
+
+    start_time: str = Field(
+        default="00:00",
+        title="First Pickup Time (HH:MM in 24-hour format)",
+        pattern=r"^([01]\d|2[0-3]):([0-5]\d)$"
+    )
+
+    end_date: str = Field(
+        title="Last Pickup Date (YYYY-MM-DD)",
+        pattern=r"^\d{4}-\d{2}-\d{2}$"
+    )
+
+    end_time: str = Field(
+        default="23:59",
+        title="Last Pickup Time (HH:MM in 24-hour format, inclusive)",
+        pattern=r"^([01]\d|2[0-3]):([0-5]\d)$"
+    )
+
+    step_minutes: int = Field(
+        default=15,
+        title="Minutes between pickup times",
+        gt=0
+    )
+
+
+@app.post("/predict/sweep")
+@lanes.route("bulk")
+def predict_sweep(sweep_input: SweepInput, model: str | None = None):
+    """
+    Predict the duration (in minutes) of one trip for every pickup time in a date range.
+
+    Distance features are computed once for the origin/destination pair; only the
+    time-derived features (hour, month, season, rush hour, virtual speed and time, ...)
+    vary, and they are broadcast against the single distance in one model call.
+
+    Parameters:
+        sweep_input (SweepInput): The trip, the first and last pickup date/time and the step.
+        model (str, optional): Name of the model to use (see /models); defaults to the active model.
+
+    Returns:
+        JSON with the pickup times, the predicted duration for each, and the fastest pickup time.
+    """
+    check_model(model)
+    try:
+        start = parse_pickup_datetime(sweep_input.start_date, sweep_input.start_time)
+        end = parse_pickup_datetime(sweep_input.end_date, sweep_input.end_time)
+        if end < start:
+            raise ValueError("The end of the sweep is before its start.")
+
+        points = (end - start) // np.timedelta64(sweep_input.step_minutes, "m") + 1
+        if points > MAX_SWEEP_POINTS:
+            raise ValueError(f"Sweep has {points} pickup times, more than {MAX_SWEEP_POINTS}; use a larger step.")
+
+        pickup_times = start + np.arange(points) * np.timedelta64(sweep_input.step_minutes, "m")
+        distance = distance_features(sweep_input.origin.longitude, sweep_input.origin.latitude,
+                                     sweep_input.destination.longitude, sweep_input.destination.latitude)
+
+        with registry.acquire(model) as selected:
+            trips = combine_features(distance, time_features(pickup_times), sweep_input.store_and_fwd_flag,
+                                     sweep_input.vendor_id, sweep_input.passenger_count,
+                                     selected.header["preprocessing"]["virtual_time_distance"],
+                                     uses_aggregates(selected))
+            durations = to_minutes(selected.predict_duration(trips))
+
+        metrics.increment("sweep_requests")
+        metrics.increment("sweep_points", len(durations))
+
+        best = int(np.argmin(durations))
+        labels = np.datetime_as_string(pickup_times, unit="m").tolist()
+        return {
+            "pickup_times": labels,
+            "durations": durations,
+            "fastest": {"pickup_time": labels[best], "trip_duration": durations[best]},
+        }
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+class IsochroneInput(TripContext):
+    origin: Location = Field(title="Pickup location")
+
+    pickup_date: str = Field(
+        title="Pickup Date (YYYY-MM-DD)",
+        pattern=r"^\d{4}-\d{2}-\d{2}$"
+    )
+
+    pickup_time: str = Field(
+        title="Pickup Time (HH:MM in 24-hour format)",
+        pattern=r"^([01]\d|2[0-3]):([0-5]\d)$"
+    )
+
+    cell_degrees: float = Field(
+        default=0.01,
+        title="Grid cell size in degrees",
+        ge=0.002,
+        le=0.5
+    )
+
+    levels: list[float] = Field(
+        default=[],
+        title="Minutes thresholds; the cells reachable within each are returned as row runs"
+    )
+
+
+@app.post("/isochrone")
+@lanes.route("bulk")
+def isochrone(isochrone_input: IsochroneInput, model: str | None = None,
+              format: Literal['json', 'binary'] = 'json'):
+    """
+    Predict the duration (in minutes) from an origin to every cell of a lat/lon grid
+    over the accepted bounding box (-75..-73, 40..43), e.g. for "reachable within N minutes" maps.
+
+    The origin is snapped to the center of its grid cell and the pickup time is rounded down
+    to a 15 minute bucket, so nearby requests share a grid; grids are kept in an LRU cache.
+
+    Parameters:
+        isochrone_input (IsochroneInput): Origin, pickup date/time, grid resolution,
+                                          minutes levels and the shared trip fields.
+        model (str, optional): Name of the model to use (see /models); defaults to the active model.
+        format (str): 'json', or 'binary' for the grid as row-major little-endian float32
+                      (shape in X-Grid-Shape, bounds in X-Grid-Bounds).
+
+    Returns:
+        JSON with the grid (row 0 at the southern edge) and, for each level, the reachable
+        cells as [row, first_column, last_column + 1] runs.
+    """
+    check_model(model)
+    try:
+        cell_degrees = isochrone_input.cell_degrees
+        origin_cell = snap_to_cell(isochrone_input.origin.longitude, isochrone_input.origin.latitude, cell_degrees)
+        pickup = time_bucket(parse_pickup_datetime(isochrone_input.pickup_date, isochrone_input.pickup_time))
+        context = (isochrone_input.store_and_fwd_flag, isochrone_input.vendor_id, isochrone_input.passenger_count)
+
+        metrics.increment("isochrone_requests")
+        with registry.acquire(model) as selected:
+            # Keyed by the model version: a grid computed while the model is swapped cannot be served for the new one
+            key = (selected.version, origin_cell, str(pickup), context, cell_degrees)
+            grid = isochrone_tiles.get(key)
+            if grid is None:
+                grid = isochrone_grid(selected, origin_cell, pickup, context, cell_degrees)
+                isochrone_tiles.put(key, grid)
+            else:
+                metrics.increment("isochrone_cache_hits")
+
+        if format == "binary":
+            return Response(content=grid.astype("<f4").tobytes(), media_type="application/octet-stream",
+                            headers={"X-Grid-Shape": f"{grid.shape[0]},{grid.shape[1]}",
+                                     "X-Grid-Bounds": ",".join(str(b) for b in GRID_BOUNDS)})
+        # Rendered without jsonable_encoder, and the durations only once per cached grid
+        durations = isochrone_tiles.rendered(key, lambda: durations_json(grid))
+        body = json.dumps({
+            "bounds": list(GRID_BOUNDS),
+            "cell_degrees": cell_degrees,
+            "shape": list(grid.shape),
+            "origin_cell": {"column": origin_cell[0], "row": origin_cell[1]},
+            "time_bucket": str(pickup),
+            "reachable": {f"{level:g}": reachable_runs(grid, level) for level in isochrone_input.levels},
+        }).encode()
+        return Response(content=body[:-1] + b', "durations": ' + durations + b"}", media_type="application/json")
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+class ItineraryInput(TripContext):
+    stops: list[Location] = Field(title="Ordered stops; leg i goes from stop i to stop i + 1", min_length=2)
+
+    start_date: str = Field(
+        title="Pickup Date at the first stop (YYYY-MM-DD)",
+        pattern=r"^\d{4}-\d{2}-\d{2}$"
+    )
+
+    start_time: str = Field(
+        title="Pickup Time at the first stop (HH:MM in 24-hour format)",
+        pattern=r"^([01]\d|2[0-3]):([0-5]\d)$"
+    )
+
+    dwell_minutes: float = Field(
+        default=0,
+        title="Minutes spent at each intermediate stop",
+        ge=0
+    )
+
+
+def schedule_legs(model, distance, start, dwell_seconds, context):
+    """
+    Finds the pickup time and duration of every leg of an itinerary.
+
+    Each leg departs when the previous one arrives (plus the dwell time), and its
+    duration depends on that departure time. All legs are first scored at the start
+    time; pickup times are then advanced by the predicted durations and only the legs
+    whose pickup minute changed are rescored, until no pickup time changes. Since a leg
+    only depends on the legs before it, this takes at most one pass per leg.
+
+    Parameters:
+    - model: The ModelArtifact to score with.
+    - distance: `distance_features` of all legs (1-D arrays, one entry per leg).
+    - start: datetime64[m] pickup time of the first leg.
+    - dwell_seconds: Time spent at each intermediate stop.
+    - context: (store_and_fwd_flag, vendor_id, passenger_count).
+
+    Returns:
+    - (offsets, durations, passes, scored): departure of each leg in seconds after `start`,
+      leg durations in seconds, number of scoring passes and total legs scored.
+    """
+    virtual_time_distance = model.header["preprocessing"]["virtual_time_distance"]
+    n = len(distance["trip_distance"])
+    durations = np.zeros(n)
+    offsets = np.zeros(n)
+    pickups = np.full(n, start)
+    changed = np.arange(n)
+    passes = scored = 0
+
+    while len(changed) and passes <= n:
+        legs = {name: values[changed] for name, values in distance.items()}
+        trips = combine_features(legs, time_features(pickups[changed]), *context, virtual_time_distance,
+                                 uses_aggregates(model))
+        durations[changed] = np.round(model.predict_duration(trips))
+        passes += 1
+        scored += len(changed)
+
+        offsets[1:] = np.cumsum(durations[:-1] + dwell_seconds)
+        new_pickups = start + (offsets // 60).astype("timedelta64[m]")
+        changed = np.flatnonzero(new_pickups != pickups)
+        pickups = new_pickups
+
+    return offsets, durations, passes, scored
+
+
+@app.post("/predict/itinerary")
+@lanes.route("interactive")
+def predict_itinerary(itinerary_input: ItineraryInput, model: str | None = None):
     """
+    Predict per-leg and cumulative durations (in minutes) of a multi-stop route.
+
+    Every leg's pickup time is the previous leg's arrival (plus `dwell_minutes`); legs are
+    scored in vectorized passes and only legs whose pickup minute moved are rescored.
+
+    Parameters:
+        itinerary_input (ItineraryInput): Ordered stops, the start date/time at the first stop,
+                                          dwell time and the shared trip fields.
+        model (str, optional): Name of the model to use (see /models); defaults to the active model.
+
+    Returns:
+        JSON with each leg's pickup time, duration and arrival, and the total duration.
+    """
+    check_model(model)
+    if len(itinerary_input.stops) > MAX_ITINERARY_STOPS:
+        raise HTTPException(status_code=400, detail=f"Itinerary has more than {MAX_ITINERARY_STOPS} stops.")
+
     try:
-        results = []
+        stops = np.array([(stop.longitude, stop.latitude) for stop in itinerary_input.stops])
+        distance = distance_features(stops[:-1, 0], stops[:-1, 1], stops[1:, 0], stops[1:, 1])
+        start = parse_pickup_datetime(itinerary_input.start_date, itinerary_input.start_time)
+        context = (itinerary_input.store_and_fwd_flag, itinerary_input.vendor_id, itinerary_input.passenger_count)
+
+        with registry.acquire(model) as selected:
+            offsets, durations, passes, scored = schedule_legs(selected, distance, start,
+                                                               itinerary_input.dwell_minutes * 60, context)
+
+        metrics.increment("itinerary_requests")
+        metrics.increment("itinerary_legs", len(durations))
+        metrics.increment("itinerary_legs_scored", scored)
+
+        arrivals = offsets + durations
+        pickup_times = np.datetime_as_string(start + (offsets // 60).astype("timedelta64[m]"), unit="m")
+        arrival_times = np.datetime_as_string(start + (arrivals // 60).astype("timedelta64[m]"), unit="m")
+        leg_minutes = to_minutes(durations)
+        arrival_minutes = to_minutes(arrivals)
+
+        return {
+            "legs": [
+                {
+                    "from_stop": i,
+                    "to_stop": i + 1,
+                    "pickup_time": pickup_times[i],
+                    "trip_duration": leg_minutes[i],
+                    "arrival_time": arrival_times[i],
+                    "minutes_since_start": arrival_minutes[i],
+                }
+                for i in range(len(durations))
+            ],
+            "total_duration": arrival_minutes[-1],
+            "passes": passes,
+        }
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/predict/knn")
+@lanes.route("bulk")
+def predict_knn(trip_batch: list[TripInput], k: int = 10, accept: Annotated[str | None, Header()] = None):
+    """
+    Estimate trip durations (in minutes) from the k most similar historical trips.
+
+    Trips are compared on pickup and dropoff location and time of week using the index
+    built by `scripts/knn_index.py`; the estimate does not involve the trained models.
+
+    Parameters:
+        trip_batch (List[TripInput]): A list of input records.
+        k (int): Number of historical trips per estimate.
+        accept (str): Response format, as for /predict/batch.
+
+    Returns:
+        JSON with one estimate per trip and the mean distance (in normalized km) to its neighbours.
+    """
+    media_type = negotiate(accept)
+    index = default_knn_index()
+    if index is None:
+        raise HTTPException(status_code=503, detail="kNN index not built. Run `python knn_index.py build` in scripts/.")
+    if not 1 <= k <= MAX_KNN_NEIGHBORS:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {MAX_KNN_NEIGHBORS}.")
+
+    try:
+        columns = trips_to_columns(trip_batch)
+        calendar = time_features(parse_pickup_datetime(columns["pickup_date"], columns["pickup_time"]))
+        vectors = trip_vectors(columns["pickup_longitude"], columns["pickup_latitude"],
+                               columns["dropoff_longitude"], columns["dropoff_latitude"],
+                               calendar["dayofweek"], calendar["hour"], calendar["minute"])
+        trip_duration, distance = index.estimate(vectors, k)
+
+        metrics.increment("knn_requests")
+        metrics.increment("knn_trips", len(vectors))
+        return render({"predictions": minutes(trip_duration),
+                       "mean_neighbor_distance_km": np.round(distance, 3), "k": k}, media_type)
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def score_csv_chunk(ids, columns, model):
+    """
+    Scores one chunk of a /predict/csv upload and returns its output CSV lines (as bytes)
+    and its number of invalid rows.
+    """
+    lanes.yield_to_interactive()
+    predictions, masks = score_rows(columns, lambda clean: predict_columns(clean, model))
+    metrics.increment("csv_trips", len(masks))
+    return format_csv(ids, predictions, masks).encode(), int((masks != 0).sum())
+
+
+@app.post("/predict/csv")
+async def predict_csv(request: Request, model: str | None = None, chunk_rows: int = CSV_CHUNK_ROWS):
+    """
+    Predicts every trip of a CSV upload with the columns of `data/split/test.csv` (or the TripInput fields).
 
-        for trip in trip_batch:
-            results.append(predict(trip)["trip_duration"])
+    The body is parsed as it arrives, `chunk_rows` lines at a time with explicit dtypes, and each
+    chunk is validated and scored before the next one is read, so memory is bounded by the chunk
+    size. Results are spooled (to a temporary file once larger than CSV_SPOOL_BYTES) and streamed
+    back once the upload is complete, as clients usually finish sending before they read.
+    Uploads over CSV_MAX_UPLOAD_MB or results over CSV_MAX_RESULT_MB are rejected with a 413
+    pointing to /jobs, which scores files of any size in the background.
 
-        return {"predictions": results}
+    Parameters:
+        model (str, optional): Name of the model to use (see /models). Defaults to the active model.
+        chunk_rows (int): Trips parsed and scored together.
+
+    Returns:
+        CSV with `id`, `predicted_minutes` (empty for invalid rows) and `invalid_fields` per input row,
+        and the X-Rows and X-Invalid-Rows headers.
+    """
+    check_model(model)
+    if chunk_rows < 1:
+        raise HTTPException(status_code=400, detail="chunk_rows must be at least 1.")
+
+    max_upload, max_result = int(CSV_MAX_UPLOAD_MB * (1 << 20)), int(CSV_MAX_RESULT_MB * (1 << 20))
+    if int(request.headers.get("content-length") or 0) > max_upload:
+        raise HTTPException(status_code=413, detail=f"Uploads are limited to {CSV_MAX_UPLOAD_MB:g} MB; "
+                                                    "score larger files with POST /jobs.")
+    csv_stream = CsvStream(chunk_rows)
+
+    async def chunks():
+        received = 0
+        async for block in request.stream():
+            received += len(block)
+            if received > max_upload:
+                raise HTTPException(status_code=413, detail=f"Uploads are limited to {CSV_MAX_UPLOAD_MB:g} MB; "
+                                                            "score larger files with POST /jobs.")
+            for chunk in csv_stream.feed(block):
+                yield chunk
+        for chunk in csv_stream.finish():
+            yield chunk
+
+    output = tempfile.SpooledTemporaryFile(max_size=CSV_SPOOL_BYTES)
+    output.write(OUTPUT_HEADER.encode())
+    invalid = 0
+    try:
+        async for ids, columns in chunks():
+            # Scored in the bulk lane, off the event loop
+            lines, chunk_invalid = await lanes.bulk.run(score_csv_chunk, ids, columns, model)
+            if output.tell() + len(lines) > max_result:
+                raise HTTPException(status_code=413, detail=f"Results exceed {CSV_MAX_RESULT_MB:g} MB; "
+                                                            "score this file with POST /jobs.")
+            output.write(lines)
+            invalid += chunk_invalid
+    except HTTPException:
+        output.close()
+        raise
     except Exception as e:
+        output.close()
         traceback.print_exc()
         raise HTTPException(status_code=400, detail=str(e))
 
+    metrics.increment("csv_requests")
+    output.seek(0)
+    return StreamingResponse(iter(lambda: output.read(1 << 20), b""), media_type="text/csv",
+                             headers={"X-Rows": str(csv_stream.rows), "X-Invalid-Rows": str(invalid)},
+                             background=BackgroundTask(output.close))
+
+
+def resolve_job_model(model_name):
+    """
+    The model a job is scored with: (name, version, ModelArtifact), the active model for None.
+    The artifact is kept by the job, so a later hot swap does not change its results.
+    """
+    with registry.acquire(model_name) as model:
+        return model_name or registry.default_name, model.version, model
+
+
+def score_job_chunk(columns, model):
+    """
+    Predicts the valid trips of one chunk of a job (see JobManager) in minutes with the job's model.
+    Runs on the bulk lane.
+    """
+    lanes.yield_to_interactive()
+    metrics.increment("job_chunks")
+    metrics.increment("job_trips", len(columns["pickup_date"]))
+    trips = build_features(columns, model.header["preprocessing"]["virtual_time_distance"], uses_aggregates(model))
+    return minutes(model.predict_duration(trips))
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(request: Request, model: str | None = None, chunk_rows: int | None = None,
+                     idempotency_key: Annotated[str | None, Header()] = None):
+    """
+    Starts scoring a whole trip file in the background, chunk by chunk.
+
+    The file is uploaded as the body (`Content-Type: text/csv` or `application/vnd.apache.parquet`)
+    or referenced with a JSON body {"path": "split/test.csv"} relative to JOB_INPUT_DIR. It has the
+    columns of `data/split/test.csv` (or the TripInput fields); invalid rows get no prediction.
+
+    Uploads are limited to JOB_MAX_UPLOAD_MB (413 beyond). The model is pinned when the job is
+    created: every chunk is scored by the same version, reported as `model_version`.
+
+    Parameters:
+        model (str, optional): Name of the model to use (see /models). Defaults to the active model.
+        chunk_rows (int, optional): Trips scored and saved together (default JOB_CHUNK_ROWS).
+        idempotency_key (str, optional): `Idempotency-Key` header; a retry with the same key
+            returns the job created first instead of starting another one.
+
+    Returns:
+        JSON job status (202 for a new job, 200 for the existing job of an idempotency key).
+    """
+    check_model(model)
+    if chunk_rows is not None and chunk_rows < 1:
+        raise HTTPException(status_code=400, detail="chunk_rows must be at least 1.")
+    if idempotency_key is not None and (existing := jobs.find(idempotency_key)) is not None:
+        return JSONResponse(existing, status_code=200)
+
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    job_id = None
+    if content_type == "application/json":
+        try:
+            path = (await request.json())["path"]
+            root = os.path.realpath(JOB_INPUT_DIR)
+            input_path = os.path.realpath(os.path.join(root, path))
+        except Exception:
+            raise HTTPException(status_code=400, detail='Expected a JSON body {"path": "<file under JOB_INPUT_DIR>"}.')
+        if os.path.commonpath([root, input_path]) != root:
+            raise HTTPException(status_code=403, detail="Jobs can only reference files under JOB_INPUT_DIR.")
+        if not os.path.isfile(input_path):
+            raise HTTPException(status_code=404, detail=f"No file '{path}' under JOB_INPUT_DIR.")
+        file_format = "parquet" if input_path.endswith((".parquet", ".pq")) else "csv"
+    elif content_type in JOB_UPLOAD_FORMATS:
+        file_format = JOB_UPLOAD_FORMATS[content_type]
+    else:
+        raise HTTPException(status_code=415, detail="Upload a file as text/csv or application/vnd.apache.parquet, "
+                                                    "or reference one with a JSON body.")
+    if file_format == "parquet" and not parquet_supported():
+        raise HTTPException(status_code=415, detail="Parquet files need the pyarrow package on the server.")
+
+    max_bytes = int(JOB_MAX_UPLOAD_MB * (1 << 20))
+    too_large = HTTPException(status_code=413, detail=f"Uploads are limited to {JOB_MAX_UPLOAD_MB:g} MB; "
+                                                      "reference larger files under JOB_INPUT_DIR.")
+    if content_type != "application/json" and int(request.headers.get("content-length") or 0) > max_bytes:
+        raise too_large
+
+    try:
+        if content_type != "application/json":
+            # Written to disk as it arrives, so the upload is never held in memory
+            job_id, directory = jobs.new_job_dir()
+            input_path = os.path.join(directory, f"input.{file_format}")
+            received = 0
+            with open(input_path, "wb") as f:
+                async for block in request.stream():
+                    received += len(block)
+                    if received > max_bytes:
+                        raise too_large
+                    f.write(block)
+        file_layout(input_path, file_format)
+    except Exception as e:
+        if job_id is not None:
+            jobs.discard(job_id)
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(status_code=400, detail=f"Cannot read the {file_format} file: {e}")
+
+    status, created = jobs.create(input_path, file_format, model, chunk_rows, idempotency_key, job_id)
+    if created:
+        metrics.increment("jobs_created")
+    return JSONResponse(status, status_code=202 if created else 200)
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """
+    Progress of a scoring job: status, rows done out of rows total, throughput and estimated time left.
+    """
+    status = jobs.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job '{job_id}'.")
+    return status
+
+
+@app.delete("/jobs/{job_id}")
+def delete_job(job_id: str):
+    """
+    Deletes a job with its uploaded input and results; a queued or running job is stopped first.
+    Finished jobs are also deleted automatically JOB_RETENTION_HOURS after they finished.
+    """
+    if not jobs.delete(job_id):
+        raise HTTPException(status_code=404, detail=f"Unknown job '{job_id}'.")
+    metrics.increment("jobs_deleted")
+    return {"id": job_id, "deleted": True}
+
+
+@app.get("/jobs/{job_id}/results")
+def get_job_results(job_id: str):
+    """
+    Streams the results of a finished job as CSV: id, predicted_minutes (empty for invalid rows)
+    and invalid_fields, in input order.
+    """
+    status = get_job(job_id)
+    if status["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' is {status['status']}, not done.")
+    return StreamingResponse(jobs.results(job_id), media_type="text/csv",
+                             headers={"Content-Disposition": f'attachment; filename="{job_id}.csv"'})
+
 
 class UncheckedTripInput(BaseModel):
     store_and_fwd_flag: str = Field(
@@ -291,6 +1234,7 @@ class UncheckedTripInput(BaseModel):
     )
 
 @app.post("/validate")
+@lanes.route("interactive")
 def validate(trip_data :UncheckedTripInput):
     '''
     Validate the input trip data without performing prediction.
@@ -306,21 +1250,21 @@ def validate(trip_data :UncheckedTripInput):
         dict: A success message if all checks pass, or detailed errors if not.
     '''
     try:
-        trip = pd.DataFrame([trip_data.model_dump()])
+        trip = trip_data.model_dump()
         errors = {}
 
         # Store and forward flag
-        flag = trip["store_and_fwd_flag"][0].strip().upper()
+        flag = trip["store_and_fwd_flag"].strip().upper()
         if flag not in {"Y", "N"}:
             errors["store_and_fwd_flag"] = "Value must be 'Y' or 'N' (case-insensitive)."
 
         # Vendor ID
-        vendor_id = trip["vendor_id"][0]
+        vendor_id = trip["vendor_id"]
         if vendor_id not in {1, 2}:
             errors["vendor_id"] = "Vendor ID must be either 1 or 2."
 
         # Passenger count
-        passenger_count = trip["passenger_count"][0]
+        passenger_count = trip["passenger_count"]
         if not (1 <= passenger_count <= 6):
             errors["passenger_count"] = "Passenger count must be between 1 and 6."
 
@@ -333,18 +1277,18 @@ def validate(trip_data :UncheckedTripInput):
         }
 
         for key, (low, high) in coords.items():
-            val = trip[key][0]
+            val = trip[key]
             if not (low <= val <= high):
                 label = key.replace('_', ' ').capitalize()
                 errors[key] = f"{label} must be within the expected range for NYC: between {low} and {high}."
 
         # Pickup date format (YYYY-MM-DD)
-        pickup_date = trip["pickup_date"][0]
+        pickup_date = trip["pickup_date"]
         if not re.match(r"^\d{4}-\d{2}-\d{2}$", pickup_date):
             errors["pickup_date"] = "Pickup date must follow the format YYYY-MM-DD."
 
         # Pickup time format (HH:MM in 24-hour format)
-        pickup_time = trip["pickup_time"][0]
+        pickup_time = trip["pickup_time"]
         if not re.match(r"^([01]\d|2[0-3]):([0-5]\d)$", pickup_time):
             errors["pickup_time"] = "Pickup time must follow the format HH:MM (24-hour clock)."
 
@@ -358,6 +1302,40 @@ def validate(trip_data :UncheckedTripInput):
         raise HTTPException(status_code=400, detail=str(e))
     
 
+@app.post("/validate/batch")
+@lanes.route("bulk")
+def validate_batch(payload: list[dict] | dict[str, list] = Body(...)):
+    '''
+    Validate a batch of trips with the rules of /validate, evaluated on whole columns.
+
+    Args:
+        payload: A list of trip objects, or columns ({"vendor_id": [1, 2, ...], ...}).
+
+    Returns:
+        dict: One error bitmask per row (bit i set when `fields[i]` is invalid; 0 means the
+              row is valid), the number of rows failing each rule and the rule messages.
+    '''
+    try:
+        columns, n = to_columns(payload)
+        masks = validate_columns(columns)
+        metrics.increment("validate_batch_requests")
+        metrics.increment("validate_batch_rows", n)
+
+        invalid = int(np.count_nonzero(masks))
+        return {
+            "rows": n,
+            "valid": n - invalid,
+            "invalid": invalid,
+            "fields": FIELDS,
+            "messages": MESSAGES,
+            "counts": rule_counts(masks),
+            "errors": masks.tolist(),
+        }
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.get("/features")
 def get_features():
     """
@@ -434,20 +1412,115 @@ def get_version():
     """
     Returns version information and model performance details.
 
-    NOTE: These values must be updated manually if a new model is trained or deployed.
+    Metrics are read from the header of the loaded model artifact.
     """
+    model = manager.model
     return {
-        "model_type": "Ridge Regression",
-        "alpha": 1,
-        "model_path": MODEL_PATH,
-        "train_rmse": 0.3931,
-        "train_r2": 0.6946,
-        "val_rmse": 0.3930,
-        "val_r2": 0.6949,
-        "target_variable": "log_trip_duration (converted back to seconds then into minutes)",
+        "model_type": model.header["model_type"],
+        "alpha": model.header["alpha"],
+        "model_path": manager.path,
+        "format_version": model.header["format_version"],
+        **model.metrics,
+        "target_variable": f"{model.target} (converted back to seconds then into minutes)",
     }
 
 
+@app.get("/health/live")
+def health_live():
+    """
+    Liveness probe: the process is up and serving HTTP.
+    """
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+def health_ready():
+    """
+    Readiness probe: returns 200 only once the model is loaded and warm-up has completed,
+    503 otherwise (e.g. while warming up after a deploy or scale-up).
+    """
+    ready = readiness["model_loaded"] and readiness["warmed_up"]
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "starting", "model_path": manager.path, **readiness},
+    )
+
+
+@app.get("/metrics")
+def get_metrics():
+    """
+    Returns request counters since startup, e.g. how many batch trips were duplicates
+    (`batch_dedup_ratio` = share of trips not scored because an identical one was in the same batch),
+    and the queue depth and wait times of the priority lanes.
+    """
+    return {**metrics.snapshot(), "lanes": lanes.snapshot()}
+
+
+@app.get("/models")
+def get_models():
+    """
+    Lists every model that can be selected with `?model=<name>` on the prediction endpoints,
+    with whether it is loaded, its memory footprint and load time.
+    """
+    return registry.describe()
+
+
+@app.post("/admin/reload")
+def admin_reload(model_path: str | None = Body(default=None, embed=True)):
+    """
+    Loads, validates and warms up a model artifact, then swaps it in without downtime.
+
+    Parameters:
+        model_path (str, optional): Artifact directory to switch to; defaults to
+                                    reloading the current one (e.g. after re-exporting it).
+
+    Returns:
+        JSON with the status of the active model. On failure the current model keeps serving.
+    """
+    try:
+        manager.reload(model_path)
+        return manager.status()
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=f"Reload failed, current model kept: {e}")
+
+
+@app.get("/admin/model")
+def admin_model():
+    """
+    Returns the active model, requests still draining on replaced models, and reload errors.
+    """
+    return manager.status()
+
+
+@app.get("/admin/shadow")
+def admin_shadow():
+    """
+    Returns the shadow comparison so far: candidate minus active model differences (minutes),
+    RMSE between the models, scoring latency of both, queue delay and dropped samples.
+    """
+    return shadow.status()
+
+
+@app.post("/admin/shadow")
+def admin_shadow_start(model: str | None = Body(default=None, embed=True)):
+    """
+    Starts shadow scoring of a candidate model on default-model traffic, with fresh statistics.
+
+    Parameters:
+        model (str, optional): Name of the candidate (see /models); null stops shadow scoring.
+
+    Returns:
+        JSON with the shadow status.
+    """
+    if model is None:
+        shadow.stop()
+    else:
+        check_model(model)
+        shadow.start(model)
+    return shadow.status()
+
+
 @app.get("/help")
 def get_help():
     """
@@ -466,13 +1539,68 @@ def get_help():
             {
             "method": "POST",
             "endpoint": "/predict/batch",
-            "description": "Returns trip duration predictions for a batch of trip records."
+            "description": "Returns trip duration predictions for a batch of trip records (optionally from an ensemble of models)."
+            },
+            {
+                "method": "POST",
+                "endpoint": "/predict/matrix",
+                "description": "Returns an origins x destinations matrix of trip durations (JSON or binary float32)."
+            },
+            {
+                "method": "POST",
+                "endpoint": "/predict/sweep",
+                "description": "Returns the duration of one trip for every pickup time in a date range (duration curve)."
+            },
+            {
+                "method": "POST",
+                "endpoint": "/isochrone",
+                "description": "Returns durations from an origin to every cell of a lat/lon grid (cached), with reachable areas."
+            },
+            {
+                "method": "POST",
+                "endpoint": "/predict/itinerary",
+                "description": "Returns per-leg and cumulative durations of a multi-stop route from one start time."
+            },
+            {
+                "method": "POST",
+                "endpoint": "/predict/knn",
+                "description": "Estimates durations of a batch of trips from the k most similar historical trips."
+            },
+            {
+                "method": "POST",
+                "endpoint": "/predict/csv",
+                "description": "Predicts every trip of an uploaded CSV, parsed in chunks; returns a CSV of ids and predictions."
+            },
+            {
+                "method": "POST",
+                "endpoint": "/jobs",
+                "description": "Starts scoring an uploaded or referenced CSV/Parquet trip file in the background; returns the job id."
+            },
+            {
+                "method": "GET",
+                "endpoint": "/jobs/{job_id}",
+                "description": "Returns the progress, throughput and estimated time left of a scoring job."
+            },
+            {
+                "method": "GET",
+                "endpoint": "/jobs/{job_id}/results",
+                "description": "Streams the predictions of a finished scoring job as CSV."
+            },
+            {
+                "method": "DELETE",
+                "endpoint": "/jobs/{job_id}",
+                "description": "Deletes a scoring job, its uploaded input and its results (stopping it if still running)."
             },
             {
                 "method": "POST",
                 "endpoint": "/validate",
                 "description": "Validates a user input JSON against the expected input schema."
             },
+            {
+                "method": "POST",
+                "endpoint": "/validate/batch",
+                "description": "Validates a list or columns of trips at once; returns per-row error bitmasks and counts per rule."
+            },
             {
                 "method": "GET",
                 "endpoint": "/features",
@@ -493,6 +1621,46 @@ def get_help():
                 "endpoint": "/version",
                 "description": "Returns version details of the model, API, and performance metrics."
             },
+            {
+                "method": "GET",
+                "endpoint": "/health/live",
+                "description": "Liveness probe; always returns 200 while the server is running."
+            },
+            {
+                "method": "GET",
+                "endpoint": "/health/ready",
+                "description": "Readiness probe; returns 200 once the model is loaded and warmed up, 503 before."
+            },
+            {
+                "method": "GET",
+                "endpoint": "/metrics",
+                "description": "Returns request counters since startup, including the batch deduplication ratio."
+            },
+            {
+                "method": "GET",
+                "endpoint": "/models",
+                "description": "Lists the models selectable with ?model=<name>, with memory footprint and load time."
+            },
+            {
+                "method": "POST",
+                "endpoint": "/admin/reload",
+                "description": "Loads, validates and warms up a model artifact, then swaps it in without downtime."
+            },
+            {
+                "method": "GET",
+                "endpoint": "/admin/model",
+                "description": "Returns the active model, draining models and the last reload error."
+            },
+            {
+                "method": "GET",
+                "endpoint": "/admin/shadow",
+                "description": "Returns online statistics comparing a shadowed candidate model with the active model."
+            },
+            {
+                "method": "POST",
+                "endpoint": "/admin/shadow",
+                "description": "Starts (or with null, stops) shadow scoring of a candidate model off the request path."
+            },
             {
                 "method": "GET",
                 "endpoint": "/help",
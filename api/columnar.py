@@ -0,0 +1,283 @@
+import numpy as np
+
+# Trip fields in bit order of the error masks: bit i is set when FIELDS[i] fails its rule
+FIELDS = [
+    "store_and_fwd_flag",
+    "vendor_id",
+    "passenger_count",
+    "pickup_longitude",
+    "pickup_latitude",
+    "dropoff_longitude",
+    "dropoff_latitude",
+    "pickup_date",
+    "pickup_time",
+]
+
+# Same bounds as /validate and TripInput (inclusive for the former, exclusive for the latter)
+COORDINATE_BOUNDS = {
+    "pickup_longitude": (-75, -73),
+    "dropoff_longitude": (-75, -73),
+    "pickup_latitude": (40, 43),
+    "dropoff_latitude": (40, 43),
+}
+
+MESSAGES = {
+    "store_and_fwd_flag": "Value must be 'Y' or 'N' (case-insensitive).",
+    "vendor_id": "Vendor ID must be either 1 or 2.",
+    "passenger_count": "Passenger count must be between 1 and 6.",
+    **{
+        field: f"{field.replace('_', ' ').capitalize()} must be within the expected range for NYC: "
+               f"between {low} and {high}."
+        for field, (low, high) in COORDINATE_BOUNDS.items()
+    },
+    "pickup_date": "Pickup date must follow the format YYYY-MM-DD.",
+    "pickup_time": "Pickup time must follow the format HH:MM (24-hour clock).",
+}
+
+# Messages of the TripInput constraints used by lenient /predict/batch
+PREDICTION_MESSAGES = {
+    **MESSAGES,
+    "store_and_fwd_flag": "Value must be 'Y' or 'N' (case-insensitive, without spaces).",
+    **{
+        field: f"{field.replace('_', ' ').capitalize()} must be within the expected range for NYC: "
+               f"strictly between {low} and {high}."
+        for field, (low, high) in COORDINATE_BOUNDS.items()
+    },
+    "pickup_date": "Pickup date must be a valid date in the format YYYY-MM-DD.",
+}
+
+DIGIT_CODES = (ord("0"), ord("9"))
+
+
+def to_columns(payload):
+    """
+    Turns a batch given as a list of trip objects or as columns into columns.
+
+    Parameters:
+    - payload: [{"vendor_id": 1, ...}, ...] or {"vendor_id": [1, ...], ...}.
+
+    Returns:
+    - (columns, n): dictionary of field name to list of raw values (None where a field
+      is missing), and the number of rows.
+
+    Raises:
+    - ValueError if columns have different lengths.
+    """
+    if isinstance(payload, dict):
+        lengths = {len(values) for values in payload.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"All columns must have the same length, got lengths {sorted(lengths)}")
+        n = lengths.pop() if lengths else 0
+        return {field: payload.get(field, [None] * n) for field in FIELDS}, n
+
+    return {field: [row.get(field) for row in payload] for field in FIELDS}, len(payload)
+
+
+def to_floats(values):
+    """
+    Raw values as a float64 array; values that are not numbers become NaN (and fail every range).
+    """
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.array([_float_or_nan(v) for v in values], dtype=np.float64)
+
+
+def _float_or_nan(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def has_nul(values):
+    """
+    Whether any raw value is a string containing a NUL character. NumPy unicode arrays drop
+    trailing NULs, so such values must be caught before they are converted.
+    """
+    try:
+        return "\x00" in "".join(values)
+    except TypeError:
+        return any(isinstance(v, str) and "\x00" in v for v in values)
+
+
+def to_strings(values):
+    """
+    Raw values as a unicode array; values that are not strings, or contain a NUL character, become ''.
+    """
+    strings = np.asarray(values)
+    if strings.dtype.kind != "U" or (not isinstance(values, np.ndarray) and has_nul(values)):
+        strings = np.array([v if isinstance(v, str) and "\x00" not in v else "" for v in values], dtype=str)
+    return strings
+
+
+def char_codes(strings, width):
+    """
+    Code points of every string as an (n, width) uint32 array, and whether it has exactly
+    `width` characters. Fixed-layout formats are then checked column by column.
+    """
+    n, itemsize = len(strings), strings.dtype.itemsize // 4
+    if itemsize < width:
+        return np.zeros((n, width), dtype=np.uint32), np.zeros(n, dtype=bool)
+
+    # numpy pads unicode strings with NUL code points, so the length is where the padding starts
+    codes = np.ascontiguousarray(strings).view(np.uint32).reshape(n, itemsize)
+    sized = codes[:, width - 1] != 0
+    if itemsize > width:
+        sized &= codes[:, width] == 0
+    return codes[:, :width], sized
+
+
+def is_digit(codes):
+    return (codes >= DIGIT_CODES[0]) & (codes <= DIGIT_CODES[1])
+
+
+def valid_flags(strings, strip=True):
+    """
+    'Y' or 'N' in any case, ignoring surrounding whitespace if `strip`.
+    """
+    codes, single = char_codes(strings, 1)
+    valid = single & np.isin(codes[:, 0], [ord(c) for c in "YNyn"])
+    if not strip:
+        return valid
+    # Whitespace-padded flags are rare: only those go through the (slower) string functions
+    other = ~single & (codes[:, 0] != 0)
+    if other.any():
+        valid[other] = np.isin(np.char.upper(np.char.strip(strings[other])), ["Y", "N"])
+    return valid
+
+
+def valid_dates(strings, calendar=False):
+    """
+    YYYY-MM-DD with ASCII digits; with `calendar`, also an existing day (no 2016-02-30).
+    """
+    codes, sized = char_codes(strings, 10)
+    dash = ord("-")
+    valid = (sized & is_digit(codes[:, [0, 1, 2, 3, 5, 6, 8, 9]]).all(axis=1)
+             & (codes[:, 4] == dash) & (codes[:, 7] == dash))
+    if not calendar:
+        return valid
+
+    digits = np.where(valid[:, None], codes.astype(np.int64) - ord("0"), 0)
+    year = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+    month = digits[:, 5] * 10 + digits[:, 6]
+    day = digits[:, 8] * 10 + digits[:, 9]
+
+    months = ((year - 1970) * 12 + np.clip(month, 1, 12) - 1).astype("datetime64[M]")
+    month_days = ((months + 1).astype("datetime64[D]") - months.astype("datetime64[D]")).astype(np.int64)
+    return valid & (month >= 1) & (month <= 12) & (day >= 1) & (day <= month_days)
+
+
+def valid_times(strings):
+    """
+    HH:MM on a 24-hour clock with ASCII digits.
+    """
+    codes, sized = char_codes(strings, 5)
+    hour_tens, hour_units = codes[:, 0] - ord("0"), codes[:, 1] - ord("0")
+    return (sized & is_digit(codes[:, [0, 1, 3, 4]]).all(axis=1) & (codes[:, 2] == ord(":"))
+            & ((hour_tens < 2) | ((hour_tens == 2) & (hour_units < 4))) & (codes[:, 3] < ord("6")))
+
+
+def validate_columns(columns, prediction=False):
+    """
+    Evaluates every rule of /validate on whole columns at once.
+
+    Parameters:
+    - columns: Dictionary of field name to raw values, as returned by `to_columns`.
+    - prediction: Apply the TripInput constraints instead (flags are not stripped, coordinate
+      bounds are exclusive) and require dates that exist, so every valid row can be scored.
+
+    Returns:
+    - uint16 array with one error bitmask per row (bit i set when FIELDS[i] is invalid).
+    """
+    valid = {
+        "store_and_fwd_flag": valid_flags(to_strings(columns["store_and_fwd_flag"]), strip=not prediction),
+        "pickup_date": valid_dates(to_strings(columns["pickup_date"]), calendar=prediction),
+        "pickup_time": valid_times(to_strings(columns["pickup_time"])),
+    }
+
+    vendor_id = to_floats(columns["vendor_id"])
+    valid["vendor_id"] = (vendor_id == 1) | (vendor_id == 2)
+    passenger_count = to_floats(columns["passenger_count"])
+    valid["passenger_count"] = ((passenger_count >= 1) & (passenger_count <= 6)
+                                & (passenger_count == np.floor(passenger_count)))
+
+    for field, (low, high) in COORDINATE_BOUNDS.items():
+        values = to_floats(columns[field])
+        valid[field] = (values > low) & (values < high) if prediction else (values >= low) & (values <= high)
+
+    masks = np.zeros(len(valid["vendor_id"]), dtype=np.uint16)
+    for bit, field in enumerate(FIELDS):
+        masks |= (~valid[field]).astype(np.uint16) << bit
+    return masks
+
+
+def rule_counts(masks):
+    """
+    Number of rows failing each rule, by field name.
+    """
+    return {field: int(((masks >> bit) & 1).sum()) for bit, field in enumerate(FIELDS)}
+
+
+def clean_columns(columns, rows):
+    """
+    Typed values of the given rows, which must be valid for prediction (see `validate_columns`).
+
+    Returns:
+    - Dictionary of field name to array, with flags upper-cased as TripInput does.
+    """
+    clean = {field: to_floats(columns[field])[rows] for field in COORDINATE_BOUNDS}
+    clean["vendor_id"] = to_floats(columns["vendor_id"])[rows].astype(np.int64)
+    clean["passenger_count"] = to_floats(columns["passenger_count"])[rows].astype(np.int64)
+    # Valid flags are one of "YNyn": upper-case them on the code points
+    flags = np.ascontiguousarray(to_strings(columns["store_and_fwd_flag"])[rows], dtype="<U1").view(np.uint32)
+    clean["store_and_fwd_flag"] = np.where(flags >= ord("a"), flags - (ord("a") - ord("A")), flags).view("<U1")
+    clean["pickup_date"] = to_strings(columns["pickup_date"])[rows]
+    clean["pickup_time"] = to_strings(columns["pickup_time"])[rows]
+    return {field: clean[field] for field in FIELDS}
+
+
+def row_errors(masks, messages=MESSAGES):
+    """
+    Per-row errors as {field: message} (None for valid rows), built once per distinct mask.
+    """
+    by_mask = {
+        mask: {field: messages[field] for bit, field in enumerate(FIELDS) if mask >> bit & 1} or None
+        for mask in np.unique(masks).tolist()
+    }
+    return [by_mask[mask] for mask in masks.tolist()]
+
+
+def trip_columns(trips):
+    """
+    Typed columns of a raw JSON batch when every trip certainly passes TripInput, else None.
+
+    Only plain JSON types are taken (numbers for numeric fields, strings for the others)
+    and every check is at least as strict as the TripInput constraint it stands for, so
+    None means "let TripInput decide", never "invalid". Values equal those TripInput
+    produces (flags upper-cased, integers as int64, numbers as float64).
+    """
+    try:
+        columns = {field: [trip[field] for trip in trips] for field in FIELDS}
+    except (KeyError, TypeError):
+        return None
+
+    typed = {}
+    for field in FIELDS:
+        values = np.asarray(columns[field])
+        if field in COORDINATE_BOUNDS:
+            kind = "if"
+        elif field in ("vendor_id", "passenger_count"):
+            kind = "i"  # lists mixing ints and bools come out as int64, and TripInput takes True as 1
+        else:
+            kind = "U"  # ints mixed into a string list become digit strings, which no format check accepts
+        if values.dtype.kind not in kind or values.ndim != 1:
+            return None
+        if kind == "U" and has_nul(columns[field]):
+            return None
+        typed[field] = values
+
+    # The prediction rules are TripInput's, plus ASCII-only digits and existing dates
+    if validate_columns(typed, prediction=True).any():
+        return None
+    return clean_columns(typed, slice(None))
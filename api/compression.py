@@ -0,0 +1,153 @@
+import zlib
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+try:
+    import zstandard
+except ImportError:  # zstd bodies are refused with a 415 when the package is not installed
+    zstandard = None
+
+
+# Largest expansion of zstd input: an RLE block is 4 bytes for up to 128 KB of output
+ZSTD_MAX_RATIO = 1 << 15
+
+# Smallest slice of zstd input decoded at once, so an exhausted budget does not mean byte-by-byte calls
+ZSTD_MIN_SLICE = 64
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+def supported_encodings():
+    """
+    Content-Encoding values accepted for request bodies.
+    """
+    return ["gzip"] + (["zstd"] if zstandard is not None else [])
+
+
+class GzipDecoder:
+    '''
+    Incremental gzip decoder (concatenated members are allowed, as in `gzip.decompress`).
+
+    Attributes:
+        limit (int): Maximum number of bytes produced in total.
+    '''
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.produced = 0
+        self._decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def decompress(self, data):
+        output = []
+        while data:
+            # Bounded by the remaining budget, so a tiny body cannot expand into gigabytes at once
+            chunk = self._decoder.decompress(data, self.limit - self.produced + 1)
+            self.produced += len(chunk)
+            if self.produced > self.limit:
+                raise BodyTooLarge
+            output.append(chunk)
+
+            data = self._decoder.unconsumed_tail
+            if self._decoder.eof:
+                data = self._decoder.unused_data
+                if data:
+                    self._decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        return b"".join(output)
+
+    def finish(self):
+        if not self._decoder.eof:
+            raise zlib.error("truncated gzip body")
+
+
+class ZstdDecoder:
+    '''
+    Incremental zstd decoder.
+
+    Attributes:
+        limit (int): Maximum number of bytes produced in total.
+    '''
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.produced = 0
+        self._decoder = zstandard.ZstdDecompressor().decompressobj()
+
+    def decompress(self, data):
+        # The decoder has no output bound, so it is fed slices of input that cannot expand much past
+        # the remaining budget: a tiny body cannot expand into gigabytes at once
+        output = []
+        data = memoryview(data)
+        while len(data):
+            size = max((self.limit - self.produced) // ZSTD_MAX_RATIO, ZSTD_MIN_SLICE)
+            chunk = self._decoder.decompress(data[:size])
+            self.produced += len(chunk)
+            if self.produced > self.limit:
+                raise BodyTooLarge
+            output.append(chunk)
+            data = data[size:]
+        return b"".join(output)
+
+    def finish(self):
+        if not self._decoder.eof:
+            raise zstandard.ZstdError("truncated zstd body")
+
+
+DECODERS = {"gzip": GzipDecoder, "zstd": ZstdDecoder}
+
+
+class DecompressionMiddleware:
+    '''
+    ASGI middleware that decompresses gzip or zstd request bodies as they are received.
+
+    Each chunk is decoded when the application reads it, so the compressed body is never
+    held in memory at once. Content-Encoding and Content-Length are removed from the
+    request the application sees. Bodies larger than `max_size` once decompressed are
+    rejected with a 413, corrupt ones with a 400, unknown encodings with a 415.
+
+    Attributes:
+        app: The wrapped ASGI application.
+        max_size (int): Maximum decompressed body size in bytes.
+    '''
+
+    def __init__(self, app, max_size):
+        self.app = app
+        self.max_size = max_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        encoding = headers.get(b"content-encoding", b"identity").decode("latin-1").strip().lower()
+        if encoding in ("", "identity"):
+            return await self.app(scope, receive, send)
+
+        if encoding not in supported_encodings():
+            response = JSONResponse({"detail": f"Unsupported Content-Encoding '{encoding}'. "
+                                               f"Supported: {', '.join(supported_encodings())}."}, status_code=415)
+            return await response(scope, receive, send)
+
+        decoder = DECODERS[encoding](self.max_size)
+        scope = {**scope, "headers": [(name, value) for name, value in scope["headers"]
+                                      if name not in (b"content-encoding", b"content-length")]}
+
+        async def receive_decompressed():
+            message = await receive()
+            if message["type"] != "http.request":
+                return message
+
+            # Raised while the handler reads the body, so they become regular error responses
+            try:
+                body = decoder.decompress(message.get("body", b""))
+                if not message.get("more_body", False):
+                    decoder.finish()
+            except BodyTooLarge:
+                raise HTTPException(status_code=413, detail=f"Decompressed body exceeds {self.max_size} bytes.")
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"Invalid {encoding} body: {e}")
+            return {**message, "body": body}
+
+        return await self.app(scope, receive_decompressed, send)
@@ -0,0 +1,239 @@
+"""
+NumPy-only feature builder for inference.
+
+Mirrors `engineer_feature` in preprocessing/final_pipeline.py without pandas or scipy,
+so the API can build model inputs for a whole batch of trips with a few array operations.
+
+Features are split into a location part (`distance_features`) and a time part
+(`time_features`): both only depend on their own inputs, so callers that score many
+pickup times for the same trip (or many destinations at the same time) can compute
+each part once and let `combine_features` broadcast them against each other.
+"""
+
+import numpy as np
+
+from aggregate_tables import aggregate_zones, default_aggregate_table, hour_of_week
+from zone_index import default_zone_index
+
+R = 6356  # radius of Earth in km
+
+BASE_SPEED = 32
+
+# Feature looked up in the aggregate table (scripts/aggregate_tables.py); only built for models that read it
+AGGREGATE_FEATURE = "zone_hour_median_log_duration"
+
+# Winter = 0, Spring = 1, Summer = 2, Fall = 3 (index 0 unused so months index directly)
+SEASON_BY_MONTH = np.array([-1, 0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0])
+
+
+def parse_pickup_datetime(pickup_date, pickup_time):
+    """
+    Combines 'YYYY-MM-DD' dates and 'HH:MM' times into a datetime64[m] array.
+
+    Raises:
+    - ValueError if a value is not a real calendar date/time.
+    """
+    dates = np.asarray(pickup_date, dtype="U10")
+    times = np.asarray(pickup_time, dtype="U5")
+    return np.char.add(np.char.add(dates, "T"), times).astype("datetime64[m]")
+
+
+def distance_features(pickup_longitude, pickup_latitude, dropoff_longitude, dropoff_latitude):
+    """
+    Location-derived features: distance transforms, airport flags and coordinate aggregates.
+
+    Inputs are broadcast against each other, so pickups of shape (n, 1) and dropoffs of
+    shape (1, m) produce an (n, m) grid of features.
+
+    Returns:
+    - Dictionary of feature name to array.
+    """
+    pickup_longitude, pickup_latitude, dropoff_longitude, dropoff_latitude = np.broadcast_arrays(
+        *(np.asarray(a, dtype=np.float64) for a in
+          (pickup_longitude, pickup_latitude, dropoff_longitude, dropoff_latitude)))
+
+    # Convert degrees to radians
+    lat1 = np.radians(pickup_latitude)
+    lat2 = np.radians(dropoff_latitude)
+    lon1 = np.radians(pickup_longitude)
+    lon2 = np.radians(dropoff_longitude)
+
+    # x and y components of distance
+    x = R * (lat1 - lat2)
+    y = R * (lon1 - lon2) * np.cos(lat2)
+
+    square = x**2 + y**2
+    distance = np.sqrt(square)
+    distance_sqrt = np.sqrt(distance)
+    cube = distance**3
+
+    # Zone membership is one gather in the shared zone raster (scripts/zone_index.py)
+    zones = default_zone_index()
+    pickup_zone = zones.lookup(pickup_longitude, pickup_latitude)
+    dropoff_zone = zones.lookup(dropoff_longitude, dropoff_latitude)
+
+    jfk, lg = zones.zone_id("jfk_airport"), zones.zone_id("lg_airport")
+    is_jfk_airport = ((pickup_zone == jfk) | (dropoff_zone == jfk)).astype(np.int64)
+    is_lg_airport = ((pickup_zone == lg) | (dropoff_zone == lg)).astype(np.int64)
+
+    # Row-wise aggregates over the four coordinates (harmonic mean as in scipy.stats.hmean)
+    geo = (pickup_longitude, pickup_latitude, dropoff_longitude, dropoff_latitude)
+    coord_arithmetic_mean = sum(geo) / 4
+    coord_harmonic_mean = 4 / sum(1 / np.abs(value) for value in geo)
+    coord_square_sum = sum(value**2 for value in geo)
+
+    return {
+        "pickup_longitude": pickup_longitude,
+        "pickup_latitude": pickup_latitude,
+        "dropoff_longitude": dropoff_longitude,
+        "dropoff_latitude": dropoff_latitude,
+        "trip_distance": distance,
+        "trip_distance_sqrt": distance_sqrt,
+        "trip_distance_square": square,
+        "trip_distance_cube": cube,
+        "log_trip_distance": np.log1p(distance),
+        "log_trip_distance_sqrt": np.log1p(distance_sqrt),
+        "log_trip_distance_square": np.log1p(square),
+        "log_trip_distance_cube": np.log1p(cube),
+        "pickup_zone": pickup_zone,
+        "dropoff_zone": dropoff_zone,
+        "is_jfk_airport": is_jfk_airport,
+        "is_lg_airport": is_lg_airport,
+        "coord_arithmetic_mean": coord_arithmetic_mean,
+        "coord_harmonic_mean": coord_harmonic_mean,
+        "coord_square_sum": coord_square_sum,
+    }
+
+
+def time_features(pickup_datetime):
+    """
+    Calendar features of datetime64 pickup times (same encoding as pandas `.dt` accessors).
+
+    Returns:
+    - Dictionary of feature name to int64 array.
+    """
+    pickup_datetime = np.asarray(pickup_datetime, dtype="datetime64[m]")
+    days = pickup_datetime.astype("datetime64[D]")
+    minute_of_day = (pickup_datetime - days).astype(np.int64)
+
+    hour = minute_of_day // 60
+    month = pickup_datetime.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    weekday = (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday, Monday = 0
+    season = SEASON_BY_MONTH[month]
+
+    return {
+        "dayofyear": (days - pickup_datetime.astype("datetime64[Y]")).astype(np.int64) + 1,
+        "dayofweek": weekday,
+        "month": month,
+        "weekday": weekday,
+        "hour": hour,
+        "minute": minute_of_day % 60,
+        "season": season,
+        "is_summer": (season == 2).astype(np.int64),
+        "is_rush_hour": (((hour >= 7) & (hour <= 9)) | ((hour >= 13) & (hour <= 19))).astype(np.int64),
+        "is_night": ((hour > 1) & (hour < 6)).astype(np.int64),
+        "is_weekend": ((weekday // 5) == 1).astype(np.int64),
+    }
+
+
+def uses_aggregates(model):
+    """
+    Whether a model reads AGGREGATE_FEATURE, so callers only pay for the table lookup when needed.
+    """
+    return AGGREGATE_FEATURE in model.features
+
+
+def aggregate_feature(distance, time):
+    """
+    Historical zone-pair x hour-of-week median log duration of every trip.
+
+    Parameters:
+    - distance: Location features (`distance_features` output, or a full feature dictionary).
+    - time: Time features (`time_features` output, or a full feature dictionary).
+
+    Raises:
+    - ValueError if no usable aggregate table is built (see `default_aggregate_table`).
+    """
+    table = default_aggregate_table()
+    if table is None:
+        raise ValueError(f"The model reads {AGGREGATE_FEATURE} but no aggregate table is available; "
+                         "build it with `python aggregate_tables.py build`")
+    return table.lookup(
+        aggregate_zones(distance["pickup_longitude"], distance["pickup_latitude"], distance["pickup_zone"]),
+        aggregate_zones(distance["dropoff_longitude"], distance["dropoff_latitude"], distance["dropoff_zone"]),
+        hour_of_week(time["dayofweek"], time["hour"]))
+
+
+def combine_features(distance, time, store_and_fwd_flag, vendor_id, passenger_count,
+                     virtual_time_distance="log_trip_distance", aggregates=False):
+    """
+    Merges location and time features and adds the features that depend on both.
+
+    Parameters:
+    - distance: Output of `distance_features`.
+    - time: Output of `time_features` (broadcastable against `distance`).
+    - store_and_fwd_flag: 'Y'/'N' values.
+    - vendor_id, passenger_count: Integer values.
+    - virtual_time_distance: Distance feature divided by the virtual speed
+      ('log_trip_distance' for the final pipeline, 'trip_distance' for pipeline_2).
+    - aggregates: Also look up AGGREGATE_FEATURE (see `uses_aggregates`).
+
+    Returns:
+    - Dictionary of every feature the model reads.
+    """
+    store_and_fwd_flag = np.asarray(store_and_fwd_flag, dtype="U1")
+
+    virtual_speed = BASE_SPEED / (2.0 ** (
+                        (distance["is_jfk_airport"] | distance["is_lg_airport"]) +
+                        time["is_rush_hour"] +
+                        time["is_summer"] +
+                        (store_and_fwd_flag == "Y").astype(np.int64)
+                        ))
+
+    virtual_time = distance[virtual_time_distance] / virtual_speed
+
+    # Historical zone-pair x hour-of-week medians (scripts/aggregate_tables.py)
+    aggregates = {AGGREGATE_FEATURE: aggregate_feature(distance, time)} if aggregates else {}
+
+    return {
+        **distance,
+        **time,
+        "store_and_fwd_flag": store_and_fwd_flag,
+        "vendor_id": np.asarray(vendor_id, dtype=np.int64),
+        "passenger_count": np.asarray(passenger_count, dtype=np.int64),
+        "requires_large_vehicle": (np.asarray(passenger_count) >= 5).astype(np.int64),
+        "virtual_speed": virtual_speed,
+        "virtual_speed_cube": virtual_speed ** 3,
+        "virtual_time": virtual_time,
+        "virtual_time_cube": virtual_time ** 3,
+        "virtual_time_dist_sqrt": distance["trip_distance_sqrt"] / virtual_speed,
+        **aggregates,
+    }
+
+
+def build_features(columns, virtual_time_distance="log_trip_distance", aggregates=False):
+    """
+    Builds model features for a batch of trips given as columns.
+
+    Parameters:
+    - columns: Mapping of `TripInput` field name to a list/array of values.
+    - virtual_time_distance, aggregates: See `combine_features`.
+
+    Returns:
+    - Dictionary of feature name to 1-D array, one entry per trip.
+    """
+    distance = distance_features(columns["pickup_longitude"], columns["pickup_latitude"],
+                                 columns["dropoff_longitude"], columns["dropoff_latitude"])
+    time = time_features(parse_pickup_datetime(columns["pickup_date"], columns["pickup_time"]))
+
+    return combine_features(distance, time, columns["store_and_fwd_flag"],
+                            columns["vendor_id"], columns["passenger_count"], virtual_time_distance, aggregates)
+
+
+def with_virtual_time_distance(features, virtual_time_distance):
+    """
+    Re-derives the virtual time features of an existing feature dictionary for another
+    preprocessing variant (see `combine_features`), without recomputing anything else.
+    """
+    virtual_time = features[virtual_time_distance] / features["virtual_speed"]
+    return {**features, "virtual_time": virtual_time, "virtual_time_cube": virtual_time ** 3}
@@ -0,0 +1,169 @@
+import json
+import math
+
+import numpy as np
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import msgpack
+except ImportError:  # MessagePack is only offered when the package is installed
+    msgpack = None
+
+try:
+    import pyarrow
+except ImportError:  # Arrow is only offered when the package is installed
+    pyarrow = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+FLOAT32 = "application/octet-stream"
+
+ALIASES = {"application/x-msgpack": MSGPACK, "application/vnd.msgpack": MSGPACK}
+
+
+def available_formats():
+    """
+    Media types the prediction endpoints can answer with, JSON first.
+    """
+    return [JSON] + ([MSGPACK] if msgpack is not None else []) + [FLOAT32] + ([ARROW] if pyarrow is not None else [])
+
+
+def negotiate(accept):
+    """
+    Picks the response media type for an Accept header: highest quality first, then header order.
+    A missing header or a wildcard gives JSON.
+
+    Raises:
+    - HTTPException 406 if no acceptable format is available.
+    """
+    if not accept:
+        return JSON
+
+    ranges = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, *parameters = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for parameter in parameters:
+            name, _, value = parameter.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            ranges.append((-quality, position, ALIASES.get(media_type.lower(), media_type.lower())))
+
+    for _, _, media_type in sorted(ranges):
+        if media_type in ("*/*", "application/*"):
+            return JSON
+        if media_type in available_formats():
+            return media_type
+
+    raise HTTPException(status_code=406, detail=f"Cannot produce '{accept}'. "
+                                                f"Available: {', '.join(available_formats())}.")
+
+
+def columns_of(content):
+    """
+    Flattens the per-trip arrays of a response: top-level arrays keep their name, arrays in a
+    nested dictionary become 'parent.name' (e.g. 'models.ridge_pipeline_5'). Other values are
+    returned separately as metadata.
+    """
+    columns, metadata = {}, {}
+    for key, value in content.items():
+        if isinstance(value, dict) and value and all(isinstance(v, np.ndarray) for v in value.values()):
+            columns.update({f"{key}.{name}": array for name, array in value.items()})
+        elif isinstance(value, np.ndarray):
+            columns[key] = value
+        else:
+            metadata[key] = value
+    return columns, metadata
+
+
+def to_builtin(value):
+    """
+    Python objects for json: arrays become lists, NumPy scalars Python ones, and non-finite
+    floats (NaN for a trip that was not scored, or an overflowing prediction) become None.
+    """
+    if isinstance(value, np.ndarray):
+        values = value.tolist()
+        if value.dtype.kind == "f" and not np.isfinite(value).all():
+            values = np.where(np.isfinite(value), value, None).tolist()
+        return values
+    if isinstance(value, dict):
+        return {key: to_builtin(v) for key, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_builtin(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _msgpack_default(value):
+    # Types msgpack does not know: arrays as lists (NaN kept), NumPy scalars as Python ones
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot encode {type(value).__name__} as MessagePack")
+
+
+def pack(value):
+    """
+    MessagePack encoding of a response with NumPy arrays (needs msgpack).
+    """
+    return msgpack.packb(value, default=_msgpack_default)
+
+
+def arrow_stream(content):
+    """
+    Arrow IPC stream with one column per per-trip array (null where NaN) and per-trip lists
+    such as lenient `errors` as JSON strings; the other response fields are stored as JSON
+    in the schema metadata.
+    """
+    columns, metadata = columns_of(content)
+    arrays = [pyarrow.array(values, mask=np.isnan(values) if values.dtype.kind == "f" else None)
+              for values in columns.values()]
+
+    n = len(arrays[0]) if arrays else 0
+    for key, value in list(metadata.items()):
+        if isinstance(value, list) and len(value) == n:
+            columns[key] = value
+            arrays.append(pyarrow.array([None if v is None else json.dumps(v) for v in metadata.pop(key)],
+                                        type=pyarrow.string()))
+    schema = pyarrow.schema([pyarrow.field(name, array.type) for name, array in zip(columns, arrays)],
+                            metadata={key: json.dumps(to_builtin(value)) for key, value in metadata.items()})
+    batch = pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def render(content, media_type, column="predictions"):
+    """
+    Serializes a response whose per-trip values are NumPy arrays.
+
+    Parameters:
+    - content: Response dictionary.
+    - media_type: From `negotiate`.
+    - column: The array sent by the raw float32 format.
+
+    Returns:
+    - A Response: JSON, MessagePack (everything, unscored trips as NaN), Arrow IPC (per-trip
+      arrays as columns) or raw little-endian float32 of `column` with its length in X-Count.
+    """
+    if media_type == MSGPACK:
+        return Response(pack(content), media_type=MSGPACK)
+    if media_type == ARROW:
+        return Response(arrow_stream(content), media_type=ARROW)
+    if media_type == FLOAT32:
+        values = np.asarray(content[column], dtype="<f4")
+        return Response(values.tobytes(), media_type=FLOAT32, headers={"X-Count": str(len(values))})
+    return JSONResponse(to_builtin(content))
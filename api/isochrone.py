@@ -0,0 +1,166 @@
+import json
+import threading
+
+from collections import OrderedDict
+
+import numpy as np
+
+from features import combine_features, distance_features, time_features, uses_aggregates
+
+# Bounding box accepted by TripInput: (min longitude, min latitude, max longitude, max latitude)
+GRID_BOUNDS = (-75.0, 40.0, -73.0, 43.0)
+
+# Pickup times are rounded down to this many minutes, so nearby requests share a tile
+TIME_BUCKET_MINUTES = 15
+
+
+def grid_centers(cell_degrees, bounds=GRID_BOUNDS):
+    """
+    Cell center longitudes (nx,) and latitudes (ny,) of a regular grid over `bounds`.
+    """
+    min_lon, min_lat, max_lon, max_lat = bounds
+    nx = int(round((max_lon - min_lon) / cell_degrees))
+    ny = int(round((max_lat - min_lat) / cell_degrees))
+    return min_lon + (np.arange(nx) + 0.5) * cell_degrees, min_lat + (np.arange(ny) + 0.5) * cell_degrees
+
+
+def snap_to_cell(longitude, latitude, cell_degrees, bounds=GRID_BOUNDS):
+    """
+    Returns the (column, row) of the grid cell containing a point.
+    """
+    lon, lat = grid_centers(cell_degrees, bounds)
+    column = min(int((longitude - bounds[0]) // cell_degrees), len(lon) - 1)
+    row = min(int((latitude - bounds[1]) // cell_degrees), len(lat) - 1)
+    return column, row
+
+
+def time_bucket(pickup_datetime, minutes=TIME_BUCKET_MINUTES):
+    """
+    Rounds a datetime64[m] down to the start of its time bucket.
+    """
+    return pickup_datetime - (pickup_datetime - np.datetime64("1970-01-01T00:00")) % np.timedelta64(minutes, "m")
+
+
+def isochrone_grid(model, origin_cell, pickup_datetime, context, cell_degrees, bounds=GRID_BOUNDS):
+    """
+    Predicts the duration (minutes) from the center of `origin_cell` to every cell of the grid.
+
+    Parameters:
+    - model: A ModelArtifact.
+    - origin_cell: (column, row) from `snap_to_cell`.
+    - pickup_datetime: datetime64[m] pickup time shared by all cells.
+    - context: (store_and_fwd_flag, vendor_id, passenger_count).
+    - cell_degrees: Grid resolution in degrees.
+
+    Returns:
+    - float32 array of shape (ny, nx), row 0 at the southern edge. Cells far outside the
+      training distribution whose prediction overflows are +inf.
+    """
+    lon, lat = grid_centers(cell_degrees, bounds)
+    distance = distance_features(lon[origin_cell[0]], lat[origin_cell[1]], lon[None, :], lat[:, None])
+    time = time_features(np.atleast_1d(pickup_datetime))
+
+    trips = combine_features(distance, time, *context, model.header["preprocessing"]["virtual_time_distance"],
+                             uses_aggregates(model))
+    with np.errstate(over="ignore"):
+        minutes = np.round(np.broadcast_to(model.predict_duration(trips), (len(lat), len(lon)))) / 60
+        return np.where(minutes < np.finfo(np.float32).max, minutes, np.inf).astype(np.float32)
+
+
+def reachable_runs(grid, minutes):
+    """
+    Encodes the cells reachable within `minutes` as horizontal runs.
+
+    Returns:
+    - List of [row, first_column, last_column + 1]; together the runs form the isochrone polygon.
+    """
+    inside = np.zeros((grid.shape[0], grid.shape[1] + 2), dtype=np.int8)
+    inside[:, 1:-1] = grid <= minutes
+    edges = np.diff(inside, axis=1)
+    starts = np.argwhere(edges == 1)
+    stops = np.argwhere(edges == -1)
+    return np.column_stack([starts[:, 0], starts[:, 1], stops[:, 1]]).tolist()
+
+
+
+def durations_json(grid):
+    """
+    JSON text (bytes) of a grid as nested lists of minutes rounded to 0.01, null where not finite.
+    """
+    durations = np.where(np.isfinite(grid), np.round(grid.astype(np.float64), 2), None)
+    return json.dumps(durations.tolist(), allow_nan=False).encode()
+
+class TileCache:
+    '''
+    LRU of isochrone grids bounded by their total size.
+
+    Keys identify everything a grid depends on (model version, origin cell, time
+    bucket, trip context, resolution); values are read-only float32 arrays.
+    The JSON rendering of a grid is kept next to it (and counted in the size)
+    once requested. A grid larger than the whole budget is not kept.
+
+    Attributes:
+        max_bytes (int): Maximum total size of the grids kept.
+    '''
+
+    def __init__(self, max_bytes=64 << 20):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._tiles = OrderedDict()
+        self._rendered = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+            return tile
+
+    def put(self, key, tile):
+        tile.setflags(write=False)
+        if tile.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._tiles[key] = tile
+            self.bytes += tile.nbytes
+            self._evict()
+
+    def rendered(self, key, render):
+        """
+        JSON rendering of the grid cached under `key`: made by `render()` on first use,
+        then kept until the grid is evicted.
+        """
+        with self._lock:
+            text = self._rendered.get(key)
+        if text is not None:
+            return text
+        text = render()
+        with self._lock:
+            if key in self._tiles and key not in self._rendered:
+                self._rendered[key] = text
+                self.bytes += len(text)
+                self._evict()
+        return text
+
+    def _remove(self, key):
+        tile = self._tiles.pop(key, None)
+        if tile is not None:
+            self.bytes -= tile.nbytes
+        text = self._rendered.pop(key, None)
+        if text is not None:
+            self.bytes -= len(text)
+
+    def _evict(self):
+        while self.bytes > self.max_bytes:
+            self._remove(next(iter(self._tiles)))
+
+    def clear(self):
+        with self._lock:
+            self._tiles.clear()
+            self._rendered.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._tiles)
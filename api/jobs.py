@@ -0,0 +1,314 @@
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+import traceback
+import uuid
+
+from trip_files import OUTPUT_HEADER, count_rows, format_csv, read_csv_chunks, read_parquet_chunks, score_rows
+
+READERS = {"csv": read_csv_chunks, "parquet": read_parquet_chunks}
+
+
+class JobManager:
+    '''
+    Scores trip files too large for one request in the background, chunk by chunk.
+
+    Every job has a directory under `directory` with its uploaded input (if any),
+    `job.json` holding its state, and one CSV file of results per completed chunk.
+    The state is saved after every chunk, so `start` resumes jobs a restart left
+    unfinished from their last completed chunk. A job created with the idempotency
+    key of an existing one is that job.
+
+    The model is resolved to a name and version when the job is created, and the
+    same model object scores every chunk, even if the active model is swapped
+    meanwhile. A job resumed after a restart fails if its model changed since.
+
+    Finished jobs are deleted `retention_seconds` after they finished (checked by
+    idle workers), or with `delete`.
+
+    Attributes:
+        directory (str): Where jobs are kept.
+        predict (callable): Called with clean trip columns and a model (from `resolve`), returns predicted minutes.
+        resolve (callable): Called with a model name (None for the active model), returns (name, version, model).
+        workers (int): Jobs scored at the same time.
+        chunk_rows (int): Default number of trips per chunk.
+        retention_seconds (float): How long finished jobs are kept (None to keep them).
+    '''
+
+    def __init__(self, directory, predict, resolve, workers=2, chunk_rows=100000, retention_seconds=None):
+        self.directory = directory
+        self.predict = predict
+        self.resolve = resolve
+        self.workers = workers
+        self.chunk_rows = chunk_rows
+        self.retention_seconds = retention_seconds
+
+        self._jobs = {}
+        self._keys = {}
+        self._models = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        """
+        Loads the jobs in `directory`, queues the unfinished ones (oldest first) and starts the workers.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        jobs = []
+        for job_id in os.listdir(self.directory):
+            try:
+                with open(self._path(job_id, "job.json")) as f:
+                    jobs.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # an upload interrupted before its job was created
+
+        with self._lock:
+            for job in sorted(jobs, key=lambda job: job["created_at"]):
+                job.setdefault("model_version", None)  # jobs saved before versions were recorded
+                self._jobs[job["id"]] = job
+                if job["idempotency_key"] is not None:
+                    self._keys[job["idempotency_key"]] = job["id"]
+                if job["status"] in ("queued", "running"):
+                    job["status"] = "queued"
+                    self._queue.put(job["id"])
+
+        self.expire()
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._run, name=f"job-worker-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def new_job_dir(self):
+        """
+        Creates the directory of a job about to be created (to upload its input into).
+
+        Returns:
+        - (job id, directory)
+        """
+        job_id = uuid.uuid4().hex
+        os.makedirs(self._path(job_id), exist_ok=True)
+        return job_id, self._path(job_id)
+
+    def discard(self, job_id):
+        """
+        Removes the directory of a job that was never created (e.g. after a failed upload).
+        """
+        shutil.rmtree(self._path(job_id), ignore_errors=True)
+
+    def find(self, idempotency_key):
+        """
+        Status of the job created with an idempotency key, or None.
+        """
+        with self._lock:
+            job_id = self._keys.get(idempotency_key)
+        return self.status(job_id) if job_id is not None else None
+
+    def create(self, input_path, file_format, model=None, chunk_rows=None, idempotency_key=None, job_id=None):
+        """
+        Queues the scoring of a CSV or Parquet trip file.
+
+        Parameters:
+        - input_path: File to score; it is read while the job runs.
+        - file_format: 'csv' or 'parquet'.
+        - model: Model name, None for the active model (resolved to its name and version now).
+        - chunk_rows: Trips per chunk (default `chunk_rows`).
+        - idempotency_key: Client key identifying the job across retries.
+        - job_id: Id from `new_job_dir` when the input was uploaded there.
+
+        Returns:
+        - (status, created): the job status, and False if a job with the same key already existed
+          (the new job directory is then removed).
+        """
+        model, model_version, model_object = self.resolve(model)
+        with self._lock:
+            if idempotency_key is not None and idempotency_key in self._keys:
+                if job_id is not None:
+                    self.discard(job_id)
+                existing = self._keys[idempotency_key]
+                created = False
+            else:
+                if job_id is None:
+                    job_id, _ = self.new_job_dir()
+                self._jobs[job_id] = {
+                    "id": job_id, "idempotency_key": idempotency_key, "status": "queued",
+                    "input_path": os.path.abspath(input_path), "format": file_format,
+                    "model": model, "model_version": model_version,
+                    "chunk_rows": chunk_rows or self.chunk_rows, "created_at": time.time(), "finished_at": None,
+                    "rows_total": None, "rows_done": 0, "invalid_rows": 0, "chunks_done": 0,
+                    "seconds": 0.0, "error": None,
+                }
+                if idempotency_key is not None:
+                    self._keys[idempotency_key] = job_id
+                self._models[job_id] = model_object
+                self._save(self._jobs[job_id])
+                self._queue.put(job_id)
+                existing, created = job_id, True
+        return self.status(existing), created
+
+    def status(self, job_id):
+        """
+        Progress of a job: rows done out of rows total, throughput and estimated remaining time.
+
+        Returns:
+        - Dictionary, or None for an unknown job.
+        """
+        with self._lock:
+            job = dict(self._jobs[job_id]) if job_id in self._jobs else None
+        if job is None:
+            return None
+
+        rows_per_second = job["rows_done"] / job["seconds"] if job["seconds"] else None
+        remaining = job["rows_total"] - job["rows_done"] if job["rows_total"] is not None else None
+        return {
+            "id": job["id"], "status": job["status"], "model": job["model"], "model_version": job["model_version"],
+            "format": job["format"],
+            "rows_total": job["rows_total"], "rows_done": job["rows_done"], "invalid_rows": job["invalid_rows"],
+            "chunks_done": job["chunks_done"], "chunk_rows": job["chunk_rows"],
+            "progress": round(job["rows_done"] / job["rows_total"], 4) if job["rows_total"] else None,
+            "rows_per_second": round(rows_per_second, 1) if rows_per_second else None,
+            "eta_seconds": round(remaining / rows_per_second, 1) if rows_per_second and remaining is not None else None,
+            "created_at": job["created_at"], "finished_at": job["finished_at"], "error": job["error"],
+        }
+
+    def delete(self, job_id):
+        """
+        Deletes a job, its input upload and its results. A queued or running job is stopped
+        (after its current chunk) and its directory removed by its worker.
+
+        Returns:
+        - False for an unknown job.
+        """
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+            if job is None:
+                return False
+            self._keys.pop(job["idempotency_key"], None)
+            self._models.pop(job_id, None)
+            active = job["status"] in ("queued", "running")
+            try:
+                os.remove(self._path(job_id, "job.json"))  # not resumed by a restart in the meantime
+            except FileNotFoundError:
+                pass
+        if not active:
+            self.discard(job_id)
+        return True
+
+    def expire(self):
+        """
+        Deletes the jobs that finished more than `retention_seconds` ago.
+        """
+        if self.retention_seconds is None:
+            return
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job["finished_at"] is not None and job["finished_at"] < cutoff]
+        for job_id in expired:
+            self.delete(job_id)
+
+    def results(self, job_id):
+        """
+        Yields the results CSV of a finished job in blocks: the header, then every chunk file in order.
+        """
+        yield OUTPUT_HEADER.encode()
+        for chunk in range(self._jobs[job_id]["chunks_done"]):
+            with open(self._chunk_path(job_id, chunk), "rb") as f:
+                while block := f.read(1 << 20):
+                    yield block
+
+    def _run(self):
+        while True:
+            try:
+                job_id = self._queue.get(timeout=60)
+            except queue.Empty:
+                self.expire()
+                continue
+            try:
+                self._process(job_id)
+            except Exception as e:
+                traceback.print_exc()
+                self._update(job_id, status="failed", error=str(e), finished_at=time.time())
+            finally:
+                with self._lock:
+                    self._models.pop(job_id, None)
+                    deleted = job_id not in self._jobs
+                if deleted:
+                    self.discard(job_id)
+
+    def _model(self, job):
+        # The model resolved at creation, or after a restart the same version resolved again
+        with self._lock:
+            model = self._models.get(job["id"])
+        if model is not None:
+            return model
+        name, version, model = self.resolve(job["model"])
+        if job["model_version"] is not None and version != job["model_version"]:
+            raise ValueError(f"Model '{name}' changed from version {job['model_version']} to {version} "
+                             f"since the job was created; submit it again")
+        with self._lock:
+            self._models[job["id"]] = model
+        self._update(job["id"], model_version=version)
+        return model
+
+    def _process(self, job_id):
+        with self._lock:
+            if job_id not in self._jobs:
+                return  # deleted while queued
+            job = dict(self._jobs[job_id])
+        model = self._model(job)
+        if job["rows_total"] is None:
+            self._update(job_id, rows_total=count_rows(job["input_path"], job["format"]))
+        self._update(job_id, status="running")
+
+        chunk = job["chunks_done"]
+        read_chunks = READERS[job["format"]](job["input_path"], job["chunk_rows"], skip_chunks=chunk)
+        start = time.perf_counter()
+        for ids, columns in read_chunks:
+            predictions, masks = score_rows(columns, lambda clean: self.predict(clean, model))
+
+            # Written under a temporary name first: a chunk file exists only once complete
+            path = self._chunk_path(job_id, chunk)
+            with open(path + ".tmp", "w", newline="") as f:
+                f.write(format_csv(ids, predictions, masks))
+            os.replace(path + ".tmp", path)
+
+            chunk += 1
+            with self._lock:
+                if job_id not in self._jobs:
+                    return  # deleted while running; the worker removes its directory
+                job = self._jobs[job_id]
+                job["chunks_done"] = chunk
+                job["rows_done"] += len(masks)
+                job["invalid_rows"] += int((masks != 0).sum())
+                job["seconds"] += time.perf_counter() - start
+                self._save(job)
+            start = time.perf_counter()
+
+        with self._lock:
+            if job_id not in self._jobs:
+                return
+            rows_done = self._jobs[job_id]["rows_done"]
+        self._update(job_id, status="done", rows_total=rows_done, finished_at=time.time())
+
+    def _update(self, job_id, **changes):
+        with self._lock:
+            if job_id not in self._jobs:
+                return
+            self._jobs[job_id].update(changes)
+            self._save(self._jobs[job_id])
+
+    def _save(self, job):
+        path = self._path(job["id"], "job.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(job, f)
+        os.replace(path + ".tmp", path)
+
+    def _path(self, job_id, *names):
+        return os.path.join(self.directory, job_id, *names)
+
+    def _chunk_path(self, job_id, chunk):
+        return self._path(job_id, f"chunk-{chunk:06d}.csv")
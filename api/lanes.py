@@ -0,0 +1,202 @@
+import asyncio
+import functools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, Request
+from fastapi.routing import APIRoute
+
+
+class Lane:
+    '''
+    Bounded executor for one class of requests.
+
+    Work waits in the lane's own queue for one of its worker threads, so a
+    lane can never take the threads of another one. When `max_queue` items
+    are already waiting, new ones are rejected with a 503 instead of piling up.
+
+    Attributes:
+        name (str): Lane name, as reported in statistics.
+        workers (int): Threads running the lane's work at once (its share of the CPU).
+        max_queue (int): Items allowed to wait for a worker.
+    '''
+
+    def __init__(self, name, workers, max_queue):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix=f"lane-{name}")
+        self._idle = threading.Condition()
+        self._stats = {
+            "queued": 0, "running": 0, "max_queued": 0, "completed": 0, "rejected": 0,
+            "sum_wait": 0.0, "max_wait": 0.0, "sum_run": 0.0,
+        }
+
+    async def run(self, function, *args, **kwargs):
+        """
+        Runs `function` on one of the lane's threads and returns its result.
+
+        Raises:
+        - HTTPException 503 when the lane's queue is full.
+        """
+        with self._idle:
+            if self._stats["queued"] >= self.max_queue:
+                self._stats["rejected"] += 1
+                raise HTTPException(status_code=503, detail=f"The {self.name} lane is full, retry later.")
+            self._stats["queued"] += 1
+            self._stats["max_queued"] = max(self._stats["max_queued"], self._stats["queued"])
+        return await asyncio.wrap_future(self._executor.submit(self._call, time.perf_counter(), function, args, kwargs))
+
+    def call(self, function, *args, **kwargs):
+        """
+        Runs `function` on one of the lane's threads, blocking the calling thread until it returns.
+        For background threads (e.g. job workers) whose work must count in the lane's CPU share
+        and statistics. Never rejected: such callers are few and wait for their own results.
+        """
+        with self._idle:
+            self._stats["queued"] += 1
+            self._stats["max_queued"] = max(self._stats["max_queued"], self._stats["queued"])
+        return self._executor.submit(self._call, time.perf_counter(), function, args, kwargs).result()
+
+    def _call(self, submitted, function, args, kwargs):
+        started = time.perf_counter()
+        with self._idle:
+            wait = started - submitted
+            self._stats["queued"] -= 1
+            self._stats["running"] += 1
+            self._stats["sum_wait"] += wait
+            self._stats["max_wait"] = max(self._stats["max_wait"], wait)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            with self._idle:
+                self._stats["running"] -= 1
+                self._stats["completed"] += 1
+                self._stats["sum_run"] += time.perf_counter() - started
+                if not self._stats["queued"] + self._stats["running"]:
+                    self._idle.notify_all()
+
+    def pending(self):
+        """
+        Number of items queued or running.
+        """
+        with self._idle:
+            return self._stats["queued"] + self._stats["running"]
+
+    def wait_idle(self, timeout):
+        """
+        Blocks until nothing is queued or running in the lane, or `timeout` seconds passed.
+
+        Returns:
+        - Seconds waited.
+        """
+        start = time.perf_counter()
+        with self._idle:
+            self._idle.wait_for(lambda: not self._stats["queued"] + self._stats["running"], timeout)
+        return time.perf_counter() - start
+
+    def snapshot(self):
+        """
+        Queue depth and wait time statistics of the lane.
+        """
+        with self._idle:
+            stats = dict(self._stats)
+        started = stats["completed"] + stats["running"]
+        return {
+            "workers": self.workers, "max_queue": self.max_queue,
+            "queued": stats["queued"], "running": stats["running"], "max_queued": stats["max_queued"],
+            "completed": stats["completed"], "rejected": stats["rejected"],
+            "mean_wait_ms": round(stats["sum_wait"] / started * 1e3, 3) if started else None,
+            "max_wait_ms": round(stats["max_wait"] * 1e3, 3),
+            "mean_run_ms": round(stats["sum_run"] / stats["completed"] * 1e3, 3) if stats["completed"] else None,
+        }
+
+
+class PriorityLanes:
+    '''
+    An interactive lane for latency-critical requests and a bulk lane for large ones.
+
+    Bulk work is split into chunks and calls `yield_to_interactive` between them:
+    while interactive requests are queued or running, it pauses (for at most
+    `max_yield_seconds` per chunk, so bulk work still progresses under constant
+    interactive load).
+
+    Attributes:
+        interactive (Lane): Lane of single-trip requests.
+        bulk (Lane): Lane of batch requests.
+        max_yield_seconds (float): Longest pause of bulk work between two chunks.
+    '''
+
+    def __init__(self, interactive_workers, bulk_workers, max_queue, max_yield_seconds=0.05):
+        self.interactive = Lane("interactive", interactive_workers, max_queue)
+        self.bulk = Lane("bulk", bulk_workers, max_queue)
+        self.max_yield_seconds = max_yield_seconds
+
+        self._lock = threading.Lock()
+        self._yields = {"chunks": 0, "pauses": 0, "pause_seconds": 0.0}
+
+    def route(self, lane_name):
+        """
+        Decorator running a synchronous endpoint on a lane instead of the shared threadpool.
+        The undecorated function stays available as `__wrapped__`.
+        """
+        def decorator(function):
+            @functools.wraps(function)
+            async def endpoint(*args, **kwargs):
+                return await getattr(self, lane_name).run(function, *args, **kwargs)
+            endpoint.lane = lane_name
+            return endpoint
+        return decorator
+
+    def route_class(self):
+        """
+        APIRoute class under which endpoints decorated with `route` also decode their JSON
+        body on their lane, so a large body does not hold up the event loop.
+        """
+        lanes = self
+
+        class LaneRequest(Request):
+            async def json(self):
+                if not hasattr(self, "_json"):
+                    body = await self.body()
+                    self._json = await getattr(lanes, self.scope["lane"]).run(json.loads, body)
+                return self._json
+
+        class LaneRoute(APIRoute):
+            def get_route_handler(self):
+                handler = super().get_route_handler()
+                lane_name = getattr(self.endpoint, "lane", None)
+                if lane_name is None:
+                    return handler
+
+                async def route_handler(request):
+                    request.scope["lane"] = lane_name
+                    return await handler(LaneRequest(request.scope, request.receive))
+                return route_handler
+
+        return LaneRoute
+
+    def yield_to_interactive(self):
+        """
+        Called by bulk work between chunks: pauses while interactive requests are pending.
+        """
+        paused = 0.0
+        if self.interactive.pending():
+            paused = self.interactive.wait_idle(self.max_yield_seconds)
+        with self._lock:
+            self._yields["chunks"] += 1
+            self._yields["pauses"] += paused > 0
+            self._yields["pause_seconds"] += paused
+
+    def snapshot(self):
+        with self._lock:
+            yields = dict(self._yields)
+        return {
+            "interactive": self.interactive.snapshot(),
+            "bulk": {**self.bulk.snapshot(), "chunks": yields["chunks"], "pauses": yields["pauses"],
+                     "pause_seconds": round(yields["pause_seconds"], 3)},
+            "max_yield_seconds": self.max_yield_seconds,
+        }
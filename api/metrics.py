@@ -0,0 +1,49 @@
+import threading
+import time
+
+
+class Metrics:
+    '''
+    Process-wide counters served at /metrics.
+
+    Counters only ever increase; ratios are derived from them when a
+    snapshot is taken, so they cover the whole lifetime of the process.
+
+    Attributes:
+        started_at (float): Unix time the counters were created.
+    '''
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._counters = {}
+        self._ratios = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name, value=1):
+        """
+        Adds `value` to the counter `name` (created at 0 on first use).
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def ratio(self, name, numerator, denominator, complement=False):
+        """
+        Declares a ratio reported in snapshots as numerator / denominator
+        (or 1 - numerator / denominator with `complement`).
+        """
+        self._ratios[name] = (numerator, denominator, complement)
+
+    def snapshot(self):
+        """
+        Returns a JSON-serializable copy of every counter and derived ratio.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+
+        ratios = {}
+        for name, (numerator, denominator, complement) in self._ratios.items():
+            total = counters.get(denominator, 0)
+            value = counters.get(numerator, 0) / total if total else None
+            ratios[name] = round(1 - value if complement else value, 4) if value is not None else None
+
+        return {"uptime_seconds": round(time.time() - self.started_at, 1), "counters": counters, "ratios": ratios}
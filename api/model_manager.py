@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+import traceback
+
+from contextlib import contextmanager
+
+from model_artifact import HEADER_FILE, load_artifact
+from warmup import warm_up_model
+
+
+class ModelHandle:
+    '''
+    A loaded model plus the bookkeeping needed to retire it safely.
+
+    Attributes:
+        model (ModelArtifact): The loaded artifact.
+        path (str): Artifact directory it was loaded from.
+        loaded_at (float): Unix time the model became active.
+        load_seconds (float): Time spent loading and warming it up.
+        in_flight (int): Requests currently scoring with this model.
+    '''
+
+    def __init__(self, model, path, load_seconds):
+        self.model = model
+        self.path = path
+        self.loaded_at = time.time()
+        self.load_seconds = load_seconds
+        self.in_flight = 0
+
+
+class ModelManager:
+    '''
+    Owns the active model and swaps it without restarting the server.
+
+    A new artifact is loaded, validated and warmed up while requests keep
+    using the current model; only then is the active reference swapped.
+    Requests that started on the old model finish on it (they hold their own
+    reference through `acquire`), and the old handle is dropped once drained.
+
+    Attributes:
+        path (str): Artifact directory of the active model.
+        watch_interval (float): Seconds between checks of the artifact header for changes (0 disables watching).
+    '''
+
+    def __init__(self, path, watch_interval=0):
+        self.path = path
+        self.watch_interval = watch_interval
+
+        self._active = None
+        self._retired = []
+        self._lock = threading.Lock()          # guards the active reference and in-flight counts
+        self._reload_lock = threading.Lock()   # one reload at a time
+        self._on_swap = []
+        self._watched_mtime = None
+        self._last_error = None
+        self._loads = 0
+
+    @property
+    def model(self):
+        return self._active.model if self._active else None
+
+    def on_swap(self, callback):
+        """
+        Registers a callback run after every swap (e.g. to invalidate prediction caches).
+        """
+        self._on_swap.append(callback)
+
+    def _load(self, path):
+        start = time.perf_counter()
+        model = load_artifact(path)
+        warm_up_model(model)  # validates the artifact before it can serve traffic
+        return ModelHandle(model, path, time.perf_counter() - start)
+
+    def _header_mtime(self, path):
+        try:
+            return os.stat(os.path.join(path, HEADER_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def reload(self, path=None):
+        """
+        Loads, validates and warms up an artifact, then makes it the active model.
+
+        Parameters:
+        - path: Artifact directory (default: reload the current path).
+
+        Returns:
+        - The new ModelHandle.
+
+        Raises:
+        - Any loading or validation error; the current model stays active in that case.
+        """
+        path = path or self.path
+        with self._reload_lock:
+            mtime = self._header_mtime(path)
+            try:
+                handle = self._load(path)
+            except Exception as e:
+                self._last_error = f"{path}: {e}"
+                raise
+
+            with self._lock:
+                old, self._active = self._active, handle
+                self.path = path
+                self._watched_mtime = mtime
+                self._last_error = None
+                self._loads += 1
+                if old is not None and old.in_flight > 0:
+                    self._retired.append(old)
+
+            for callback in self._on_swap:
+                callback()
+
+            print(f"Model swapped to {path} (loaded in {handle.load_seconds:.3f}s)")
+            return handle
+
+    @contextmanager
+    def acquire(self):
+        """
+        Yields the active model for the duration of one request.
+        """
+        with self._lock:
+            handle = self._active
+            if handle is None:
+                raise RuntimeError("No model is loaded")
+            handle.in_flight += 1
+        try:
+            yield handle.model
+        finally:
+            with self._lock:
+                handle.in_flight -= 1
+                if handle is not self._active and handle.in_flight == 0 and handle in self._retired:
+                    self._retired.remove(handle)
+
+    def start_watching(self):
+        """
+        Starts a daemon thread that reloads the model when its artifact header changes.
+        """
+        if self.watch_interval <= 0:
+            return
+
+        def watch():
+            while True:
+                time.sleep(self.watch_interval)
+                mtime = self._header_mtime(self.path)
+                if mtime is None or mtime == self._watched_mtime:
+                    continue
+                try:
+                    self.reload()
+                except Exception:
+                    traceback.print_exc()
+                    self._watched_mtime = mtime  # do not retry a broken artifact until it changes again
+
+        threading.Thread(target=watch, name="model-watcher", daemon=True).start()
+
+    def status(self):
+        """
+        Returns a JSON-serializable description of the active and draining models.
+        """
+        with self._lock:
+            active = self._active
+            return {
+                "model_path": self.path,
+                "loaded_at": active.loaded_at if active else None,
+                "load_seconds": round(active.load_seconds, 4) if active else None,
+                "in_flight": active.in_flight if active else 0,
+                "draining": [{"model_path": h.path, "in_flight": h.in_flight} for h in self._retired],
+                "loads": self._loads,
+                "watch_interval": self.watch_interval,
+                "last_error": self._last_error,
+            }
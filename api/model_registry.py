@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+
+from model_artifact import HEADER_FILE, load_artifact
+from model_manager import ModelHandle
+
+
+def model_footprint(model):
+    """
+    Approximate resident memory of a loaded artifact in bytes (coefficients, compiled weights, header).
+    """
+    size = model.coef.nbytes + len(model.features) * 8 + len(str(model.header))
+    size += sum(categories.nbytes + weights.nbytes for _, categories, weights in model.categorical)
+    return size
+
+
+class ModelRegistry:
+    '''
+    Serves every artifact in the models directory by name.
+
+    The default model is the one owned by the ModelManager (hot-swappable).
+    Other models are loaded on first use and kept in an LRU of at most
+    `max_resident` entries, so memory stays bounded however many artifacts exist.
+
+    Attributes:
+        models_dir (str): Directory scanned for artifact subdirectories.
+        manager (ModelManager): Owner of the default model.
+        max_resident (int): Maximum number of non-default models kept loaded.
+    '''
+
+    def __init__(self, models_dir, manager, max_resident=3):
+        self.models_dir = models_dir
+        self.manager = manager
+        self.max_resident = max_resident
+
+        self._resident = OrderedDict()  # name -> ModelHandle, least recently used first
+        self._last_used = {}
+        self._lock = threading.Lock()
+
+    @property
+    def default_name(self):
+        return os.path.basename(os.path.normpath(self.manager.path))
+
+    def available(self):
+        """
+        Names of every artifact directory in `models_dir`.
+        """
+        return sorted(name for name in os.listdir(self.models_dir)
+                      if os.path.exists(os.path.join(self.models_dir, name, HEADER_FILE)))
+
+    def _get(self, name):
+        with self._lock:
+            self._last_used[name] = time.time()
+            if name in self._resident:
+                self._resident.move_to_end(name)
+                return self._resident[name]
+
+            if name not in self.available():
+                raise KeyError(name)
+
+            start = time.perf_counter()
+            path = os.path.join(self.models_dir, name)
+            handle = ModelHandle(load_artifact(path), path, time.perf_counter() - start)
+
+            self._resident[name] = handle
+            while len(self._resident) > self.max_resident:
+                self._resident.popitem(last=False)  # requests still using it keep their reference
+            return handle
+
+    @contextmanager
+    def acquire(self, name=None):
+        """
+        Yields the model called `name` (default model if None) for the duration of one request.
+
+        Raises:
+        - KeyError if no artifact with that name exists.
+        """
+        if name is None or name == self.default_name:
+            with self.manager.acquire() as model:
+                self._last_used[self.default_name] = time.time()
+                yield model
+            return
+
+        yield self._get(name).model
+
+    @contextmanager
+    def acquire_many(self, names):
+        """
+        Yields the models called `names` (in that order) for the duration of one request.
+
+        Raises:
+        - KeyError if one of the names does not exist.
+        """
+        with ExitStack() as stack:
+            yield [stack.enter_context(self.acquire(name)) for name in names]
+
+    def describe(self):
+        """
+        Lists every available model with its residency, memory footprint and load time.
+        """
+        with self._lock:
+            resident = dict(self._resident)
+
+        default = self.default_name
+        default_status = self.manager.status()
+        models = []
+        for name in self.available():
+            if name == default and self.manager.model is not None:
+                model, load_seconds = self.manager.model, default_status["load_seconds"]
+            elif name in resident:
+                model, load_seconds = resident[name].model, round(resident[name].load_seconds, 4)
+            else:
+                model, load_seconds = None, None
+
+            models.append({
+                "name": name,
+                "default": name == default,
+                "loaded": model is not None,
+                "preprocessing": model.header["preprocessing"]["pipeline"] if model else None,
+                "memory_bytes": model_footprint(model) if model else None,
+                "load_seconds": load_seconds,
+                "last_used": self._last_used.get(name),
+            })
+
+        return {"default": default, "max_resident": self.max_resident, "models": models}
@@ -0,0 +1,215 @@
+import math
+import queue
+import threading
+import time
+import traceback
+
+import numpy as np
+
+from features import AGGREGATE_FEATURE, aggregate_feature, uses_aggregates, with_virtual_time_distance
+
+
+class ShadowScorer:
+    '''
+    Scores live traffic with a candidate model off the request path.
+
+    The prediction endpoints hand over the features and predictions they
+    already computed with `submit`, which never blocks: requests larger than
+    `sample_rows` are sampled down to that many trips (copied, so the queue
+    does not keep whole batches alive), and when `queue_rows` trips are already
+    queued the sample is dropped and counted. A background worker drains the
+    queue in batches, scores them with the candidate model and accumulates
+    online comparison statistics against the primary model.
+
+    Samples are tagged with the generation of the candidate they were queued
+    for; `start` and `stop` begin a new generation, so samples (or a batch being
+    scored) of a previous candidate never count in the statistics of the next.
+
+    Attributes:
+        registry (ModelRegistry): Used to load the candidate model by name.
+        queue_rows (int): Maximum number of queued trips.
+        sample_rows (int): Trips kept from a single request.
+        batch_size (int): Trips scored together by the worker (at least).
+        candidate (str): Name of the model being shadowed, or None when disabled.
+    '''
+
+    def __init__(self, registry, queue_rows=100000, sample_rows=2000, batch_size=512):
+        self.registry = registry
+        self.queue_rows = queue_rows
+        self.sample_rows = sample_rows
+        self.batch_size = batch_size
+        self.candidate = None
+
+        self._queue = queue.Queue()
+        self._queued_rows = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._worker = None
+        self.reset()
+
+    def reset(self):
+        """
+        Clears the comparison statistics.
+        """
+        with self._lock:
+            self._reset()
+
+    def _reset(self):
+        self._stats = {
+            "submitted": 0, "dropped": 0, "errors": 0, "batches": 0, "trips": 0,
+            "sum_diff": 0.0, "sum_squared_diff": 0.0, "sum_abs_diff": 0.0, "max_abs_diff": 0.0,
+            "sum_primary": 0.0, "sum_candidate": 0.0,
+            "score_seconds": 0.0, "primary_seconds": 0.0,
+            "scored_requests": 0, "sum_delay": 0.0, "max_delay": 0.0,
+            "started_at": time.time(), "last_error": None,
+        }
+
+    def start(self, candidate):
+        """
+        Starts shadowing `candidate` (a model name known to the registry) with fresh statistics.
+        """
+        with self._lock:
+            self._generation += 1
+            self.candidate = candidate
+            self._reset()
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+            self._worker.start()
+
+    def stop(self):
+        """
+        Stops shadowing; queued samples are discarded, statistics are kept until the next start.
+        """
+        with self._lock:
+            self._generation += 1
+            self.candidate = None
+
+    def submit(self, features, primary_duration, primary_seconds=0.0):
+        """
+        Queues features already built for the primary model, its predicted durations (seconds)
+        and the time the primary model spent scoring them.
+
+        Never blocks: returns False and counts a drop when `queue_rows` trips are already queued.
+        """
+        if self.candidate is None:
+            return False
+
+        primary_duration = np.atleast_1d(np.asarray(primary_duration))
+        n = len(primary_duration)
+        if n > self.sample_rows:
+            rows = np.linspace(0, n - 1, self.sample_rows).astype(np.int64)
+            features = {name: np.atleast_1d(value)[rows] for name, value in features.items()}
+            primary_duration = primary_duration[rows]
+            primary_seconds *= self.sample_rows / n
+
+        with self._lock:
+            generation = self._generation
+            if self.candidate is None:
+                return False
+            if self._queued_rows + len(primary_duration) > self.queue_rows:
+                self._stats["dropped"] += 1
+                return False
+            self._queued_rows += len(primary_duration)
+            self._stats["submitted"] += 1
+        self._queue.put((generation, features, primary_duration, primary_seconds, time.perf_counter()))
+        return True
+
+    def _next_batch(self):
+        samples = [self._queue.get()]
+        trips = len(samples[0][2])
+        while trips < self.batch_size:
+            try:
+                samples.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            trips += len(samples[-1][2])
+        with self._lock:
+            self._queued_rows -= trips
+        return samples
+
+    def _run(self):
+        while True:
+            samples = self._next_batch()
+            with self._lock:
+                generation, candidate = self._generation, self.candidate
+            samples = [sample[1:] for sample in samples if sample[0] == generation]
+            if candidate is None or not samples:
+                continue
+            try:
+                self._score(candidate, generation, samples)
+            except Exception as e:
+                traceback.print_exc()
+                with self._lock:
+                    if generation == self._generation:
+                        self._stats["errors"] += 1
+                        self._stats["last_error"] = f"{candidate}: {e}"
+
+    def _score(self, candidate, generation, samples):
+        features = {name: np.concatenate([np.atleast_1d(sample[0][name]) for sample in samples])
+                    for name in samples[0][0]}
+        primary = np.concatenate([sample[1] for sample in samples])
+
+        start = time.perf_counter()
+        with self.registry.acquire(candidate) as model:
+            variant = model.header["preprocessing"]["virtual_time_distance"]
+            features = with_virtual_time_distance(features, variant)
+            if uses_aggregates(model) and AGGREGATE_FEATURE not in features:
+                features[AGGREGATE_FEATURE] = aggregate_feature(features, features)
+            shadow = model.predict_duration(features)
+        now = time.perf_counter()
+
+        # Compared in minutes, like the API output
+        diff = (shadow - primary) / 60
+        delays = [now - sample[3] for sample in samples]
+
+        with self._lock:
+            if generation != self._generation:
+                return  # the candidate changed while this batch was scored
+            stats = self._stats
+            stats["batches"] += 1
+            stats["trips"] += len(diff)
+            stats["sum_diff"] += float(diff.sum())
+            stats["sum_squared_diff"] += float((diff ** 2).sum())
+            stats["sum_abs_diff"] += float(np.abs(diff).sum())
+            stats["max_abs_diff"] = max(stats["max_abs_diff"], float(np.abs(diff).max()))
+            stats["sum_primary"] += float(primary.sum()) / 60
+            stats["sum_candidate"] += float(shadow.sum()) / 60
+            stats["score_seconds"] += now - start
+            stats["primary_seconds"] += sum(sample[2] for sample in samples)
+            stats["scored_requests"] += len(samples)
+            stats["sum_delay"] += sum(delays)
+            stats["max_delay"] = max(stats["max_delay"], max(delays))
+
+    def status(self):
+        """
+        Returns a JSON-serializable summary of the comparison so far (differences in minutes,
+        candidate minus primary).
+        """
+        with self._lock:
+            stats = dict(self._stats)
+
+        trips, batches, scored_requests = stats["trips"], stats["batches"], stats["scored_requests"]
+        return {
+            "candidate": self.candidate,
+            "queue_rows": self.queue_rows,
+            "sample_rows": self.sample_rows,
+            "queued_rows": self._queued_rows,
+            "submitted": stats["submitted"],
+            "dropped": stats["dropped"],
+            "errors": stats["errors"],
+            "last_error": stats["last_error"],
+            "started_at": stats["started_at"],
+            "trips": trips,
+            "batches": batches,
+            "mean_primary_minutes": round(stats["sum_primary"] / trips, 4) if trips else None,
+            "mean_candidate_minutes": round(stats["sum_candidate"] / trips, 4) if trips else None,
+            "mean_diff": round(stats["sum_diff"] / trips, 4) if trips else None,
+            "mean_abs_diff": round(stats["sum_abs_diff"] / trips, 4) if trips else None,
+            "rmse_between_models": round(math.sqrt(stats["sum_squared_diff"] / trips), 4) if trips else None,
+            "max_abs_diff": round(stats["max_abs_diff"], 4),
+            "primary_us_per_trip": round(stats["primary_seconds"] / trips * 1e6, 3) if trips else None,
+            "candidate_us_per_trip": round(stats["score_seconds"] / trips * 1e6, 3) if trips else None,
+            "candidate_ms_per_batch": round(stats["score_seconds"] / batches * 1e3, 3) if batches else None,
+            "mean_queue_delay_ms": round(stats["sum_delay"] / scored_requests * 1e3, 3) if scored_requests else None,
+            "max_queue_delay_ms": round(stats["max_delay"] * 1e3, 3),
+        }
@@ -0,0 +1,104 @@
+import numpy as np
+
+
+class StackedScorer:
+    '''
+    Scores several compatible linear models with one matrix multiply.
+
+    Every model is rewritten over a shared design space: the union of their
+    numeric columns (scalers already folded into the weights) followed by one
+    indicator column per (feature, category) in the union of their one-hot
+    encoders. The coefficient vectors become the columns of `W`, so
+    `X @ W + b` returns all N predictions for every trip at once and the
+    features and encoding are computed a single time.
+
+    Attributes:
+        models (list): The ModelArtifacts, in column order of the output.
+        numeric (list): Numeric feature names of the design matrix.
+        categorical (list): (feature, categories) for the indicator blocks.
+        weights (np.ndarray): Stacked coefficients, shape (n_columns, N).
+        intercepts (np.ndarray): Intercepts, shape (N,).
+    '''
+
+    def __init__(self, models):
+        preprocessing = {(m.target, m.header["preprocessing"]["virtual_time_distance"]) for m in models}
+        if len(preprocessing) > 1:
+            raise ValueError("Models are not compatible: they use different targets or feature variants")
+
+        self.models = list(models)
+        self.numeric = list(dict.fromkeys(name for m in models for name, _ in m.numeric))
+
+        categories = {}
+        for m in models:
+            for name, model_categories, _ in m.categorical:
+                categories.setdefault(name, []).append(model_categories)
+        self.categorical = [(name, np.unique(np.concatenate(parts))) for name, parts in categories.items()]
+
+        n_columns = len(self.numeric) + sum(len(c) for _, c in self.categorical)
+        self.weights = np.zeros((n_columns, len(models)))
+        self.intercepts = np.array([m.intercept for m in models])
+
+        numeric_index = {name: i for i, name in enumerate(self.numeric)}
+        offsets, offset = {}, len(self.numeric)
+        for name, union in self.categorical:
+            offsets[name] = offset
+            offset += len(union)
+
+        for j, m in enumerate(models):
+            for name, weight in m.numeric:
+                self.weights[numeric_index[name], j] += weight
+            for name, model_categories, model_weights in m.categorical:
+                union = dict(self.categorical)[name]
+                self.weights[offsets[name] + np.searchsorted(union, model_categories), j] = model_weights
+
+    @property
+    def target(self):
+        return self.models[0].target
+
+    def design_matrix(self, features):
+        """
+        Builds the shared design matrix, one row per trip.
+
+        Parameters:
+        - features: Mapping of column name to array; arrays are broadcast against each other.
+
+        Returns:
+        - (X, shape): float64 matrix of shape (n_trips, n_columns) and the broadcast shape of the inputs.
+        """
+        names = self.numeric + [name for name, _ in self.categorical]
+        shape = np.broadcast_shapes(*(np.shape(features[name]) for name in names))
+        n = int(np.prod(shape))
+        X = np.zeros((n, self.weights.shape[0]))
+
+        for i, name in enumerate(self.numeric):
+            X[:, i] = np.broadcast_to(np.asarray(features[name], dtype=np.float64), shape).ravel()
+
+        offset = len(self.numeric)
+        for name, union in self.categorical:
+            values = np.broadcast_to(np.asarray(features[name]), shape).ravel()
+            if union.dtype.kind in "iuf":
+                values = values.astype(union.dtype, copy=False)
+            index = np.searchsorted(union, values).clip(0, len(union) - 1)
+            # handle_unknown='ignore': unseen categories leave the whole block at zero
+            hit = union[index] == values
+            X[np.flatnonzero(hit), offset + index[hit]] = 1.0
+            offset += len(union)
+
+        return X, shape
+
+    def predict(self, features):
+        """
+        Predicts the target of every model for every trip.
+
+        Returns:
+        - float64 array of shape (*broadcast shape, n_models).
+        """
+        X, shape = self.design_matrix(features)
+        return (X @ self.weights + self.intercepts).reshape(*shape, len(self.models))
+
+    def predict_duration(self, features):
+        """
+        Predicted durations in seconds, one column per model.
+        """
+        prediction = self.predict(features)
+        return np.expm1(prediction) if self.target == "log_trip_duration" else prediction
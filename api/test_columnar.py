@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from columnar import trip_columns, validate_columns
+
+TRIP = {
+    "store_and_fwd_flag": "N",
+    "vendor_id": 2,
+    "passenger_count": 1,
+    "pickup_longitude": -73.98,
+    "pickup_latitude": 40.76,
+    "dropoff_longitude": -73.96,
+    "dropoff_latitude": 40.77,
+    "pickup_date": "2016-03-23",
+    "pickup_time": "02:24",
+}
+
+
+def test_clean_batch_takes_fast_path():
+    assert trip_columns([TRIP, TRIP]) is not None
+
+
+@pytest.mark.parametrize("field, value", [
+    ("store_and_fwd_flag", "N\x00"),
+    ("pickup_date", "2016-03-23\x00"),
+    ("pickup_time", "02:24\x00"),
+])
+def test_nul_suffixed_strings_are_rejected(field, value):
+    trips = [TRIP, {**TRIP, field: value}]
+    assert trip_columns(trips) is None
+
+    columns = {name: [trip[name] for trip in trips] for name in TRIP}
+    masks = validate_columns(columns)
+    assert not masks[0] and masks[1]
+    masks = validate_columns(columns, prediction=True)
+    assert not masks[0] and masks[1]
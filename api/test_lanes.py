@@ -0,0 +1,27 @@
+import asyncio
+import threading
+
+from lanes import Lane
+
+
+def test_cancelled_waiting_item_frees_its_slot():
+    lane = Lane("test", 1, 2)
+    release = threading.Event()
+
+    async def main():
+        running = asyncio.create_task(lane.run(release.wait))
+        waiting = asyncio.create_task(lane.run(lambda: None))
+        await asyncio.sleep(0.05)
+        assert lane.pending() == 2
+
+        waiting.cancel()
+        await asyncio.sleep(0.05)
+        assert lane.pending() == 1
+
+        release.set()
+        await running
+        assert lane.pending() == 0
+
+    asyncio.run(main())
+    snapshot = lane.snapshot()
+    assert snapshot["queued"] == 0 and snapshot["completed"] == 1
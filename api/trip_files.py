@@ -0,0 +1,295 @@
+import csv
+import io
+from itertools import islice
+
+import numpy as np
+
+from columnar import FIELDS, clean_columns, is_digit, to_strings, validate_columns
+
+try:
+    import pyarrow.parquet
+except ImportError:  # Parquet files are refused when the package is not installed
+    pyarrow = None
+
+# Explicit dtype of every column read from a trip file; other columns (e.g. trip_duration) are skipped.
+# Strings get one character more than a valid value, so longer values are not truncated into valid ones.
+CSV_DTYPES = {
+    "id": object,
+    "vendor_id": np.float64,
+    "passenger_count": np.float64,
+    "pickup_longitude": np.float64,
+    "pickup_latitude": np.float64,
+    "dropoff_longitude": np.float64,
+    "dropoff_latitude": np.float64,
+    "store_and_fwd_flag": "U2",
+    "pickup_datetime": "U20",
+    "pickup_date": "U11",
+    "pickup_time": "U6",
+}
+
+OUTPUT_HEADER = "id,predicted_minutes,invalid_fields\r\n"
+
+# Longest CSV line accepted from a stream, so data without newlines cannot grow the buffer without limit
+MAX_LINE_BYTES = 1 << 16
+
+
+def parquet_supported():
+    return pyarrow is not None
+
+
+def column_layout(names):
+    """
+    Columns read from a file with the given header, as the shape of `data/split/test.csv`
+    (`pickup_datetime`) or of the API (`pickup_date` and `pickup_time`). `id` is optional.
+
+    Returns:
+    - List of (column index, column name).
+
+    Raises:
+    - ValueError naming the missing columns.
+    """
+    names = [name.strip() for name in names]
+    required = [field for field in FIELDS if field not in ("pickup_date", "pickup_time")]
+    required += ["pickup_datetime"] if "pickup_datetime" in names else ["pickup_date", "pickup_time"]
+    missing = [name for name in required if name not in names]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    return [(names.index(name), name) for name in ["id"] * ("id" in names) + required]
+
+
+def header_layout(line):
+    """
+    `column_layout` of a CSV header line.
+    """
+    return column_layout(next(csv.reader([line])))
+
+
+def file_layout(path, file_format):
+    """
+    `column_layout` of a CSV or Parquet file, read from its header or schema.
+    """
+    if file_format == "parquet":
+        return column_layout(pyarrow.parquet.ParquetFile(path).schema_arrow.names)
+    with open(path, encoding="utf-8-sig", newline="") as file:
+        return header_layout(file.readline())
+
+
+def parse_lines(lines, layout):
+    """
+    Parses CSV data lines into arrays with the dtypes of CSV_DTYPES.
+
+    When a value does not parse as its type, the lines are read again as text instead,
+    so that row fails validation rather than the whole chunk.
+
+    Returns:
+    - Dictionary of column name to array.
+
+    Raises:
+    - ValueError if a line does not have the columns of the header.
+    """
+    usecols = [index for index, _ in layout]
+    try:
+        records = np.loadtxt(lines, delimiter=",", quotechar='"', usecols=usecols, ndmin=1,
+                             dtype=[(name, CSV_DTYPES[name]) for _, name in layout])
+        return {name: records[name] for _, name in layout}
+    except ValueError:
+        text = np.loadtxt(lines, delimiter=",", quotechar='"', usecols=usecols, ndmin=2, dtype=str)
+        return {name: text[:, j] for j, (_, name) in enumerate(layout)}
+
+
+def split_datetime(values):
+    """
+    Splits 'YYYY-MM-DD HH:MM[:SS]' (or with a 'T') into 'YYYY-MM-DD' dates and 'HH:MM' times,
+    dropping the seconds. Any other value gives empty strings, which fail validation.
+    """
+    strings = to_strings(values)
+    n, width = len(strings), strings.dtype.itemsize // 4
+    if width < 16:
+        return np.full(n, "", dtype="U10"), np.full(n, "", dtype="U5")
+
+    codes = np.ascontiguousarray(strings).view(np.uint32).reshape(n, width)
+    length = np.count_nonzero(codes, axis=1)
+    seconds = np.zeros(n, dtype=bool)
+    if width >= 19:
+        seconds = (length == 19) & (codes[:, 16] == ord(":")) & is_digit(codes[:, 17:19]).all(axis=1) & (
+            codes[:, 17] < ord("6"))
+    shaped = ((length == 16) | seconds) & np.isin(codes[:, 10], [ord(" "), ord("T")])
+
+    codes = np.where(shaped[:, None], codes[:, :16], 0)
+    return (np.ascontiguousarray(codes[:, :10]).view("U10").reshape(n),
+            np.ascontiguousarray(codes[:, 11:16]).view("U5").reshape(n))
+
+
+def trip_rows(columns, first_row=0):
+    """
+    Trip fields of parsed file columns, and the id of every row (its position in the file,
+    counting from 0, when the file has no `id` column).
+
+    Returns:
+    - (ids, columns) with `columns` holding every field of FIELDS.
+    """
+    columns = dict(columns)
+    if "pickup_datetime" in columns:
+        columns["pickup_date"], columns["pickup_time"] = split_datetime(columns.pop("pickup_datetime"))
+    n = len(columns["vendor_id"])
+    ids = columns.pop("id", None)
+    if ids is None:
+        ids = np.arange(first_row, first_row + n)
+    return ids, columns
+
+
+def read_csv_chunks(path, chunk_rows, skip_chunks=0):
+    """
+    Reads a CSV trip file `chunk_rows` lines at a time, so memory is bounded by the chunk size.
+
+    Yields:
+    - (ids, columns) of every chunk after the first `skip_chunks`.
+    """
+    with open(path, encoding="utf-8-sig", newline="") as file:
+        layout = header_layout(file.readline())
+        for _ in islice(file, skip_chunks * chunk_rows):
+            pass
+        first_row = skip_chunks * chunk_rows
+        while lines := list(islice(file, chunk_rows)):
+            yield trip_rows(parse_lines(lines, layout), first_row)
+            first_row += len(lines)
+
+
+class CsvStream:
+    '''
+    Splits CSV trip data arriving in arbitrary byte blocks (e.g. an upload) into parsed
+    chunks, so memory is bounded by the chunk size instead of the size of the data.
+
+    The first line is the header; empty lines are skipped.
+
+    Attributes:
+        chunk_rows (int): Lines per chunk.
+        rows (int): Data lines parsed so far.
+    '''
+
+    def __init__(self, chunk_rows):
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self._layout = None
+        self._partial = b""
+        self._lines = []
+
+    def feed(self, data):
+        """
+        Adds a block of bytes and returns the (ids, columns) chunks completed by it.
+
+        Raises:
+        - ValueError if the header lacks trip columns or a line does not match it.
+        """
+        data = self._partial + data
+        end = data.rfind(b"\n") + 1
+        self._partial = data[end:]
+        if len(self._partial) > MAX_LINE_BYTES:
+            raise ValueError(f"A line is longer than {MAX_LINE_BYTES} bytes")
+        if end:
+            self._add(data[:end].decode("utf-8").splitlines())
+        return self._chunks(self.chunk_rows)
+
+    def finish(self):
+        """
+        Returns the remaining chunk, once all the data was fed.
+        """
+        if self._partial:
+            self._add(self._partial.decode("utf-8").splitlines())
+            self._partial = b""
+        if self._layout is None:
+            raise ValueError("The CSV has no header")
+        return self._chunks(1)
+
+    def _add(self, lines):
+        if self._layout is None and lines:
+            self._layout = header_layout(lines.pop(0).lstrip("\ufeff"))
+        self._lines.extend(line for line in lines if line)
+
+    def _chunks(self, minimum):
+        chunks = []
+        while len(self._lines) >= max(minimum, 1) and self._layout is not None:
+            lines, self._lines = self._lines[:self.chunk_rows], self._lines[self.chunk_rows:]
+            try:
+                columns = parse_lines(lines, self._layout)
+            except ValueError as e:
+                # loadtxt counts rows from the start of the chunk
+                raise ValueError(f"In data lines {self.rows + 1} to {self.rows + len(lines)}: {e}")
+            chunks.append(trip_rows(columns, self.rows))
+            self.rows += len(lines)
+        return chunks
+
+
+def read_parquet_chunks(path, chunk_rows, skip_chunks=0):
+    """
+    Reads a Parquet trip file in record batches of `chunk_rows` rows (needs pyarrow).
+
+    Yields:
+    - (ids, columns) of every chunk after the first `skip_chunks`.
+    """
+    parquet_file = pyarrow.parquet.ParquetFile(path)
+    layout = file_layout(path, "parquet")
+    batches = parquet_file.iter_batches(batch_size=chunk_rows, columns=[name for _, name in layout])
+    first_row = skip_chunks * chunk_rows
+    for batch in islice(batches, skip_chunks, None):
+        columns = {}
+        for name in batch.schema.names:
+            values = batch.column(name).to_numpy(zero_copy_only=False)
+            if values.dtype.kind == "M":
+                values = np.datetime_as_string(values, unit="m")
+            columns[name] = values
+        yield trip_rows(columns, first_row)
+        first_row += batch.num_rows
+
+
+def count_rows(path, file_format):
+    """
+    Number of trips in a file: its data lines for CSV (read in blocks), the metadata row count for Parquet.
+    """
+    if file_format == "parquet":
+        return pyarrow.parquet.ParquetFile(path).metadata.num_rows
+
+    lines, last = 0, b"\n"
+    with open(path, "rb") as file:
+        while block := file.read(1 << 24):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    return max(lines + (last != b"\n") - 1, 0)
+
+
+def score_rows(columns, predict):
+    """
+    Predicts the rows of a chunk that pass the TripInput rules.
+
+    Parameters:
+    - columns: Trip fields, as returned by `trip_rows`.
+    - predict: Called with the clean columns of the valid rows, returns their predictions.
+
+    Returns:
+    - (predictions, masks): predictions with NaN for invalid rows, and the error bitmask of
+      every row (see `columnar.validate_columns`).
+    """
+    masks = validate_columns(columns, prediction=True)
+    rows = np.flatnonzero(masks == 0)
+    predictions = np.full(len(masks), np.nan)
+    if len(rows):
+        predictions[rows] = predict(clean_columns(columns, rows))
+    return predictions, masks
+
+
+def format_csv(ids, predictions, masks):
+    """
+    Output CSV lines (without OUTPUT_HEADER): id, predicted minutes (empty for invalid rows) and
+    the invalid fields separated by ';'.
+    """
+    invalid_fields = {
+        mask: ";".join(field for bit, field in enumerate(FIELDS) if mask >> bit & 1)
+        for mask in np.unique(masks).tolist()
+    }
+    output = io.StringIO()
+    csv.writer(output).writerows(zip(
+        np.asarray(ids).tolist(),
+        ["" if value != value else value for value in predictions.tolist()],
+        [invalid_fields[mask] for mask in masks.tolist()],
+    ))
+    return output.getvalue()
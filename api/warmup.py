@@ -0,0 +1,70 @@
+import numpy as np
+
+from features import build_features, uses_aggregates
+
+# Batch sizes pushed through the prediction paths before the server reports ready
+WARMUP_BATCH_SIZES = [1, 10, 100, 1000]
+
+# Pickup/dropoff points spread over Manhattan plus both airports, so every branch is exercised
+WARMUP_LOCATIONS = [
+    (-73.988609, 40.748977),  # Midtown
+    (-73.992797, 40.763408),  # Hell's Kitchen
+    (-74.009300, 40.709400),  # Financial District
+    (-73.958000, 40.780000),  # Upper East Side
+    (-73.781600, 40.644700),  # JFK
+    (-73.874000, 40.774000),  # LaGuardia
+]
+
+
+def synthetic_trips(n, seed=0):
+    """
+    Generates `n` valid trip dictionaries (same fields as `TripInput`).
+    """
+    rng = np.random.default_rng(seed)
+    pickup = rng.integers(len(WARMUP_LOCATIONS), size=n)
+    dropoff = rng.integers(len(WARMUP_LOCATIONS), size=n)
+    jitter = rng.uniform(-0.005, 0.005, size=(n, 4))
+    months = rng.integers(1, 13, size=n)
+    days = rng.integers(1, 29, size=n)
+    hours = rng.integers(0, 24, size=n)
+    minutes = rng.integers(0, 60, size=n)
+
+    return [
+        {
+            "vendor_id": int(rng.integers(1, 3)),
+            "passenger_count": int(rng.integers(1, 7)),
+            "pickup_longitude": WARMUP_LOCATIONS[pickup[i]][0] + jitter[i, 0],
+            "pickup_latitude": WARMUP_LOCATIONS[pickup[i]][1] + jitter[i, 1],
+            "dropoff_longitude": WARMUP_LOCATIONS[dropoff[i]][0] + jitter[i, 2],
+            "dropoff_latitude": WARMUP_LOCATIONS[dropoff[i]][1] + jitter[i, 3],
+            "pickup_date": f"2016-{months[i]:02d}-{days[i]:02d}",
+            "pickup_time": f"{hours[i]:02d}:{minutes[i]:02d}",
+            "store_and_fwd_flag": "Y" if i % 20 == 0 else "N",
+        }
+        for i in range(n)
+    ]
+
+
+def synthetic_columns(n, seed=0):
+    """
+    Same trips as `synthetic_trips`, transposed into columns.
+    """
+    trips = synthetic_trips(n, seed)
+    return {field: [trip[field] for trip in trips] for field in trips[0]} if trips else {}
+
+
+def warm_up_model(model, batch_sizes=WARMUP_BATCH_SIZES):
+    """
+    Scores synthetic batches with a model to fault in its pages and NumPy code paths.
+
+    Also acts as a smoke test for freshly loaded artifacts.
+
+    Raises:
+    - ValueError if the model returns a wrong shape or non-finite durations.
+    """
+    virtual_time_distance = model.header["preprocessing"]["virtual_time_distance"]
+    for size in batch_sizes:
+        duration = model.predict_duration(build_features(synthetic_columns(size), virtual_time_distance,
+                                                         uses_aggregates(model)))
+        if duration.shape != (size,) or not np.all(np.isfinite(duration)):
+            raise ValueError(f"Model at {model.path} produced invalid predictions during warm-up")
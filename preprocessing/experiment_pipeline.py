@@ -1,6 +1,9 @@
 import numpy as np
 import pandas as pd
 
+from zone_index import default_zone_index
+from aggregate_tables import aggregate_zones, cell_keys, default_aggregate_table, hour_of_week, out_of_fold_medians
+
 
 def column_transformation(df):
     # Shrinking column values
@@ -46,7 +49,7 @@ def clean_outliers(df):
     return df
 
 
-def engineer_feature(df):
+def engineer_feature(df, fit=False):
     df['requires_large_vehicle'] = ((df['passenger_count'] == 5) | (df['passenger_count'] == 6)).astype("int")
 
     # Using distance formula:
@@ -76,30 +79,15 @@ def engineer_feature(df):
     df["log_trip_distance_cube"] = np.log1p((np.sqrt(x**2 + y**2))**3)
 
 
-    # Coordinates are taken from Google Maps
-    JFK_LATITUDE_RANGE = [40.620998, 40.683139]
-    JFK_LONGITUDE_RANGE = [-73.841476, -73.729188]
-
-    LG_LATITUDE_RANGE = [40.763557, 40.787499]
-    LG_LONGITUDE_RANGE = [-73.899899, -73.848085]
-
-    # JFK bounding box
-    df["is_jfk_airport"] = (
-        ((df["pickup_latitude"].between(JFK_LATITUDE_RANGE[0], JFK_LATITUDE_RANGE[1])) &
-        (df["pickup_longitude"].between(JFK_LONGITUDE_RANGE[0], JFK_LONGITUDE_RANGE[1])))
-        |
-        ((df["dropoff_latitude"].between(JFK_LATITUDE_RANGE[0], JFK_LATITUDE_RANGE[1])) &
-        (df["dropoff_longitude"].between(JFK_LONGITUDE_RANGE[0], JFK_LONGITUDE_RANGE[1])))
-    ).astype("int")
+    # Zone membership from the shared zone raster (scripts/zone_index.py, zones in scripts/nyc_zones.json).
+    # The airport zones are the Google Maps bounding boxes used before, so the flags are unchanged.
+    zones = default_zone_index()
+    df["pickup_zone"] = zones.lookup(df["pickup_longitude"].to_numpy(), df["pickup_latitude"].to_numpy())
+    df["dropoff_zone"] = zones.lookup(df["dropoff_longitude"].to_numpy(), df["dropoff_latitude"].to_numpy())
 
-    # LaGuardia bounding box
-    df["is_lg_airport"] = (
-        ((df["pickup_latitude"].between(LG_LATITUDE_RANGE[0], LG_LATITUDE_RANGE[1])) &
-        (df["pickup_longitude"].between(LG_LONGITUDE_RANGE[0], LG_LONGITUDE_RANGE[1])))
-        |
-        ((df["dropoff_latitude"].between(LG_LATITUDE_RANGE[0], LG_LATITUDE_RANGE[1])) &
-        (df["dropoff_longitude"].between(LG_LONGITUDE_RANGE[0], LG_LONGITUDE_RANGE[1])))
-    ).astype("int")
+    for name in ["jfk_airport", "lg_airport"]:
+        zone_id = zones.zone_id(name)
+        df[f"is_{name}"] = ((df["pickup_zone"] == zone_id) | (df["dropoff_zone"] == zone_id)).astype("int")
 
 
     from scipy.stats import gmean, hmean
@@ -123,6 +111,21 @@ def engineer_feature(df):
     df['hour'] = df.pickup_datetime.dt.hour
     df['minute'] = df.pickup_datetime.dt.minute
 
+    # Historical median log duration of the pickup zone x dropoff zone x hour of week
+    # (built with `python aggregate_tables.py build`; skipped until the table exists).
+    # The table is built from training trips, so the rows being fitted get out-of-fold
+    # medians of their own frame instead: a row's target never leaks into its feature.
+    table = default_aggregate_table()
+    if table is not None:
+        pickup_zone = aggregate_zones(df['pickup_longitude'].to_numpy(), df['pickup_latitude'].to_numpy(), df['pickup_zone'].to_numpy())
+        dropoff_zone = aggregate_zones(df['dropoff_longitude'].to_numpy(), df['dropoff_latitude'].to_numpy(), df['dropoff_zone'].to_numpy())
+        hour = hour_of_week(df['dayofweek'].to_numpy(), df['hour'].to_numpy())
+        if fit:
+            df['zone_hour_median_log_duration'] = out_of_fold_medians(
+                cell_keys(pickup_zone, dropoff_zone, hour), df['log_trip_duration'].to_numpy(), min_count=table.meta['min_count'])
+        else:
+            df['zone_hour_median_log_duration'] = table.lookup(pickup_zone, dropoff_zone, hour)
+
     def get_season(month):
         if month in [12, 1, 2]:
             return 0  # Winter
@@ -180,6 +183,7 @@ def drop_cols(df):
                         # 'trip_distance_sqrt', 'trip_distance_square', 'trip_distance_cube', 'trip_distance',
                         # 'log_trip_distance_sqrt', 'log_trip_distance_square', 'log_trip_distance_cube', 'log_trip_distance',
                         # 'is_jfk_airport', 'is_lg_airport',
+                        'pickup_zone', 'dropoff_zone', # zone ids: one-hot encode them (CATEGORICAL_FEATURES) instead of passing through
                      ] 
 
     for col in cols_to_drop:
@@ -189,6 +193,7 @@ def drop_cols(df):
 
 
 def preprocessing_pipeline(df: pd.DataFrame, iqr=-1):
+    fit = iqr == -1  # the training data is the one preprocessed without the training IQR
     print("Preprocessing started...")
     print(f"Initial shape: {df.shape}")
 
@@ -203,7 +208,7 @@ def preprocessing_pipeline(df: pd.DataFrame, iqr=-1):
     print(f"After cleaning outliers: {df.shape}")
 
     print("Feature Engineering...")
-    df = engineer_feature(df)  
+    df = engineer_feature(df, fit)  
 
     print("Dropping columns...")
     df = drop_cols(df)
@@ -0,0 +1,257 @@
+import argparse
+import itertools
+import os, sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+from sklearn.preprocessing import StandardScaler, OneHotEncoder
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.linear_model import Ridge
+from sklearn.metrics import r2_score, root_mean_squared_error
+
+sys.path.append(os.path.abspath('../preprocessing/'))
+
+# Select the pipeline whose feature engineering should be ablated:
+from final_pipeline import (fix_datatypes, column_transformation, clean_outliers,
+                            clean_numeric_outliers, engineer_feature)
+
+TARGET_VARIABLE = 'log_trip_duration'
+
+DEFAULT_TRAIN_PATHS = ['../data/split/train.csv', '../data/split/val.csv']
+DEFAULT_VAL_PATH = '../data/split/test.csv'
+
+# Always part of every fitted model
+BASE_FEATURES = ['vendor_id', 'passenger_count', 'minute']
+
+# Each group is switched on or off as a whole (the commented lines of `drop_cols`)
+FEATURE_GROUPS = {
+    "distance": ['trip_distance', 'trip_distance_sqrt', 'trip_distance_square', 'trip_distance_cube'],
+    "log_distance": ['log_trip_distance', 'log_trip_distance_sqrt', 'log_trip_distance_square', 'log_trip_distance_cube'],
+    "airports": ['is_jfk_airport', 'is_lg_airport'],
+    "coord_aggregates": ['coord_square_sum', 'coord_arithmetic_mean', 'coord_harmonic_mean'],
+    "time": ['hour', 'season', 'weekday', 'month'],
+    "virtual": ['virtual_time', 'virtual_time_dist_sqrt'],
+}
+
+# Same split as the final model: encoded, scaled and the rest passed through
+CATEGORICAL_FEATURES = ['hour', 'season', 'weekday', 'vendor_id', 'passenger_count', 'month']
+PASSTHROUGH_FEATURES = ['is_jfk_airport', 'is_lg_airport', 'minute']
+
+# Populated once per worker process by `attach_shared`
+_SHARED = {}
+
+
+def prepare_data(train_paths, val_path):
+    """
+    Loads and engineers the training and validation data once.
+
+    Parameters:
+    - train_paths: CSV files that are stacked into the training set.
+    - val_path: CSV file used for evaluation.
+
+    Returns:
+    - (train, val) DataFrames holding every engineered feature and the target.
+    """
+    train = pd.concat([pd.read_csv(path) for path in train_paths], ignore_index=True)
+    val = pd.read_csv(val_path)
+
+    def engineer(df, iqr=-1):
+        df = fix_datatypes(df)
+        df = column_transformation(df)
+        df = clean_outliers(df)
+        df, iqr = clean_numeric_outliers(df, TARGET_VARIABLE, iqr)
+        return engineer_feature(df), iqr
+
+    print("Feature Engineering (once for all subsets)...")
+    train, train_iqr = engineer(train)
+    val, _ = engineer(val, train_iqr)
+    return train, val
+
+
+def to_shared(array):
+    """
+    Copies a NumPy array into a new shared memory block.
+
+    Returns:
+    - (SharedMemory, spec) where spec is the (name, shape, dtype) tuple workers attach with.
+    """
+    shm = shared_memory.SharedMemory(create=True, size=array.nbytes)
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+    view[:] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+def attach_shared(specs, columns):
+    """
+    Pool initializer: maps the shared matrices into the worker without copying them.
+    """
+    for key, (name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=name)
+        _SHARED[key] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        _SHARED[f"{key}_shm"] = shm  # keep the mapping alive
+    _SHARED["columns"] = columns
+
+
+def fit_subset(groups, alpha):
+    """
+    Fits Ridge on the base features plus the given feature groups.
+
+    Parameters:
+    - groups: Tuple of FEATURE_GROUPS keys to include.
+    - alpha: Ridge regularization strength.
+
+    Returns:
+    - Dictionary with the groups, feature count, scores and fit time.
+    """
+    columns = _SHARED["columns"]
+    features = BASE_FEATURES + [col for group in groups for col in FEATURE_GROUPS[group]]
+    index = [columns.index(col) for col in features]
+
+    categorical = [i for i, col in enumerate(features) if col in CATEGORICAL_FEATURES]
+    numeric = [i for i, col in enumerate(features)
+               if col not in CATEGORICAL_FEATURES and col not in PASSTHROUGH_FEATURES]
+
+    column_transformer = ColumnTransformer([
+        ('ohe', OneHotEncoder(handle_unknown='ignore'), categorical),
+        ('scaling', StandardScaler(), numeric)
+        ]
+        , remainder = 'passthrough'
+    )
+
+    pipeline = Pipeline(steps=[
+        ('ohe', column_transformer),
+        ('regression', Ridge(alpha=alpha))
+    ])
+
+    start = time.perf_counter()
+    train_x = _SHARED["train_x"][:, index]
+    model = pipeline.fit(train_x, _SHARED["train_y"])
+    fit_seconds = time.perf_counter() - start
+
+    val_pred = model.predict(_SHARED["val_x"][:, index])
+    train_pred = model.predict(train_x)
+
+    return {
+        "groups": groups,
+        "n_features": len(features),
+        "train_rmse": root_mean_squared_error(_SHARED["train_y"], train_pred),
+        "train_r2": r2_score(_SHARED["train_y"], train_pred),
+        "val_rmse": root_mean_squared_error(_SHARED["val_y"], val_pred),
+        "val_r2": r2_score(_SHARED["val_y"], val_pred),
+        "fit_seconds": fit_seconds,
+    }
+
+
+def run_ablation(train, val, groups=None, alpha=1, workers=None):
+    """
+    Fits Ridge on every subset of the feature groups in a process pool.
+
+    The engineered matrices are placed in shared memory once, so workers
+    read the same pages instead of receiving pickled copies of the data.
+
+    Parameters:
+    - train: Engineered training DataFrame (output of `prepare_data`).
+    - val: Engineered validation DataFrame.
+    - groups: FEATURE_GROUPS keys to ablate (default: all of them).
+    - alpha: Ridge regularization strength.
+    - workers: Number of worker processes (default: CPU count).
+
+    Returns:
+    - List of result dictionaries ranked by validation RMSE (best first).
+    """
+    groups = list(groups or FEATURE_GROUPS)
+    columns = BASE_FEATURES + [col for group in groups for col in FEATURE_GROUPS[group]]
+
+    arrays = {
+        "train_x": train[columns].to_numpy(dtype=np.float64),
+        "train_y": train[TARGET_VARIABLE].to_numpy(dtype=np.float64),
+        "val_x": val[columns].to_numpy(dtype=np.float64),
+        "val_y": val[TARGET_VARIABLE].to_numpy(dtype=np.float64),
+    }
+
+    blocks, specs = [], {}
+    try:
+        for key, array in arrays.items():
+            shm, specs[key] = to_shared(array)
+            blocks.append(shm)
+        del arrays
+
+        subsets = [subset for size in range(len(groups) + 1)
+                   for subset in itertools.combinations(groups, size)]
+        print(f"Fitting {len(subsets)} subsets of {len(groups)} feature groups...")
+
+        results = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=attach_shared,
+                                 initargs=(specs, columns)) as pool:
+            futures = [pool.submit(fit_subset, subset, alpha) for subset in subsets]
+            for done, future in enumerate(as_completed(futures), start=1):
+                results.append(future.result())
+                print(f"[{done}/{len(subsets)}] done", end="\r")
+        print()
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+    return sorted(results, key=lambda result: result["val_rmse"])
+
+
+def format_report(results, alpha):
+    """
+    Formats ranked ablation results as a markdown table (same layout as summary/model_results.md).
+    """
+    lines = [
+        f"### Feature Ablation (Ridge, alpha = {alpha})",
+        "",
+        f"Base features: {', '.join(BASE_FEATURES)}",
+        "",
+        "| Rank | Feature Groups | Features | Train RMSE | Train R² | Val RMSE | Val R² | Fit (s) |",
+        "|------|----------------|----------|------------|----------|----------|--------|---------|",
+    ]
+    for rank, result in enumerate(results, start=1):
+        groups = ", ".join(result["groups"]) or "(base only)"
+        lines.append(
+            f"| {rank} | {groups} | {result['n_features']} "
+            f"| {result['train_rmse']:.4f} | {result['train_r2']:.4f} "
+            f"| {result['val_rmse']:.4f} | {result['val_r2']:.4f} | {result['fit_seconds']:.1f} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit Ridge on every subset of feature groups and rank them")
+    parser.add_argument('--train_paths', nargs='+', default=DEFAULT_TRAIN_PATHS,
+                        help='CSV files stacked into the training set')
+    parser.add_argument('--val_path', type=str, default=DEFAULT_VAL_PATH,
+                        help='CSV file used for evaluation')
+    parser.add_argument('--groups', nargs='+', choices=list(FEATURE_GROUPS), default=list(FEATURE_GROUPS),
+                        help='Feature groups to ablate (default: all)')
+    parser.add_argument('--alpha', type=float, default=1,
+                        help='Ridge regularization strength')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of worker processes (default: CPU count)')
+    parser.add_argument('--report', type=str, default=None,
+                        help='Optional path to write the ranked markdown report to')
+
+    args = parser.parse_args()
+
+    train, val = prepare_data(args.train_paths, args.val_path)
+    results = run_ablation(train, val, args.groups, args.alpha, args.workers)
+
+    report = format_report(results, args.alpha)
+    print(report)
+
+    if args.report:
+        with open(args.report, "w") as f:
+            f.write(report)
+        print(f"Report saved to path {args.report}")
+
+
+if __name__ == "__main__":
+    main()
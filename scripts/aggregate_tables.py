@@ -0,0 +1,260 @@
+import argparse
+import json
+import os
+import time
+
+from functools import lru_cache
+
+import numpy as np
+
+from zone_index import default_zone_index
+
+AGGREGATES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models', 'aggregates')
+META_FILE = 'aggregates.json'
+MEDIAN_FILE = 'median_log_duration.npy'
+COUNT_FILE = 'count.npy'
+
+TRAIN_PATHS = ['../data/split/train.csv']
+
+# Outside the named zones, trips in this box are grouped by coarse grid cell (0.025° is about 2.5 km)
+CORE_BOUNDS = (-74.05, 40.60, -73.75, 40.90)
+CORE_CELL_DEGREES = 0.025
+
+HOURS_PER_WEEK = 7 * 24
+
+# Cells with fewer trips fall back to the global median
+MIN_COUNT = 5
+
+# Training rows get the medians of the other folds, so a row's own target never feeds its feature
+OUT_OF_FOLD_FOLDS = 5
+
+
+def zone_count():
+    """
+    Number of aggregate zones: 0 (elsewhere), the named zones, then the core grid cells.
+    """
+    columns = int(round((CORE_BOUNDS[2] - CORE_BOUNDS[0]) / CORE_CELL_DEGREES))
+    rows = int(round((CORE_BOUNDS[3] - CORE_BOUNDS[1]) / CORE_CELL_DEGREES))
+    return len(default_zone_index().names) + columns * rows
+
+
+def aggregate_zones(longitude, latitude, named_zones=None):
+    """
+    Aggregate zone of every point: its named zone (zone_index.py) if any, otherwise
+    its coarse cell in CORE_BOUNDS, otherwise 0.
+
+    Parameters:
+    - longitude, latitude: Arrays, broadcast against each other.
+    - named_zones: Zone ids from `ZoneIndex.lookup` if already computed.
+
+    Returns:
+    - int64 array of aggregate zone ids.
+    """
+    index = default_zone_index()
+    longitude, latitude = np.broadcast_arrays(np.asarray(longitude, dtype=np.float64),
+                                              np.asarray(latitude, dtype=np.float64))
+    if named_zones is None:
+        named_zones = index.lookup(longitude, latitude)
+
+    columns = int(round((CORE_BOUNDS[2] - CORE_BOUNDS[0]) / CORE_CELL_DEGREES))
+    rows = int(round((CORE_BOUNDS[3] - CORE_BOUNDS[1]) / CORE_CELL_DEGREES))
+    column = np.floor((longitude - CORE_BOUNDS[0]) / CORE_CELL_DEGREES)
+    row = np.floor((latitude - CORE_BOUNDS[1]) / CORE_CELL_DEGREES)
+    in_core = (column >= 0) & (column < columns) & (row >= 0) & (row < rows)
+
+    cell = len(index.names) + np.where(in_core, row * columns + column, 0).astype(np.int64)
+    return np.where(named_zones > 0, named_zones.astype(np.int64), np.where(in_core, cell, 0))
+
+
+def hour_of_week(dayofweek, hour):
+    """
+    Monday 00:00 is 0, Sunday 23:00 is 167.
+    """
+    return np.asarray(dayofweek, dtype=np.int64) * 24 + np.asarray(hour, dtype=np.int64)
+
+
+def cell_keys(pickup_zone, dropoff_zone, hour):
+    """
+    Flat index of each (pickup zone, dropoff zone, hour of week) in a table of `zone_count()` zones.
+    """
+    n_zones = zone_count()
+    return (np.asarray(pickup_zone, dtype=np.int64) * n_zones + dropoff_zone) * HOURS_PER_WEEK + hour
+
+
+def out_of_fold_medians(keys, log_duration, folds=OUT_OF_FOLD_FOLDS, min_count=MIN_COUNT, seed=0):
+    """
+    Median log duration of each training row's cell, computed without the row's own fold.
+
+    Rows are split into `folds` random folds; each fold is looked up in medians of the
+    other folds, falling back to their global median under `min_count` trips, the same
+    way `build_tables` fills its table.
+
+    Parameters:
+    - keys: Cell of every row (`cell_keys`).
+    - log_duration: Target of every row.
+
+    Returns:
+    - float64 array, one median per row.
+    """
+    import pandas as pd
+
+    keys, log_duration = np.asarray(keys), np.asarray(log_duration, dtype=np.float64)
+    fold = np.random.default_rng(seed).permutation(len(keys)) % folds
+    medians = np.empty(len(keys))
+    for k in range(folds):
+        inside, outside = fold == k, fold != k
+        groups = pd.Series(log_duration[outside]).groupby(keys[outside]).agg(['median', 'count'])
+        found = groups.reindex(keys[inside])
+        fallback = float(np.median(log_duration[outside]))
+        medians[inside] = np.where(found['count'].to_numpy() >= min_count, found['median'].to_numpy(), fallback)
+    return medians
+
+
+def build_tables(paths=TRAIN_PATHS, output=AGGREGATES_PATH, min_count=MIN_COUNT):
+    """
+    Computes the median log_trip_duration and the trip count per
+    pickup zone x dropoff zone x hour of week, and saves them as .npy arrays.
+
+    Returns:
+    - The metadata written next to the arrays.
+    """
+    import pandas as pd
+
+    columns = ['pickup_datetime', 'pickup_longitude', 'pickup_latitude',
+               'dropoff_longitude', 'dropoff_latitude', 'trip_duration']
+    df = pd.concat([pd.read_csv(path, usecols=columns) for path in paths], ignore_index=True)
+    df = df[df['trip_duration'] > 0]
+
+    pickup = pd.to_datetime(df['pickup_datetime'])
+    n_zones = zone_count()
+    key = cell_keys(aggregate_zones(df['pickup_longitude'].to_numpy(), df['pickup_latitude'].to_numpy()),
+                    aggregate_zones(df['dropoff_longitude'].to_numpy(), df['dropoff_latitude'].to_numpy()),
+                    hour_of_week(pickup.dt.dayofweek.to_numpy(), pickup.dt.hour.to_numpy()))
+    log_duration = np.log1p(df['trip_duration'].to_numpy())
+
+    groups = pd.Series(log_duration).groupby(key).agg(['median', 'count'])
+
+    shape = (n_zones, n_zones, HOURS_PER_WEEK)
+    median = np.full(np.prod(shape), np.nan, dtype=np.float32)
+    count = np.zeros(np.prod(shape), dtype=np.uint32)
+    median[groups.index.to_numpy()] = groups['median'].to_numpy()
+    count[groups.index.to_numpy()] = groups['count'].to_numpy()
+
+    global_median = float(np.median(log_duration))
+    median[count < min_count] = global_median
+
+    os.makedirs(output, exist_ok=True)
+    np.save(os.path.join(output, MEDIAN_FILE), median.reshape(shape))
+    np.save(os.path.join(output, COUNT_FILE), count.reshape(shape))
+
+    meta = {
+        "shape": list(shape),
+        "zones": default_zone_index().names,
+        "core_bounds": list(CORE_BOUNDS),
+        "core_cell_degrees": CORE_CELL_DEGREES,
+        "min_count": min_count,
+        "global_median": global_median,
+        "trips": int(len(df)),
+        "filled_cells": int((count >= min_count).sum()),
+        "sources": [os.path.basename(path) for path in paths],
+        "built_at": time.time(),
+    }
+    with open(os.path.join(output, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+class AggregateTable:
+    '''
+    Memory-mapped zone-pair x hour-of-week aggregate table.
+
+    Attributes:
+        path (str): Directory holding the arrays.
+        meta (dict): Metadata written by `build_tables`.
+        median (np.ndarray): Median log_trip_duration, shape (zones, zones, 168), memory-mapped.
+        count (np.ndarray): Trips behind each median, same shape.
+    '''
+
+    def __init__(self, path=AGGREGATES_PATH):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.median = np.load(os.path.join(path, MEDIAN_FILE), mmap_mode='r')
+        self.count = np.load(os.path.join(path, COUNT_FILE), mmap_mode='r')
+        self._flat = self.median.reshape(-1)
+
+        if list(self.median.shape) != [zone_count(), zone_count(), HOURS_PER_WEEK]:
+            raise ValueError(f"Aggregate table at {path} was built for other zones; rebuild it")
+
+    def lookup(self, pickup_zone, dropoff_zone, hour):
+        """
+        Median log_trip_duration for each (pickup zone, dropoff zone, hour of week); one gather.
+        """
+        n_zones = self.median.shape[0]
+        key = (np.asarray(pickup_zone, dtype=np.int64) * n_zones + dropoff_zone) * HOURS_PER_WEEK + hour
+        return self._flat[key].astype(np.float64)
+
+
+@lru_cache(maxsize=None)
+def default_aggregate_table(path=AGGREGATES_PATH):
+    """
+    The table built at `path`, or None if it has not been built or cannot be used (e.g. it was
+    built for other zones). Checked once: the result, None included, is cached.
+    """
+    if not os.path.exists(os.path.join(path, META_FILE)):
+        return None
+    try:
+        return AggregateTable(path)
+    except (OSError, ValueError) as e:
+        print(f"Aggregate table ignored: {e}")
+        return None
+
+
+def benchmark_lookup(table, sizes, repeat):
+    rng = np.random.default_rng(0)
+    n_zones = table.median.shape[0]
+    for size in sizes:
+        pickup = rng.integers(n_zones, size=size)
+        dropoff = rng.integers(n_zones, size=size)
+        hour = rng.integers(HOURS_PER_WEEK, size=size)
+
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            table.lookup(pickup, dropoff, hour)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        print(f"  {size:>9} lookups: {best * 1e6:10.1f} µs ({best / size * 1e9:.1f} ns per lookup)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and benchmark zone-pair x hour-of-week aggregate tables")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help='Compute the tables from training CSVs')
+    build.add_argument('--data', nargs='+', default=TRAIN_PATHS, help='Training CSV files')
+    build.add_argument('--output', type=str, default=AGGREGATES_PATH, help='Output directory')
+    build.add_argument('--min_count', type=int, default=MIN_COUNT,
+                       help='Cells with fewer trips use the global median')
+
+    bench = subparsers.add_parser('bench', help='Measure lookup latency of a built table')
+    bench.add_argument('--path', type=str, default=AGGREGATES_PATH, help='Table directory')
+    bench.add_argument('--sizes', type=int, nargs='+', default=[1, 1000, 1_000_000], help='Batch sizes')
+    bench.add_argument('--repeat', type=int, default=20, help='Repetitions per size (best is reported)')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        meta = build_tables(args.data, args.output, args.min_count)
+        print(f"Built {meta['shape']} table from {meta['trips']} trips in {time.perf_counter() - start:.2f}s "
+              f"({meta['filled_cells']} cells with at least {meta['min_count']} trips) -> {args.output}")
+    else:
+        start = time.perf_counter()
+        table = AggregateTable(args.path)
+        print(f"Opened {table.median.shape} table in {(time.perf_counter() - start) * 1e3:.2f} ms (memory-mapped)")
+        benchmark_lookup(table, args.sizes, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
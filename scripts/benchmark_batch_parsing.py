@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+API_DIR = os.path.abspath('../api')
+sys.path.append(API_DIR)
+
+from app import TRIP_BATCH, batch_columns, trips_to_columns  # noqa: E402
+from fastapi.exceptions import RequestValidationError  # noqa: E402
+from pydantic import ValidationError  # noqa: E402
+from warmup import synthetic_trips  # noqa: E402
+
+# Edits of a valid trip that TripInput accepts or rejects in less obvious ways
+EDGE_CASES = [
+    {"vendor_id": True}, {"vendor_id": 2.0}, {"vendor_id": "2"}, {"vendor_id": 2.5}, {"vendor_id": 3},
+    {"passenger_count": 0}, {"passenger_count": None}, {"passenger_count": 2 ** 70},
+    {"pickup_latitude": True}, {"pickup_latitude": "40.7"}, {"pickup_latitude": 41}, {"pickup_latitude": 43},
+    {"pickup_longitude": -75}, {"pickup_longitude": float("nan")},
+    {"store_and_fwd_flag": "y"}, {"store_and_fwd_flag": " y"}, {"store_and_fwd_flag": "yes"},
+    {"pickup_date": "2016-3-14"}, {"pickup_date": "2016-02-30"}, {"pickup_date": "٢٠١٦-03-14"},
+    {"pickup_date": 20160314}, {"pickup_date": "2016-03-14\n"},
+    {"pickup_time": "24:00"}, {"pickup_time": "7:30"}, {"pickup_time": 1230},
+]
+
+
+def current_path(trip_batch):
+    # What /predict/batch did before: one TripInput per trip, then a transpose
+    return trips_to_columns(TRIP_BATCH.validate_python(trip_batch, from_attributes=True))
+
+
+def outcome(parse, trip_batch):
+    """
+    Columns (as lists) or the validation errors a parser produces for a batch.
+    """
+    try:
+        return {field: np.asarray(values).tolist() for field, values in parse(trip_batch).items()}
+    except RequestValidationError as e:
+        errors = [{**error, "loc": error["loc"][1:]} for error in e.errors()]  # without the "body" prefix
+    except ValidationError as e:
+        errors = e.errors(include_url=False)
+    return json.dumps(errors, sort_keys=True, default=str)
+
+
+def check(trip):
+    # Both paths must produce the same columns or the same errors, alone and mixed into a batch
+    mismatches = 0
+    for edit in EDGE_CASES:
+        trip_batch = [trip, {**trip, **edit}]
+        same = outcome(current_path, trip_batch) == outcome(batch_columns, trip_batch)
+        mismatches += not same
+        print(f"  {json.dumps(edit, ensure_ascii=False):<36} {'same' if same else 'DIFFERENT'}")
+    return mismatches
+
+
+def benchmark(sizes, repeat):
+    for size in sizes:
+        body = json.dumps(synthetic_trips(size))
+        timings = {"json.loads": [], "TripInput per trip": [], "vectorized columns": []}
+        for _ in range(repeat):
+            start = time.perf_counter()
+            trip_batch = json.loads(body)
+            timings["json.loads"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            current_path(trip_batch)
+            timings["TripInput per trip"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            batch_columns(trip_batch)
+            timings["vectorized columns"].append(time.perf_counter() - start)
+
+        best = {name: min(values) for name, values in timings.items()}
+        print(f"  {size:>7} trips: " + ", ".join(f"{name} {seconds * 1e3:8.1f} ms" for name, seconds in best.items())
+              + f"  ({best['TripInput per trip'] / best['vectorized columns']:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare /predict/batch body parsing paths")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='Batch sizes')
+    parser.add_argument('--repeat', type=int, default=5, help='Repetitions per size (best is reported)')
+    parser.add_argument('--check', action='store_true',
+                        help='Also check that both paths accept and reject the same edge cases')
+
+    args = parser.parse_args()
+
+    if args.check:
+        print("Edge cases:")
+        if check(synthetic_trips(1)[0]):
+            return 1
+
+    print("Parsing time:")
+    benchmark(args.sizes, args.repeat)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+API_DIR = os.path.abspath('../api')
+
+# Modules the serving runtime must not pull in
+HEAVY_MODULES = ['pandas', 'sklearn', 'scipy', 'joblib', 'matplotlib', 'seaborn']
+
+SAMPLE_TRIP = {
+    "vendor_id": 1,
+    "passenger_count": 1,
+    "pickup_longitude": -73.988609,
+    "pickup_latitude": 40.748977,
+    "dropoff_longitude": -73.992797,
+    "dropoff_latitude": 40.763408,
+    "pickup_date": "2016-03-23",
+    "pickup_time": "02:24",
+    "store_and_fwd_flag": "N"
+}
+
+
+def import_time(module="app"):
+    """
+    Imports a module in a fresh interpreter with `python -X importtime`.
+
+    Returns:
+    - (total_us, packages) where packages maps each top-level package to the
+      import time (self time of all its submodules) in µs.
+    """
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               cwd=API_DIR, capture_output=True, text=True, check=True)
+
+    packages = {}
+    for line in completed.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(self_us)
+
+    return sum(packages.values()), packages
+
+
+def benchmark_imports(repeat, top):
+    totals, runs = [], []
+    for _ in range(repeat):
+        total, packages = import_time()
+        totals.append(total)
+        runs.append(packages)
+
+    packages = {name: statistics.median(run.get(name, 0) for run in runs) for name in runs[0]}
+    heavy = [name for name in HEAVY_MODULES if name in packages]
+
+    print(f"Import time of `app` (median of {repeat}): {statistics.median(totals) / 1000:.1f} ms")
+    print(f"Heavy modules imported: {', '.join(heavy) if heavy else 'none'}")
+    print(f"\nTop {top} packages by import time:")
+    for name, micros in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {name:<20} {micros / 1000:8.1f} ms")
+
+
+def wait_until(url, timeout, payload=None):
+    """
+    Polls a URL until it answers with HTTP 200; returns the seconds waited.
+    """
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            data = json.dumps(payload).encode() if payload else None
+            request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+            with urllib.request.urlopen(request, timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter() - start
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError(f"{url} did not become ready within {timeout}s")
+
+
+def benchmark_container(image, repeat, port, timeout):
+    """
+    Measures container cold start: `docker run` until the first successful /predict.
+    """
+    base_url = f"http://127.0.0.1:{port}"
+    ready, first_predict = [], []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        container = subprocess.run(["docker", "run", "-d", "--rm", "-p", f"{port}:8000", image],
+                                   capture_output=True, text=True, check=True).stdout.strip()
+        try:
+            wait_until(f"{base_url}/health/ready", timeout)
+            ready.append(time.perf_counter() - start)
+            wait_until(f"{base_url}/predict", timeout, SAMPLE_TRIP)
+            first_predict.append(time.perf_counter() - start)
+        finally:
+            subprocess.run(["docker", "rm", "-f", container], capture_output=True)
+
+    print(f"\nContainer cold start of '{image}' (median of {repeat}):")
+    print(f"  until /health/ready:    {statistics.median(ready):.2f} s")
+    print(f"  until first /predict:   {statistics.median(first_predict):.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure API import time and container cold start")
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of measurements (median is reported)')
+    parser.add_argument('--top', type=int, default=10,
+                        help='Number of slowest packages to list')
+    parser.add_argument('--docker_image', type=str, default=None,
+                        help='Also measure cold start of this image (e.g. nyc-taxi-api)')
+    parser.add_argument('--port', type=int, default=8765,
+                        help='Host port used for the container measurement')
+    parser.add_argument('--timeout', type=float, default=60,
+                        help='Seconds to wait for the container to answer')
+
+    args = parser.parse_args()
+
+    benchmark_imports(args.repeat, args.top)
+
+    if args.docker_image:
+        benchmark_container(args.docker_image, args.repeat, args.port, args.timeout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+import requests
+
+API_DIR = os.path.abspath('../api')
+sys.path.append(API_DIR)
+
+from api_client import encode_body, zstandard  # noqa: E402
+from warmup import synthetic_trips  # noqa: E402
+
+API_URL = os.getenv("API_URL", "http://127.0.0.1:8000")
+
+
+def post_batch(url, trips, compression, accept_gzip):
+    """
+    Sends one /predict/batch request the way the client does and decodes the response.
+
+    Returns:
+    - (seconds, request bytes on the wire, response bytes on the wire, predictions)
+    """
+    start = time.perf_counter()
+    body, headers = encode_body(trips, compression, min_bytes=0)
+    headers["Accept-Encoding"] = "gzip" if accept_gzip else "identity"
+
+    response = requests.post(f"{url}/predict/batch", data=body, headers=headers, stream=True)
+    raw = response.raw.read(decode_content=False)
+    response.raise_for_status()
+    content = gzip.decompress(raw) if response.headers.get("Content-Encoding") == "gzip" else raw
+    predictions = json.loads(content)["predictions"]
+    return time.perf_counter() - start, len(body), len(raw), predictions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end time and bytes of /predict/batch with compression")
+    parser.add_argument('--url', type=str, default=API_URL, help='Running API (default: API_URL or localhost:8000)')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000], help='Batch sizes')
+    parser.add_argument('--repeat', type=int, default=3, help='Requests per setting (best time is reported)')
+    parser.add_argument('--mbps', type=float, default=100,
+                        help='Link speed used to estimate the time on a real network (loopback has no bandwidth limit)')
+
+    args = parser.parse_args()
+
+    settings = [(None, False), ("gzip", False), ("gzip", True)]
+    if zstandard is not None:
+        settings.append(("zstd", True))
+
+    for size in args.sizes:
+        trips = synthetic_trips(size)
+        reference = None
+        print(f"{size} trips:")
+        for compression, accept_gzip in settings:
+            runs = [post_batch(args.url, trips, compression, accept_gzip) for _ in range(args.repeat)]
+            seconds, sent, received, predictions = min(runs, key=lambda run: run[0])
+            reference = reference or predictions
+            label = f"request {compression or 'identity'}, response {'gzip' if accept_gzip else 'identity'}"
+            on_link = seconds + (sent + received) * 8 / (args.mbps * 1e6)
+            print(f"  {label:<38} {seconds * 1e3:8.1f} ms ({on_link * 1e3:8.1f} ms at {args.mbps:g} Mbit/s)  "
+                  f"sent {sent / 1e6:7.2f} MB  received {received / 1e6:6.2f} MB  "
+                  f"same predictions: {predictions == reference}")
+
+
+if __name__ == "__main__":
+    main()
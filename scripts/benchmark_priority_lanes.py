@@ -0,0 +1,88 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import requests
+
+API_DIR = os.path.abspath('../api')
+sys.path.append(API_DIR)
+
+from warmup import synthetic_trips  # noqa: E402
+
+API_URL = os.getenv("API_URL", "http://127.0.0.1:8000")
+
+
+def single_trip_latencies(url, trip, seconds):
+    """
+    Sends /predict requests one after the other for `seconds`.
+
+    Returns:
+    - Array of latencies in milliseconds.
+    """
+    latencies = []
+    with requests.Session() as session:
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            start = time.perf_counter()
+            session.post(f"{url}/predict", json=trip).raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1e3)
+    return np.array(latencies)
+
+
+def bulk_load(url, body, size, stop, completed):
+    # Sends the same encoded /predict/batch body back to back until `stop` is set
+    with requests.Session() as session:
+        while not stop.is_set():
+            session.post(f"{url}/predict/batch", data=body,
+                         headers={"Content-Type": "application/json", "Accept-Encoding": "identity"}).raise_for_status()
+            completed.append(size)
+
+
+def report(label, latencies):
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(f"  {label:<28} {len(latencies):6d} requests  p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  "
+          f"p99 {p99:7.2f} ms  max {latencies.max():8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/predict latency alone and while large batches are scored")
+    parser.add_argument('--url', type=str, default=API_URL, help='Running API (default: API_URL or localhost:8000)')
+    parser.add_argument('--batch-size', type=int, default=100000, help='Trips per /predict/batch request')
+    parser.add_argument('--bulk-clients', type=int, default=4, help='Concurrent /predict/batch senders')
+    parser.add_argument('--seconds', type=float, default=15, help='Measurement time per setting')
+
+    args = parser.parse_args()
+
+    trips = synthetic_trips(args.batch_size)
+    print(f"/predict latency ({args.bulk_clients} clients sending {args.batch_size}-trip batches under load):")
+    report("alone", single_trip_latencies(args.url, trips[0], args.seconds))
+
+    body = json.dumps(trips).encode()  # encoded once, so the load generator uses little CPU
+    stop, completed = threading.Event(), []
+    load_start = time.perf_counter()
+    senders = [threading.Thread(target=bulk_load, args=(args.url, body, args.batch_size, stop, completed), daemon=True)
+               for _ in range(args.bulk_clients)]
+    for sender in senders:
+        sender.start()
+    time.sleep(1)  # let the batches queue up
+
+    report("under bulk load", single_trip_latencies(args.url, trips[0], args.seconds))
+    print(f"  bulk throughput: {sum(completed) / (time.perf_counter() - load_start):,.0f} trips/s")
+    stop.set()
+    for sender in senders:
+        sender.join()
+
+    lanes = requests.get(f"{args.url}/metrics").json().get("lanes")
+    if lanes:
+        for name in ("interactive", "bulk"):
+            lane = lanes[name]
+            print(f"  {name} lane: mean wait {lane['mean_wait_ms']} ms, max wait {lane['max_wait_ms']} ms, "
+                  f"max queued {lane['max_queued']}")
+
+
+if __name__ == "__main__":
+    main()
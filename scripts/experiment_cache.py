@@ -0,0 +1,283 @@
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import sys
+import time
+
+import joblib
+
+DEFAULT_CACHE_DIR = '../experiments'
+
+# Content hashes of data files, keyed by (path, size, mtime) so unchanged CSVs are hashed only once
+DATA_HASH_INDEX = 'data_hashes.json'
+META_FILE = 'meta.json'
+MODEL_FILE = 'model.pkl'
+
+
+def _sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_file(path, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Returns the SHA-256 of a file's content, reusing the stored hash if the file is unchanged.
+    """
+    stat = os.stat(path)
+    stamp = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    index_path = os.path.join(cache_dir, DATA_HASH_INDEX)
+    index = {}
+    if os.path.exists(index_path):
+        with open(index_path, "r") as f:
+            index = json.load(f)
+
+    if stamp in index:
+        return index[stamp]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+
+    index[stamp] = digest.hexdigest()
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(index_path, "w") as f:
+        json.dump(index, f, indent=2)
+
+    return index[stamp]
+
+
+def local_modules(module):
+    """
+    The repository modules `module` depends on: itself, then every module of this repository
+    it imports (directly or through its imported names), recursively. Library modules are left out.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    found, pending = {}, [module]
+    while pending:
+        current = pending.pop()
+        path = getattr(current, "__file__", None)
+        if current.__name__ in found or path is None or not os.path.abspath(path).startswith(root + os.sep) \
+                or "site-packages" in path:
+            continue
+        found[current.__name__] = current
+        for value in vars(current).values():
+            imported = value if inspect.ismodule(value) else sys.modules.get(getattr(value, "__module__", None) or "")
+            if imported is not None:
+                pending.append(imported)
+    return [found[name] for name in sorted(found)]
+
+
+def pipeline_spec(pipeline):
+    """
+    Describes an unfitted sklearn Pipeline as plain data: every step's class,
+    its non-estimator parameters and, for a ColumnTransformer, the columns of each transformer.
+    """
+    def params(estimator):
+        return {key: repr(value) for key, value in sorted(estimator.get_params(deep=False).items())
+                if not hasattr(value, "get_params")}
+
+    spec = []
+    for name, step in pipeline.steps:
+        entry = {"step": name, "class": type(step).__name__, "params": params(step)}
+        if hasattr(step, "transformers"):
+            entry["transformers"] = [
+                {"name": t_name, "class": type(t).__name__,
+                 "params": params(t) if hasattr(t, "get_params") else repr(t),
+                 "columns": list(columns)}
+                for t_name, t, columns in step.transformers
+            ]
+        spec.append(entry)
+    return spec
+
+
+def fingerprint(data_paths, preprocessing_module, pipeline, cache_dir=DEFAULT_CACHE_DIR, helper_files=()):
+    """
+    Computes the cache key of a training run.
+
+    Parameters:
+    - data_paths: Every CSV file read by the run (order matters).
+    - preprocessing_module: The imported preprocessing pipeline module. The source of the
+      repository modules it imports (e.g. zone_index.py, aggregate_tables.py) is hashed with it.
+    - pipeline: The unfitted sklearn Pipeline (column transformer + Ridge).
+    - cache_dir: Cache directory (holds the data hash index).
+    - helper_files: Other files the preprocessing reads (e.g. nyc_zones.json).
+
+    Returns:
+    - (key, components) where components holds the individual fingerprints.
+    """
+    spec = pipeline_spec(pipeline)
+    components = {
+        "data": [hash_file(path, cache_dir) for path in data_paths],
+        "preprocessing": _sha256(inspect.getsource(preprocessing_module)),
+        "helpers": {module.__name__: _sha256(inspect.getsource(module))
+                    for module in local_modules(preprocessing_module) if module is not preprocessing_module},
+        "helper_files": [hash_file(path, cache_dir) for path in helper_files],
+        "column_transformer": _sha256(json.dumps(spec[:-1], sort_keys=True)),
+        "model": _sha256(json.dumps(spec[-1], sort_keys=True)),
+    }
+    key = _sha256(json.dumps(components, sort_keys=True))[:16]
+    return key, components
+
+
+class ExperimentCache:
+    '''
+    On-disk store of trained experiments, one directory per fingerprint.
+
+    Each entry holds `model.pkl` (same dictionary layout as the files in `models/`)
+    and `meta.json` (metrics, timings and the fingerprint components).
+
+    Attributes:
+        cache_dir (str): Root directory of the cache.
+        max_age_days (float): Entries older than this are evicted (None to keep forever).
+        max_size_mb (float): Oldest entries are evicted while the cache is larger than this (None for no limit).
+    '''
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_age_days=None, max_size_mb=None):
+        self.cache_dir = cache_dir
+        self.max_age_days = max_age_days
+        self.max_size_mb = max_size_mb
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key):
+        """
+        Returns (saved_model_dict, meta) for a cached run, or None on a miss.
+        """
+        meta_path = os.path.join(self._entry_dir(key), META_FILE)
+        model_path = os.path.join(self._entry_dir(key), MODEL_FILE)
+        if not (os.path.exists(meta_path) and os.path.exists(model_path)):
+            return None
+
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+
+        meta["last_used"] = time.time()
+        with open(meta_path, "w") as f:
+            json.dump(meta, f, indent=2)
+
+        return joblib.load(model_path), meta
+
+    def put(self, key, to_save, meta):
+        """
+        Stores a trained run under its key, then applies the eviction policy.
+
+        Parameters:
+        - key: Fingerprint returned by `fingerprint`.
+        - to_save: Dictionary with the fitted "model" and its "train_iqr".
+        - meta: JSON-serializable metrics, timings and inputs of the run.
+        """
+        entry_dir = self._entry_dir(key)
+        os.makedirs(entry_dir, exist_ok=True)
+        joblib.dump(to_save, os.path.join(entry_dir, MODEL_FILE))
+
+        now = time.time()
+        meta = {**meta, "key": key, "created": now, "last_used": now}
+        with open(os.path.join(entry_dir, META_FILE), "w") as f:
+            json.dump(meta, f, indent=2)
+
+        self.evict()
+
+    def entries(self):
+        """
+        Returns the metadata of every cached run, newest first.
+        """
+        if not os.path.isdir(self.cache_dir):
+            return []
+
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            entry_dir = self._entry_dir(key)
+            meta_path = os.path.join(entry_dir, META_FILE)
+            if not os.path.exists(meta_path):
+                continue
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            meta["size_bytes"] = sum(entry.stat().st_size for entry in os.scandir(entry_dir))
+            entries.append(meta)
+
+        return sorted(entries, key=lambda meta: meta["created"], reverse=True)
+
+    def remove(self, key):
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+
+    def evict(self):
+        """
+        Removes entries past `max_age_days`, then least recently used entries
+        until the cache fits in `max_size_mb`.
+
+        Returns:
+        - List of evicted keys.
+        """
+        evicted = []
+        entries = sorted(self.entries(), key=lambda meta: meta["last_used"])
+
+        if self.max_age_days is not None:
+            cutoff = time.time() - self.max_age_days * 24 * 3600
+            for meta in [meta for meta in entries if meta["created"] < cutoff]:
+                self.remove(meta["key"])
+                evicted.append(meta["key"])
+                entries.remove(meta)
+
+        if self.max_size_mb is not None:
+            total = sum(meta["size_bytes"] for meta in entries)
+            while entries and total > self.max_size_mb * 1024 * 1024:
+                meta = entries.pop(0)
+                self.remove(meta["key"])
+                evicted.append(meta["key"])
+                total -= meta["size_bytes"]
+
+        return evicted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and prune cached training runs")
+    parser.add_argument('command', choices=["list", "show", "prune", "clear"], default="list", nargs="?",
+                        help="list runs (default), show one run, prune by age/size, or clear everything")
+    parser.add_argument('key', type=str, nargs="?", help="Run key (used only with 'show')")
+    parser.add_argument('--cache_dir', type=str, default=DEFAULT_CACHE_DIR,
+                        help='Experiment cache directory')
+    parser.add_argument('--max_age_days', type=float, default=None,
+                        help='Evict runs older than this many days (prune)')
+    parser.add_argument('--max_size_mb', type=float, default=None,
+                        help='Evict least recently used runs until the cache fits (prune)')
+
+    args = parser.parse_args()
+    cache = ExperimentCache(args.cache_dir, args.max_age_days, args.max_size_mb)
+
+    match args.command:
+        case "list":
+            entries = cache.entries()
+            if not entries:
+                print("No cached runs.")
+            for meta in entries:
+                created = time.strftime("%Y-%m-%d %H:%M", time.localtime(meta["created"]))
+                metrics = meta.get("metrics", {})
+                print(f"{meta['key']}  {created}  {meta.get('preprocessing_module', '?'):<22} "
+                      f"val RMSE = {metrics.get('val_rmse', float('nan')):.4f} - "
+                      f"R2 = {metrics.get('val_r2', float('nan')):.4f}  "
+                      f"({meta['size_bytes'] / 1024:.0f} KB)")
+
+        case "show":
+            match = [meta for meta in cache.entries() if meta["key"] == args.key]
+            if not match:
+                print(f"Error: No cached run with key '{args.key}'")
+                return
+            print(json.dumps(match[0], indent=4))
+
+        case "prune":
+            evicted = cache.evict()
+            print(f"Evicted {len(evicted)} run(s): {', '.join(evicted)}" if evicted else "Nothing to evict.")
+
+        case "clear":
+            for meta in cache.entries():
+                cache.remove(meta["key"])
+            print("Cache cleared.")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,9 @@ def predict_eval(model, test, target, name):
 
     Prints:
     - Root Mean Squared Error (RMSE) and R² score formatted to 4 decimal places.
+
+    Returns:
+    - Tuple (rmse, r2).
     """
 
     # Generate predictions from the model
@@ -22,3 +25,4 @@ def predict_eval(model, test, target, name):
     r2 = r2_score(target, pred)
     
     print(f"{name} RMSE = {rmse:.4f} - R2 = {r2:.4f}")
+    return rmse, r2
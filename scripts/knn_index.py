@@ -0,0 +1,343 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+from functools import lru_cache
+
+import numpy as np
+
+KNN_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models', 'knn')
+META_FILE = 'knn.json'
+ARRAYS = ['points', 'log_duration', 'dim', 'split', 'left', 'right', 'start', 'end', 'lower', 'upper']
+
+TRAIN_PATHS = ['../data/split/train.csv']
+
+# Coordinates are turned into km around Midtown so that all four are on the same scale
+ORIGIN_LONGITUDE, ORIGIN_LATITUDE = -73.98, 40.75
+KM_PER_DEGREE = 111.2
+
+# One hour of difference in time of week counts like this many km (time of week lies on a circle)
+HOUR_WEIGHT_KM = 0.5
+HOURS_PER_WEEK = 7 * 24
+
+LEAF_SIZE = 32
+QUERY_CHUNK = 1024
+
+# First search radius as a fraction of the squared bound from the descent (exactness does not depend on it)
+SHRINK = 0.5
+
+
+def trip_vectors(pickup_longitude, pickup_latitude, dropoff_longitude, dropoff_latitude,
+                 dayofweek, hour, minute):
+    """
+    Normalized trip vectors: pickup and dropoff in km, plus time of week on a circle.
+
+    Returns:
+    - float64 array of shape (n, 6).
+    """
+    cos_latitude = np.cos(np.radians(ORIGIN_LATITUDE))
+    hours = np.asarray(dayofweek) * 24 + np.asarray(hour) + np.asarray(minute) / 60
+    angle = 2 * np.pi * hours / HOURS_PER_WEEK
+    radius = HOUR_WEIGHT_KM * HOURS_PER_WEEK / (2 * np.pi)
+
+    columns = [
+        (np.asarray(pickup_longitude) - ORIGIN_LONGITUDE) * KM_PER_DEGREE * cos_latitude,
+        (np.asarray(pickup_latitude) - ORIGIN_LATITUDE) * KM_PER_DEGREE,
+        (np.asarray(dropoff_longitude) - ORIGIN_LONGITUDE) * KM_PER_DEGREE * cos_latitude,
+        (np.asarray(dropoff_latitude) - ORIGIN_LATITUDE) * KM_PER_DEGREE,
+        radius * np.cos(angle),
+        radius * np.sin(angle),
+    ]
+    return np.column_stack([np.broadcast_to(c, np.broadcast_shapes(*(np.shape(c) for c in columns))).ravel()
+                            for c in columns]).astype(np.float64)
+
+
+def build_tree(points, leaf_size=LEAF_SIZE):
+    """
+    Builds a KD-tree by median splits on the widest dimension.
+
+    Points are reordered so that every node covers a contiguous range of them.
+
+    Returns:
+    - (order, nodes): the permutation applied to the points, and a dictionary of node arrays
+      (dim, split, left, right, start, end, lower, upper); left == -1 marks a leaf.
+    """
+    n, d = points.shape
+    order = np.arange(n)
+    dim, split, left, right, start, end, lower, upper = [], [], [], [], [], [], [], []
+
+    def add(lo, hi):
+        node = len(start)
+        box = points[order[lo:hi]]
+        dim.append(0), split.append(0.0), left.append(-1), right.append(-1)
+        start.append(lo), end.append(hi)
+        lower.append(box.min(axis=0)), upper.append(box.max(axis=0))
+        return node
+
+    root = add(0, n)
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        lo, hi = start[node], end[node]
+        if hi - lo <= leaf_size:
+            continue
+
+        axis = int(np.argmax(upper[node] - lower[node]))
+        middle = (hi - lo) // 2
+        segment = order[lo:hi]
+        segment = segment[np.argpartition(points[segment, axis], middle)]
+        order[lo:hi] = segment
+
+        dim[node], split[node] = axis, float(points[segment[middle], axis])
+        left[node], right[node] = add(lo, lo + middle), add(lo + middle, hi)
+        stack.extend([left[node], right[node]])
+
+    nodes = {
+        "dim": np.array(dim, dtype=np.int8),
+        "split": np.array(split),
+        "left": np.array(left, dtype=np.int32),
+        "right": np.array(right, dtype=np.int32),
+        "start": np.array(start, dtype=np.int64),
+        "end": np.array(end, dtype=np.int64),
+        "lower": np.array(lower),
+        "upper": np.array(upper),
+    }
+    return order, nodes
+
+
+def build_index(paths=TRAIN_PATHS, output=KNN_PATH, leaf_size=LEAF_SIZE):
+    """
+    Builds the kNN index from training CSVs and saves its arrays as .npy files.
+
+    Returns:
+    - The metadata written next to the arrays.
+    """
+    import pandas as pd
+
+    columns = ['pickup_datetime', 'pickup_longitude', 'pickup_latitude',
+               'dropoff_longitude', 'dropoff_latitude', 'trip_duration']
+    df = pd.concat([pd.read_csv(path, usecols=columns) for path in paths], ignore_index=True)
+    df = df[(df['trip_duration'] > 0)
+            & df['pickup_longitude'].between(-75, -73) & df['dropoff_longitude'].between(-75, -73)
+            & df['pickup_latitude'].between(40, 43) & df['dropoff_latitude'].between(40, 43)]
+
+    pickup = pd.to_datetime(df['pickup_datetime'])
+    points = trip_vectors(df['pickup_longitude'].to_numpy(), df['pickup_latitude'].to_numpy(),
+                          df['dropoff_longitude'].to_numpy(), df['dropoff_latitude'].to_numpy(),
+                          pickup.dt.dayofweek.to_numpy(), pickup.dt.hour.to_numpy(), pickup.dt.minute.to_numpy())
+
+    order, nodes = build_tree(points, leaf_size)
+    arrays = {"points": points[order], "log_duration": np.log1p(df['trip_duration'].to_numpy())[order], **nodes}
+
+    os.makedirs(output, exist_ok=True)
+    for name in ARRAYS:
+        np.save(os.path.join(output, f"{name}.npy"), arrays[name])
+
+    meta = {
+        "trips": int(len(points)),
+        "nodes": int(len(nodes["start"])),
+        "leaf_size": leaf_size,
+        "origin": [ORIGIN_LONGITUDE, ORIGIN_LATITUDE],
+        "hour_weight_km": HOUR_WEIGHT_KM,
+        "sources": [os.path.basename(path) for path in paths],
+        "built_at": time.time(),
+    }
+    with open(os.path.join(output, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+class KnnIndex:
+    '''
+    Exact k-nearest-neighbour search over historical trips with a memory-mapped KD-tree.
+
+    Queries are answered for a whole batch at once: every query descends to the
+    smallest node holding at least k trips, whose k-th distance bounds the search
+    radius; the tree is then walked level by level for all (query, node) pairs
+    whose bounding box intersects a ball inside that radius, and the points of
+    the reached leaves are ranked. Queries with fewer than k trips in the ball
+    are searched again with the full radius. No per-query Python loop is involved.
+
+    Attributes:
+        path (str): Directory holding the arrays.
+        meta (dict): Metadata written by `build_index`.
+    '''
+
+    def __init__(self, path=KNN_PATH):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        for name in ARRAYS:
+            # Plain ndarray views of the maps: indexing np.memmap objects is much slower
+            setattr(self, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r').view(np.ndarray))
+        self.count = np.asarray(self.end) - np.asarray(self.start)
+        self.leaf_size = self.meta["leaf_size"]
+
+    def _box_distance(self, queries, nodes):
+        # Squared distance from each query to the bounding box of its node
+        gap = np.maximum(self.lower[nodes] - queries, 0) + np.maximum(queries - self.upper[nodes], 0)
+        return (gap ** 2).sum(axis=1)
+
+    def _gather(self, queries, first, counts, width):
+        # Squared distances from each query to `width` consecutive points starting at `first`
+        index = first[:, None] + np.arange(width)
+        valid = np.arange(width) < counts[:, None]
+        index = np.where(valid, index, 0)
+        distance = ((self.points[index] - queries[:, None, :]) ** 2).sum(axis=2)
+        return index, np.where(valid, distance, np.inf)
+
+    def _query_chunk(self, queries, k):
+        n = len(queries)
+        rows = np.arange(n)
+
+        # 1. Smallest node with at least k points on each query's path: its k-th distance bounds the radius
+        node = np.zeros(n, dtype=np.int64)
+        while True:
+            internal = self.left[node] >= 0
+            go_left = queries[rows, self.dim[node]] <= self.split[node]
+            child = np.where(go_left, self.left[node], self.right[node])
+            descend = internal & (self.count[np.where(internal, child, 0)] >= k)
+            if not descend.any():
+                break
+            node = np.where(descend, child, node)
+
+        counts = self.count[node]
+        _, distance = self._gather(queries, self.start[node], counts, int(counts.max()))
+        radius = np.partition(distance, k - 1, axis=1)[:, k - 1]
+
+        # 2. That bound is loose (about 1.5x the true k-th distance): search a tighter ball first and
+        #    fall back to the bound only for queries with fewer than k trips inside it
+        neighbors, distances, found = self._search(queries, radius * SHRINK, k)
+        retry = np.flatnonzero(found < k)
+        if len(retry):
+            neighbors[retry], distances[retry], _ = self._search(queries[retry], radius[retry], k)
+        return neighbors, np.sqrt(distances)
+
+    def _search(self, queries, radius, k):
+        n = len(queries)
+
+        # Every leaf whose box intersects the ball around its query
+        pair_query, pair_node = np.arange(n), np.zeros(n, dtype=np.int64)
+        leaf_query, leaf_node = [], []
+        while len(pair_query):
+            inside = self._box_distance(queries[pair_query], pair_node) <= radius[pair_query]
+            pair_query, pair_node = pair_query[inside], pair_node[inside]
+            is_leaf = self.left[pair_node] < 0
+            leaf_query.append(pair_query[is_leaf])
+            leaf_node.append(pair_node[is_leaf])
+            internal_query, internal_node = pair_query[~is_leaf], pair_node[~is_leaf]
+            pair_query = np.concatenate([internal_query, internal_query])
+            pair_node = np.concatenate([self.left[internal_node], self.right[internal_node]]).astype(np.int64)
+
+        leaf_query, leaf_node = np.concatenate(leaf_query), np.concatenate(leaf_node)
+
+        # Rank the points of those leaves inside the ball per query and keep the k closest
+        index, distance = self._gather(queries[leaf_query], self.start[leaf_node], self.count[leaf_node],
+                                       int(self.count[leaf_node].max(initial=1)))
+        owner = np.broadcast_to(leaf_query[:, None], distance.shape)
+        keep = distance <= radius[owner]
+        owner, index, distance = owner[keep], index[keep], distance[keep]
+        found = np.bincount(owner, minlength=n)
+
+        order = np.lexsort((distance, owner))
+        owner, index, distance = owner[order], index[order], distance[order]
+        rank = np.arange(len(owner)) - np.searchsorted(owner, owner)
+        top = rank < k
+
+        neighbors = np.zeros((n, k), dtype=np.int64)
+        distances = np.full((n, k), np.inf)
+        neighbors[owner[top], rank[top]] = index[top]
+        distances[owner[top], rank[top]] = distance[top]
+        return neighbors, distances, found
+
+    def query(self, vectors, k=10):
+        """
+        Finds the k nearest historical trips of every query vector (see `trip_vectors`).
+
+        Returns:
+        - (neighbors, distances): positions in the index and distances, both of shape (n, k),
+          closest first.
+        """
+        vectors = np.asarray(vectors, dtype=np.float64)
+        if k < 1 or k > len(self.points):
+            raise ValueError(f"k must be between 1 and {len(self.points)}")
+
+        results = [self._query_chunk(vectors[i:i + QUERY_CHUNK], k) for i in range(0, len(vectors), QUERY_CHUNK)]
+        if not results:
+            return np.empty((0, k), dtype=np.int64), np.empty((0, k))
+        return np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results])
+
+    def estimate(self, vectors, k=10):
+        """
+        Duration estimate from the k most similar trips: expm1 of their mean log duration.
+
+        Returns:
+        - (durations in seconds, mean distance to the neighbours).
+        """
+        neighbors, distances = self.query(vectors, k)
+        return np.expm1(self.log_duration[neighbors].mean(axis=1)), distances.mean(axis=1)
+
+
+@lru_cache(maxsize=None)
+def default_knn_index(path=KNN_PATH):
+    """
+    The index built at `path`, or None if it has not been built.
+    """
+    if not os.path.exists(os.path.join(path, META_FILE)):
+        return None
+    return KnnIndex(path)
+
+
+def benchmark(index, ks, batch_sizes, repeat, check):
+    rng = np.random.default_rng(0)
+    for k in ks:
+        for size in batch_sizes:
+            queries = index.points[rng.integers(len(index.points), size=size)] + rng.normal(0, 0.3, (size, 6))
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                neighbors, distances = index.query(queries, k)
+                timings.append(time.perf_counter() - start)
+            best = min(timings)
+            print(f"  k={k:<3} batch={size:<6} {best * 1e3:9.2f} ms  ({best / size * 1e6:8.1f} µs per query)")
+
+        if check:
+            # Brute force on a few queries to confirm the search is exact
+            sample = queries[:min(len(queries), 50)]
+            brute = np.array([np.sort(np.sqrt(((index.points - q) ** 2).sum(axis=1)))[:k] for q in sample])
+            print(f"  k={k:<3} matches brute force: {np.allclose(index.query(sample, k)[1], brute)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and benchmark the nearest-historical-trip index")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help='Build the index from training CSVs')
+    build.add_argument('--data', nargs='+', default=TRAIN_PATHS, help='Training CSV files')
+    build.add_argument('--output', type=str, default=KNN_PATH, help='Output directory')
+    build.add_argument('--leaf_size', type=int, default=LEAF_SIZE, help='Maximum trips per leaf')
+
+    bench = subparsers.add_parser('bench', help='Measure query latency of a built index')
+    bench.add_argument('--path', type=str, default=KNN_PATH, help='Index directory')
+    bench.add_argument('--k', type=int, nargs='+', default=[10, 50], help='Neighbour counts')
+    bench.add_argument('--batch_sizes', type=int, nargs='+', default=[1, 100, 1000, 10000], help='Query batch sizes')
+    bench.add_argument('--repeat', type=int, default=5, help='Repetitions per setting (best is reported)')
+    bench.add_argument('--check', action='store_true', help='Compare with a brute-force search')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        meta = build_index(args.data, args.output, args.leaf_size)
+        print(f"Indexed {meta['trips']} trips ({meta['nodes']} nodes) in {time.perf_counter() - start:.2f}s -> {args.output}")
+    else:
+        start = time.perf_counter()
+        index = KnnIndex(args.path)
+        print(f"Opened index of {index.meta['trips']} trips in {(time.perf_counter() - start) * 1e3:.2f} ms (memory-mapped)")
+        benchmark(index, args.k, args.batch_sizes, args.repeat, args.check)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
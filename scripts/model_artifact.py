@@ -0,0 +1,258 @@
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+
+FORMAT_NAME = 'nyc-taxi-ridge'
+FORMAT_VERSION = 1
+
+HEADER_FILE = 'header.json'
+COEF_FILE = 'coef.npy'
+
+# How each preprocessing module differs in what the API has to rebuild at inference
+DEFAULT_PREPROCESSING = {"target": "log_trip_duration", "virtual_time_distance": "log_trip_distance"}
+PREPROCESSING_VARIANTS = {
+    "pipeline_2": {"target": "trip_duration", "virtual_time_distance": "trip_distance"},
+}
+
+
+def preprocessing_variant(pipeline_name):
+    """
+    Returns the inference-relevant description of a preprocessing module (e.g. 'final_pipeline').
+    """
+    return {"pipeline": pipeline_name, **PREPROCESSING_VARIANTS.get(pipeline_name, DEFAULT_PREPROCESSING)}
+
+
+def _scaler_params(scaler):
+    """
+    Expresses a fitted scaler as x' = (x - offset) / scale.
+    """
+    match type(scaler).__name__:
+        case "StandardScaler":
+            offset = scaler.mean_ if scaler.mean_ is not None else np.zeros(scaler.n_features_in_)
+            scale = scaler.scale_ if scaler.scale_ is not None else np.ones(scaler.n_features_in_)
+        case "MinMaxScaler":
+            offset = -scaler.min_ / scaler.scale_
+            scale = 1 / scaler.scale_
+        case other:
+            raise ValueError(f"Unsupported scaler: {other}")
+    return offset, scale
+
+
+def _to_json(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def export_artifact(saved, path, metrics=None, preprocessing="final_pipeline", source=None):
+    """
+    Writes a saved model (the joblib dictionary with "model" and "train_iqr")
+    as a flat artifact directory: `header.json` plus `coef.npy`.
+
+    Parameters:
+    - saved: Dictionary holding the fitted sklearn Pipeline (ColumnTransformer + Ridge) and the IQR.
+    - path: Output directory (created if needed).
+    - metrics: Optional dictionary of scores (train_rmse, train_r2, val_rmse, val_r2, ...).
+    - preprocessing: Name of the preprocessing module the model was trained with.
+    - source: Optional name of the file the model was exported from.
+
+    Returns:
+    - The header dictionary that was written.
+    """
+    pipeline = saved["model"]
+    column_transformer, regression = pipeline.steps[0][1], pipeline.steps[-1][1]
+    feature_order = [str(name) for name in pipeline.feature_names_in_]
+
+    encoder, scaler, passthrough = [], None, []
+    for name, transformer, columns in column_transformer.transformers_:
+        if transformer == "drop" or len(columns) == 0:
+            continue
+
+        # remainder columns are stored as positions in the input frame
+        columns = [feature_order[col] if isinstance(col, (int, np.integer)) else col for col in columns]
+
+        if transformer == "passthrough" or type(transformer).__name__ == "FunctionTransformer":
+            passthrough += columns
+        elif type(transformer).__name__ == "OneHotEncoder":
+            if transformer.drop is not None:
+                raise ValueError("OneHotEncoder with `drop` is not supported")
+            encoder += [{"feature": col, "categories": [_to_json(c) for c in categories]}
+                        for col, categories in zip(columns, transformer.categories_)]
+        else:
+            offset, scale = _scaler_params(transformer)
+            scaler = {"type": type(transformer).__name__, "columns": columns,
+                      "offset": offset.tolist(), "scale": scale.tolist()}
+
+    coef = np.ascontiguousarray(regression.coef_, dtype="<f8")
+
+    header = {
+        "format": FORMAT_NAME,
+        "format_version": FORMAT_VERSION,
+        "model_type": "Ridge Regression",
+        "alpha": _to_json(regression.alpha),
+        "source": source,
+        "preprocessing": preprocessing_variant(preprocessing),
+        "train_iqr": _to_json(saved.get("train_iqr", -1)),
+        "feature_order": feature_order,
+        "encoder": encoder,
+        "scaler": scaler,
+        "passthrough": passthrough,
+        "intercept": _to_json(regression.intercept_),
+        "coefficients": {"file": COEF_FILE, "shape": list(coef.shape), "dtype": coef.dtype.str},
+        "metrics": metrics or {},
+    }
+
+    n_outputs = sum(len(e["categories"]) for e in encoder) + len(scaler["columns"] if scaler else []) + len(passthrough)
+    if n_outputs != coef.shape[0]:
+        raise ValueError(f"Column layout ({n_outputs}) does not match the coefficients ({coef.shape[0]})")
+
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, COEF_FILE), coef)
+    with open(os.path.join(path, HEADER_FILE), "w") as f:
+        json.dump(header, f, indent=2)
+
+    return header
+
+
+class ModelArtifact:
+    '''
+    A Ridge model loaded from a flat artifact, scored with NumPy only.
+
+    The scaler is folded into the coefficients at load time, so prediction is
+    one weighted sum over numeric columns plus one coefficient gather per
+    one-hot encoded column.
+
+    Attributes:
+        path (str): Artifact directory.
+        header (dict): Parsed `header.json`.
+        coef (np.ndarray): Coefficients in ColumnTransformer output order (memory-mapped).
+        features (list): Input columns the model reads.
+        version (str): Hash of the header and coefficients; changes whenever the model does.
+    '''
+
+    def __init__(self, path, header, coef):
+        self.path = path
+        self.header = header
+        self.coef = coef
+        self.version = hashlib.sha256(json.dumps(header, sort_keys=True).encode()
+                                      + np.ascontiguousarray(coef).tobytes()).hexdigest()[:12]
+
+        offset = 0
+        self.categorical = []
+        for entry in header["encoder"]:
+            size = len(entry["categories"])
+            # copied out of the memory map so the compiled model never changes under a running request
+            self.categorical.append((entry["feature"], np.asarray(entry["categories"]),
+                                     np.array(coef[offset:offset + size], dtype=np.float64)))
+            offset += size
+
+        self.intercept = float(header["intercept"])
+        self.numeric = []
+        scaler = header["scaler"]
+        if scaler:
+            for col, col_offset, col_scale in zip(scaler["columns"], scaler["offset"], scaler["scale"]):
+                weight = float(coef[offset]) / col_scale
+                self.numeric.append((col, weight))
+                self.intercept -= weight * col_offset
+                offset += 1
+
+        for col in header["passthrough"]:
+            self.numeric.append((col, float(coef[offset])))
+            offset += 1
+
+        self.features = [name for name, _, _ in self.categorical] + [name for name, _ in self.numeric]
+
+    @property
+    def target(self):
+        return self.header["preprocessing"]["target"]
+
+    @property
+    def metrics(self):
+        return self.header["metrics"]
+
+    def predict(self, features):
+        """
+        Predicts the model target (e.g. log_trip_duration).
+
+        Parameters:
+        - features: Mapping of column name to array (a dict of arrays or a DataFrame).
+          Arrays are broadcast against each other (e.g. one pickup time for many trips).
+
+        Returns:
+        - float64 array of predictions with the broadcast shape of the inputs.
+        """
+        shape = np.broadcast_shapes(*(np.shape(features[name]) for name in self.features))
+        result = np.full(shape, self.intercept)
+
+        for name, weight in self.numeric:
+            result += weight * np.asarray(features[name], dtype=np.float64)
+
+        for name, categories, weights in self.categorical:
+            values = np.asarray(features[name])
+            if categories.dtype.kind in "iuf":
+                values = values.astype(categories.dtype, copy=False)
+            index = np.searchsorted(categories, values).clip(0, len(categories) - 1)
+            # handle_unknown='ignore': unseen categories contribute nothing
+            result += np.where(categories[index] == values, weights[index], 0.0)
+
+        return result
+
+    def predict_duration(self, features):
+        """
+        Predicts the trip duration in seconds, undoing the target transform.
+        """
+        prediction = self.predict(features)
+        return np.expm1(prediction) if self.target == "log_trip_duration" else prediction
+
+
+def load_artifact(path, mmap=True):
+    """
+    Loads a flat model artifact written by `export_artifact`.
+
+    Parameters:
+    - path: Artifact directory.
+    - mmap: If True, the coefficient array is memory-mapped instead of read into memory.
+
+    Returns:
+    - ModelArtifact ready for prediction.
+    """
+    with open(os.path.join(path, HEADER_FILE), "r") as f:
+        header = json.load(f)
+
+    if header.get("format") != FORMAT_NAME or header.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported model artifact at {path}: "
+                         f"{header.get('format')} v{header.get('format_version')} "
+                         f"(expected {FORMAT_NAME} v{FORMAT_VERSION})")
+
+    coef = np.load(os.path.join(path, header["coefficients"]["file"]), mmap_mode="r" if mmap else None)
+    if list(coef.shape) != header["coefficients"]["shape"]:
+        raise ValueError(f"Coefficient shape {coef.shape} does not match the header of {path}")
+
+    return ModelArtifact(path, header, coef)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a pickled model to the flat artifact format")
+    parser.add_argument('model_path', type=str,
+                        help='Path to the pickled model and IQR file (e.g. ../models/final_ridge_pipeline.pkl)')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Artifact directory (default: model path without .pkl)')
+    parser.add_argument('--preprocessing', type=str, default='final_pipeline',
+                        help='Preprocessing module the model was trained with')
+    parser.add_argument('--metrics', type=str, default=None,
+                        help='JSON object of scores, e.g. \'{"train_rmse": 0.3931, "val_rmse": 0.3930}\'')
+
+    args = parser.parse_args()
+
+    import joblib  # only needed for exporting, not for loading artifacts
+    saved = joblib.load(args.model_path)
+    output = args.output or os.path.splitext(args.model_path)[0]
+
+    header = export_artifact(saved, output, json.loads(args.metrics) if args.metrics else None,
+                             args.preprocessing, os.path.basename(args.model_path))
+    print(f"Artifact saved to path {output} ({header['coefficients']['shape'][0]} coefficients)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import pandas as pd
 import sys, os
+import time
 import joblib
 
 from sklearn.preprocessing import StandardScaler, OneHotEncoder, MinMaxScaler
@@ -9,24 +10,70 @@ from sklearn.linear_model import Ridge
 
 sys.path.append(os.path.abspath('../preprocessing/'))
 
+import experiment_pipeline
 from experiment_pipeline import preprocessing_pipeline
+from experiment_cache import ExperimentCache, fingerprint
+from aggregate_tables import AGGREGATES_PATH, MEDIAN_FILE
+from zone_index import ZONES_PATH
+from model_artifact import export_artifact
 from helper import predict_eval
 
 MODEL_NAME = 'experiment_ridge_pipeline'
 SAVE_MODEL = False
 
-def main():
-    train = pd.read_csv('../data/split/train.csv')
-    train_2 = pd.read_csv('../data/split/val.csv')
-    
-    val = pd.read_csv('../data/split/test.csv')
+# Skip retraining when data, preprocessing source, column transformer and Ridge parameters are unchanged
+USE_CACHE = True
+CACHE_MAX_AGE_DAYS = 30
+CACHE_MAX_SIZE_MB = 500
+
+TRAIN_PATHS = ['../data/split/train.csv', '../data/split/val.csv']
+VAL_PATH = '../data/split/test.csv'
+
+# Features that are included here should match the split made in the preprocessing pipeline
+
+# encoding 
+CATEGORICAL_FEATURES = ['hour', 'season', 'passenger_count', 'month', 'is_jfk_airport', 'is_lg_airport', 'virtual_speed', 'virtual_speed_cube'] 
+# scaling
+NUMERIC_FEATURES = [ 'coord_square_sum', 'coord_arithmetic_mean', 
+                    'coord_harmonic_mean', 
+                    ]
 
-    # Combine train and val before testing (stack rows)
-    train = pd.concat([train, train_2], ignore_index=True)
+RIDGE_PARAMS = {"alpha": 1}
+
+
+def main():
+    model_path = f"../models/{MODEL_NAME}.pkl"
+    pipeline = build_pipeline()
+
+    cache = ExperimentCache(max_age_days=CACHE_MAX_AGE_DAYS, max_size_mb=CACHE_MAX_SIZE_MB)
+    if USE_CACHE:
+        # The aggregate table read by the preprocessing is an input too: rebuilding it invalidates the cache
+        aggregates = [path for path in [os.path.join(AGGREGATES_PATH, MEDIAN_FILE)] if os.path.exists(path)]
+        # The zone shapes are read too (the source of zone_index.py and aggregate_tables.py is hashed by `fingerprint`)
+        key, components = fingerprint(TRAIN_PATHS + [VAL_PATH] + aggregates, experiment_pipeline, pipeline,
+                                      helper_files=[ZONES_PATH])
+        cached = cache.get(key)
+
+        if cached is not None:
+            to_save, meta = cached
+            print(f"Cache hit ({key}): identical run found, skipping training.")
+            for split in ["train", "val"]:
+                print(f"{split} RMSE = {meta['metrics'][f'{split}_rmse']:.4f} - R2 = {meta['metrics'][f'{split}_r2']:.4f}")
+
+            if SAVE_MODEL:
+                joblib.dump(to_save, model_path)
+                print(f"Model saved to path {model_path}")
+                save_artifact(to_save, meta["metrics"], model_path)
+            return
+
+    start = time.perf_counter()
+    train = pd.concat([pd.read_csv(path) for path in TRAIN_PATHS], ignore_index=True) # stack rows
+    val = pd.read_csv(VAL_PATH)
  
     # ensure you select the correct pipeline file you want
     train, train_iqr = preprocessing_pipeline(train)
     val, _ = preprocessing_pipeline(val, train_iqr)
+    preprocessing_seconds = time.perf_counter() - start
 
     # Separating target
     train_target = train["log_trip_duration"]
@@ -34,10 +81,51 @@ def main():
     train.drop("log_trip_duration", axis=1, inplace=True)
     val.drop("log_trip_duration", axis=1, inplace=True)
 
-    train_model(train, val, train_target, val_target, train_iqr, SAVE_MODEL) 
+    start = time.perf_counter()
+    to_save, metrics = train_model(train, val, train_target, val_target, train_iqr, SAVE_MODEL, model_path, pipeline) 
+    training_seconds = time.perf_counter() - start
+
+    if SAVE_MODEL:
+        save_artifact(to_save, metrics, model_path)
+
+    if USE_CACHE:
+        cache.put(key, to_save, {
+            "preprocessing_module": experiment_pipeline.__name__,
+            "data_paths": TRAIN_PATHS + [VAL_PATH],
+            "fingerprints": components,
+            "metrics": metrics,
+            "timings": {"preprocessing_seconds": preprocessing_seconds, "training_seconds": training_seconds},
+        })
+        print(f"Run cached under key {key}")
+
+
+def save_artifact(to_save, metrics, model_path):
+    """
+    Exports the trained model next to its pickle as a flat artifact (the format served by the API).
+    """
+    artifact_path = os.path.splitext(model_path)[0]
+    export_artifact(to_save, artifact_path, metrics, experiment_pipeline.__name__, os.path.basename(model_path))
+    print(f"Artifact saved to path {artifact_path}")
+
+
+def build_pipeline():
+    """
+    Builds the unfitted column transformer + Ridge pipeline from the module-level settings.
+    """
+    column_transformer = ColumnTransformer([
+        ('ohe', OneHotEncoder(handle_unknown='ignore'), CATEGORICAL_FEATURES),
+        ('scaling', StandardScaler(), NUMERIC_FEATURES)
+        ]
+        , remainder = 'passthrough'
+    )
+    
+    return Pipeline(steps=[
+        ('ohe', column_transformer),
+        ('regression', Ridge(**RIDGE_PARAMS))
+    ])
     
 
-def train_model(train, val, train_target, val_target, train_iqr=-1, save_it=False, model_path=f"../models/{MODEL_NAME}.pkl"):
+def train_model(train, val, train_target, val_target, train_iqr=-1, save_it=False, model_path=f"../models/{MODEL_NAME}.pkl", pipeline=None):
     """
     Trains a Ridge Regression model using a pipeline and evaluates it on training and validation sets.
 
@@ -49,49 +137,37 @@ def train_model(train, val, train_target, val_target, train_iqr=-1, save_it=Fals
     - train_iqr: Optional IQR value for saving (used in outlier filtering during inference).
     - save_it: If True, saves the trained model and IQR info using joblib.
     - model_path: File path to save the model.
+    - pipeline: Optional unfitted pipeline (default: `build_pipeline()`).
 
     Returns:
-    - If save_it is False, the function only prints evaluation scores.
-      If save_it is True, saves the pipeline and IQR in a dictionary to the specified path.
+    - Tuple (to_save, metrics): the dictionary holding the fitted pipeline and IQR,
+      and the train/validation RMSE and R² scores.
+      If save_it is True, the dictionary is also saved to the specified path.
     """
-    
-    # Features that are included here should match the split made in the preprocessing pipeline
-
-    # encoding 
-    categorical_features = ['hour', 'season', 'passenger_count', 'month', 'is_jfk_airport', 'is_lg_airport', 'virtual_speed', 'virtual_speed_cube'] 
-    # scaling
-    numeric_features = [ 'coord_square_sum', 'coord_arithmetic_mean', 
-                        'coord_harmonic_mean', 
-                        ]
-
-    column_transformer = ColumnTransformer([
-        ('ohe', OneHotEncoder(handle_unknown='ignore'), categorical_features),
-        ('scaling', StandardScaler(), numeric_features)
-        ]
-        , remainder = 'passthrough'
-    )
-    
-    pipeline = Pipeline(steps=[
-        ('ohe', column_transformer),
-        ('regression', Ridge(alpha=1))
-    ])
+    pipeline = pipeline or build_pipeline()
     
     # training
     model = pipeline.fit(train, train_target)
-    predict_eval(model, train, train_target, "train")
-    predict_eval(model, val, val_target, "validation")
-
-    if not save_it:
-        return
+    train_rmse, train_r2 = predict_eval(model, train, train_target, "train")
+    val_rmse, val_r2 = predict_eval(model, val, val_target, "validation")
 
     to_save = {
         "model": model,
         "train_iqr": train_iqr,
     }
+    metrics = {
+        "train_rmse": train_rmse,
+        "train_r2": train_r2,
+        "val_rmse": val_rmse,
+        "val_r2": val_r2,
+    }
+
+    if save_it:
+        # pickle
+        joblib.dump(to_save, model_path)
+        print(f"Model saved to path {model_path}")
 
-    # pickle
-    joblib.dump(to_save, model_path)
-    print(f"Model saved to path {model_path}")
+    return to_save, metrics
 
 
 if __name__ == "__main__":
@@ -0,0 +1,215 @@
+import argparse
+import json
+import os
+import time
+
+from functools import lru_cache
+
+import numpy as np
+
+ZONES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nyc_zones.json')
+
+# Area covered by the raster: (min longitude, min latitude, max longitude, max latitude)
+ZONE_GRID_BOUNDS = (-75.0, 40.0, -73.0, 43.0)
+
+# About 100 m; the raster over the bounding box is 2000 x 3000 uint8 cells (6 MB)
+ZONE_CELL_DEGREES = 0.001
+
+NO_ZONE = 0
+MIXED = 255  # cell crossed by a zone boundary (or outside the raster): resolved with the exact shapes
+
+
+def load_zones(path=ZONES_PATH):
+    """
+    Reads zone shapes from a JSON file ({"zones": [{"name": ..., "bbox" or "polygon": ...}, ...]}).
+
+    Returns:
+    - List of (name, kind, coordinates) with kind 'bbox' or 'polygon'.
+    """
+    with open(path) as f:
+        zones = json.load(f)["zones"]
+
+    shapes = []
+    for zone in zones:
+        kind = "bbox" if "bbox" in zone else "polygon"
+        shapes.append((zone["name"], kind, np.asarray(zone[kind], dtype=np.float64)))
+    return shapes
+
+
+def contains(kind, coordinates, longitude, latitude):
+    """
+    Exact membership test of points in one zone shape.
+
+    'bbox' zones are inclusive on every side (like `Series.between`); 'polygon' zones
+    use the even-odd rule.
+    """
+    if kind == "bbox":
+        min_lon, min_lat, max_lon, max_lat = coordinates
+        return (longitude >= min_lon) & (longitude <= max_lon) & (latitude >= min_lat) & (latitude <= max_lat)
+
+    inside = np.zeros(np.shape(longitude), dtype=bool)
+    for (x1, y1), (x2, y2) in zip(coordinates, np.roll(coordinates, -1, axis=0)):
+        if y1 == y2:
+            continue
+        straddles = (y1 > latitude) != (y2 > latitude)
+        inside ^= straddles & (longitude < x1 + (x2 - x1) * (latitude - y1) / (y2 - y1))
+    return inside
+
+
+def outline(kind, coordinates):
+    """
+    Vertices of a zone as a closed ring of (longitude, latitude) points.
+    """
+    if kind == "bbox":
+        min_lon, min_lat, max_lon, max_lat = coordinates
+        coordinates = np.array([[min_lon, min_lat], [max_lon, min_lat], [max_lon, max_lat], [min_lon, max_lat]])
+    return np.vstack([coordinates, coordinates[:1]])
+
+
+class ZoneIndex:
+    '''
+    Raster of zone ids over the NYC bounding box.
+
+    Every cell holds the id of the zone covering it, so the zones of a whole
+    batch of points are one integer gather. Cells crossed by a zone boundary
+    hold MIXED instead; the few points falling in them are resolved with the
+    exact shapes, so results match the exact tests (e.g. the inclusive airport
+    boxes the models were trained with) everywhere.
+
+    Attributes:
+        names (list): Zone name per id; id 0 is 'none'.
+        ids (dict): Zone name to id.
+        raster (np.ndarray): uint8 zone ids, shape (rows, columns), row 0 at the southern edge.
+    '''
+
+    def __init__(self, zones, bounds=ZONE_GRID_BOUNDS, cell_degrees=ZONE_CELL_DEGREES):
+        if len(zones) >= MIXED:
+            raise ValueError(f"At most {MIXED - 1} zones are supported")
+
+        self.zones = zones
+        self.bounds = bounds
+        self.cell_degrees = cell_degrees
+        self.names = ["none"] + [name for name, _, _ in zones]
+        self.ids = {name: i for i, name in enumerate(self.names)}
+
+        self.columns = int(round((bounds[2] - bounds[0]) / cell_degrees))
+        self.rows = int(round((bounds[3] - bounds[1]) / cell_degrees))
+        self.raster = np.zeros((self.rows, self.columns), dtype=np.uint8)
+
+        for zone_id, (_, kind, coordinates) in enumerate(zones, start=1):
+            ring = outline(kind, coordinates)
+            c0, r0 = self._cell(ring.min(axis=0))
+            c1, r1 = self._cell(ring.max(axis=0))
+            rows, columns = np.mgrid[r0:r1 + 1, c0:c1 + 1]
+            centers_lon = bounds[0] + (columns + 0.5) * cell_degrees
+            centers_lat = bounds[1] + (rows + 0.5) * cell_degrees
+            inside = contains(kind, coordinates, centers_lon, centers_lat)
+            self.raster[rows[inside], columns[inside]] = zone_id
+
+        for _, kind, coordinates in zones:
+            self._mark_boundary(outline(kind, coordinates))
+
+    def _cell(self, point):
+        column = int(np.clip((point[0] - self.bounds[0]) // self.cell_degrees, 0, self.columns - 1))
+        row = int(np.clip((point[1] - self.bounds[1]) // self.cell_degrees, 0, self.rows - 1))
+        return column, row
+
+    def _mark_boundary(self, ring):
+        # Sample each edge every half cell, then widen by one cell so cells the edge only clips are included
+        for start, end in zip(ring[:-1], ring[1:]):
+            steps = int(np.ceil(np.abs(end - start).max() / (self.cell_degrees / 2))) + 1
+            points = start + np.linspace(0, 1, steps)[:, None] * (end - start)
+            columns = np.floor((points[:, 0] - self.bounds[0]) / self.cell_degrees).astype(np.int64)
+            rows = np.floor((points[:, 1] - self.bounds[1]) / self.cell_degrees).astype(np.int64)
+            for dr in (-1, 0, 1):
+                for dc in (-1, 0, 1):
+                    r, c = rows + dr, columns + dc
+                    valid = (r >= 0) & (r < self.rows) & (c >= 0) & (c < self.columns)
+                    self.raster[r[valid], c[valid]] = MIXED
+
+    def _exact(self, longitude, latitude):
+        result = np.zeros(longitude.shape, dtype=np.uint8)
+        for zone_id, (_, kind, coordinates) in enumerate(self.zones, start=1):
+            result[contains(kind, coordinates, longitude, latitude)] = zone_id
+        return result
+
+    def lookup(self, longitude, latitude):
+        """
+        Zone id of every point (0 when outside all zones).
+
+        Parameters:
+        - longitude, latitude: Arrays (or scalars), broadcast against each other.
+
+        Returns:
+        - uint8 array of zone ids with the broadcast shape.
+        """
+        longitude, latitude = np.broadcast_arrays(np.asarray(longitude, dtype=np.float64),
+                                                  np.asarray(latitude, dtype=np.float64))
+        columns = (longitude - self.bounds[0]) / self.cell_degrees
+        rows = (latitude - self.bounds[1]) / self.cell_degrees
+        on_raster = (columns >= 0) & (columns < self.columns) & (rows >= 0) & (rows < self.rows)
+
+        if on_raster.all():
+            ids = self.raster.ravel()[rows.astype(np.int64) * self.columns + columns.astype(np.int64)]
+        else:
+            ids = np.full(longitude.shape, MIXED, dtype=np.uint8)
+            ids[on_raster] = self.raster[rows[on_raster].astype(np.int64), columns[on_raster].astype(np.int64)]
+
+        mixed = ids == MIXED
+        if mixed.any():
+            ids[mixed] = self._exact(longitude[mixed], latitude[mixed])
+        return ids
+
+    def zone_id(self, name):
+        """
+        Id of a zone by name.
+
+        Raises:
+        - KeyError if the zone is not in the index.
+        """
+        return self.ids[name]
+
+
+@lru_cache(maxsize=None)
+def default_zone_index(path=ZONES_PATH):
+    """
+    The ZoneIndex of the zones file shipped with the repository, built once per process.
+    """
+    return ZoneIndex(load_zones(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the zone index and measure lookups")
+    parser.add_argument('--zones', type=str, default=ZONES_PATH,
+                        help='JSON file with the zone shapes')
+    parser.add_argument('--points', type=int, default=1_000_000,
+                        help='Random points looked up for the timing')
+
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = ZoneIndex(load_zones(args.zones))
+    print(f"Built {index.rows}x{index.columns} raster with {len(index.zones)} zones "
+          f"in {time.perf_counter() - start:.3f}s ({index.raster.nbytes / 1e6:.1f} MB, "
+          f"{(index.raster == MIXED).mean():.4%} boundary cells)")
+
+    rng = np.random.default_rng(0)
+    longitude = rng.uniform(-74.3, -73.7, args.points)
+    latitude = rng.uniform(40.5, 40.9, args.points)
+
+    start = time.perf_counter()
+    ids = index.lookup(longitude, latitude)
+    raster_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    exact = index._exact(longitude, latitude)
+    exact_seconds = time.perf_counter() - start
+
+    print(f"Lookup of {args.points} points: raster {raster_seconds * 1e3:.1f} ms, "
+          f"exact shapes {exact_seconds * 1e3:.1f} ms, identical: {np.array_equal(ids, exact)}")
+    for zone_id, name in enumerate(index.names):
+        print(f"  {name:<26} {(ids == zone_id).sum():>9}")
+
+
+if __name__ == "__main__":
+    main()